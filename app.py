@@ -1,481 +1,478 @@
 import pandas as pd
 import numpy as np
-import joblib
-from flask import Flask, request, render_template, jsonify
-from pgmpy.inference import VariableElimination
-import mysql.connector 
-import requests 
+from flask import Flask, request, render_template, jsonify, Response, stream_with_context
+from artifact import ARTIFACT_PATH
+from model_reload import ModelReloader
+from caching import LRUCache
+import metrics
+from preprocessing import categorize_risk, build_reasons, category_label, NO_EVIDENCE_ERROR
+from scoring import BatchScorer
+from database import get_db_connection, db_pool, PoolTimeout
+import gemini_client
+import bulk_export
+from bulkhead import BulkheadFull
+from contextlib import ExitStack
 import json
+import base64
+import itertools
+import functools
+import hmac
+import os
 from datetime import datetime
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
+from report_pdf import report_filename
+from report_jobs import report_jobs, ReportQueueFull
 import io
-from flask import send_file
+from flask import send_file, url_for
 
 # Inisialisasi Flask
 app = Flask(__name__)
 
-db_config = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '', 
-    'database': 'heart_disease'
-}
+# Durasi dan jumlah request per route (+ waktu per tahap via metrics.stage), lihat /metrics
+@app.before_request
+def start_request_metrics():
+    metrics.start_request()
 
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(**db_config)
-        return conn
-    except Exception as e:
-        print(f"Error koneksi ke database: {e}")
-        return None
+@app.after_request
+def record_request_metrics(response):
+    # Label route memakai pola URL (misal /get_user_details/<int:user_id>), bukan path mentah
+    rule = request.url_rule
+    metrics.finish_request(rule.rule if rule else 'unmatched', request.method, response.status_code)
+    return response
 
 # --- Muat Model ---
-print("Memuat model dari 'model.joblib'...")
+# Model aktif dipegang model_reloader dan bisa diganti saat server berjalan (lihat model_reload.py).
+# Tiap request mengambil `model_reloader.bundle` sekali di awal dan memakai bundle itu sampai selesai.
+print(f"Memuat model dari '{ARTIFACT_PATH}'...")
 try:
-    model_package = joblib.load('model.joblib')
-    model = model_package['model']
-    encoders = model_package['encoders']
-    discretizer_bins = model_package['discretizer_bins']
-    ALL_FEATURES = model_package['all_features']
-    inference = VariableElimination(model)
-    print("Model berhasil dimuat.")
+    model_reloader = ModelReloader()
+    print(f"Model versi {model_reloader.bundle.version} berhasil dimuat.")
 except FileNotFoundError:
-    print("ERROR: 'model.joblib' not found. Jalankan 'train.py' dulu.")
+    print(f"ERROR: '{ARTIFACT_PATH}' / 'model.joblib' not found. Jalankan 'train.py' dulu.")
     exit()
 
-# --- FEATURE IMPORTANCE (Persentase Pengaruh) ---
-FEATURE_WEIGHTS = {
-    'Age': 15,
-    'Sex': 10,
-    'ChestPainType': 18,
-    'RestingBP': 8,
-    'Cholesterol': 12,
-    'FastingBS': 7,
-    'RestingECG': 9,
-    'MaxHR': 11,
-    'ExerciseAngina': 14,
-    'Oldpeak': 10,
-    'ST_Slope': 16
-}
-
-# Normalisasi agar total = 100%
-total_weight = sum(FEATURE_WEIGHTS.values())
-FEATURE_IMPORTANCE = {k: round((v/total_weight)*100, 1) for k, v in FEATURE_WEIGHTS.items()}
+BATCH_MAX_RECORDS = 10000
+# Jumlah evidence ter-encode yang hasil prediksinya disimpan di cache
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 4096))
+# Token untuk rute /admin/*; jika tidak diisi, rute admin nonaktif
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
 
 # --- Fungsi Helper Preprocessing ---
-def preprocess_input(form_data):
+def form_value(form_data, col):
+    # Field yang tidak dikirim / kosong = tidak diketahui (bukan evidence)
+    value = form_data.get(col)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    return value
+
+def preprocess_input(bundle, form_data):
     evidence_dict = {}
-    reasons = []
-    feature_contributions = {}
     
-    # --- Proses Fitur Numerik (Diskretisasi) ---
-    numeric_inputs = {
-        'Age': int(form_data['Age']),
-        'RestingBP': int(form_data['RestingBP']),
-        'Cholesterol': int(form_data['Cholesterol']),
-        'MaxHR': int(form_data['MaxHR']),
-        'Oldpeak': float(form_data['Oldpeak']),
-    }
+    # --- Baca Input Form ---
+    with metrics.stage('parse'):
+        numeric_inputs = {}
+        for col, cast in (('Age', int), ('RestingBP', int), ('Cholesterol', int), ('MaxHR', int), ('Oldpeak', float)):
+            value = form_value(form_data, col)
+            if value is not None:
+                # Nilai 0 yang tidak logis diganti median training, sama seperti train.py
+                numeric_inputs[col] = cast(bundle.preprocessor.impute(col, cast(value)))
+
+        categorical_inputs = {}
+        for col in ('Sex', 'ChestPainType', 'FastingBS', 'RestingECG', 'ExerciseAngina', 'ST_Slope'):
+            value = form_value(form_data, col)
+            if value is not None:
+                categorical_inputs[col] = category_label(value)
     
-    for col, value in numeric_inputs.items():
-        bins, labels = discretizer_bins[col]
-        bin_index = pd.cut([value], bins=bins, labels=labels, right=False)[0]
-        evidence_dict[col] = str(bin_index)
-        
-        # Hitung kontribusi fitur terhadap risiko
-        risk_factor = 0
-        if col == 'Age' and bin_index == '>60':
-            reasons.append(f"Usia Lanjut ({value} tahun)")
-            risk_factor = 0.8
-        elif col == 'Age' and bin_index == '40-60':
-            risk_factor = 0.5
-        elif col == 'Age':
-            risk_factor = 0.2
-            
-        if col == 'Cholesterol' and bin_index == 'High':
-            reasons.append(f"Kolesterol Tinggi ({value} mg/dl)")
-            risk_factor = 0.9
-        elif col == 'Cholesterol' and bin_index == 'Borderline':
-            reasons.append(f"Kolesterol Borderline ({value} mg/dl)")
-            risk_factor = 0.6
-        elif col == 'Cholesterol':
-            risk_factor = 0.2
-            
-        if col == 'RestingBP' and bin_index == 'High S2':
-            reasons.append(f"Tekanan Darah Sangat Tinggi ({value} mmHg)")
-            risk_factor = 0.9
-        elif col == 'RestingBP' and bin_index == 'High S1':
-            reasons.append(f"Tekanan Darah Tinggi ({value} mmHg)")
-            risk_factor = 0.7
-        elif col == 'RestingBP':
-            risk_factor = 0.3
-            
-        if col == 'Oldpeak' and bin_index == 'High':
-            reasons.append(f"Depresi ST Sangat Tinggi ({value})")
-            risk_factor = 0.9
-        elif col == 'Oldpeak' and bin_index == 'Medium':
-            reasons.append(f"Depresi ST Sedang ({value})")
-            risk_factor = 0.6
-        elif col == 'Oldpeak':
-            risk_factor = 0.2
-            
-        if col == 'MaxHR':
-            if bin_index == 'Very Low':
-                risk_factor = 0.8
-            elif bin_index == 'Low':
-                risk_factor = 0.5
-            else:
-                risk_factor = 0.2
-        
-        feature_contributions[col] = risk_factor
+    # --- Proses Fitur Numerik (Diskretisasi) ---
+    with metrics.stage('discretize'):
+        for col, value in numeric_inputs.items():
+            evidence_dict[col] = bundle.preprocessor.discretize(col, value)
 
     # --- Proses Fitur Kategorikal ---
-    categorical_inputs = {
-        'Sex': form_data['Sex'],
-        'ChestPainType': form_data['ChestPainType'],
-        'FastingBS': str(form_data['FastingBS']),
-        'RestingECG': form_data['RestingECG'],
-        'ExerciseAngina': form_data['ExerciseAngina'],
-        'ST_Slope': form_data['ST_Slope'],
-    }
-    
-    for col, value in categorical_inputs.items():
-        evidence_dict[col] = value
-        
-        risk_factor = 0
-        if col == 'Sex' and value == 'M':
-            risk_factor = 0.6
-        elif col == 'Sex':
-            risk_factor = 0.4
-            
-        if col == 'ChestPainType':
-            if value == 'ASY':
-                reasons.append(f"Nyeri Dada Asymptomatic")
-                risk_factor = 0.9
-            elif value == 'TA':
-                reasons.append(f"Nyeri Dada Typical Angina")
-                risk_factor = 0.8
-            elif value == 'NAP':
-                risk_factor = 0.4
-            else:
-                risk_factor = 0.3
-                
-        if col == 'ExerciseAngina' and value == 'Y':
-            reasons.append("Angina saat Olahraga")
-            risk_factor = 0.9
-        elif col == 'ExerciseAngina':
-            risk_factor = 0.2
-            
-        if col == 'ST_Slope':
-            if value == 'Flat':
-                reasons.append("ST Slope 'Flat'")
-                risk_factor = 0.9
-            elif value == 'Down':
-                reasons.append("ST Slope 'Downsloping'")
-                risk_factor = 0.95
-            else:
-                risk_factor = 0.2
-                
-        if col == 'FastingBS' and value == '1':
-            risk_factor = 0.7
-        elif col == 'FastingBS':
-            risk_factor = 0.3
-            
-        if col == 'RestingECG':
-            if value == 'LVH':
-                risk_factor = 0.8
-            elif value == 'ST':
-                risk_factor = 0.7
-            else:
-                risk_factor = 0.2
-        
-        feature_contributions[col] = risk_factor
+    evidence_dict.update(categorical_inputs)
+
+    reasons = build_reasons(evidence_dict, {**numeric_inputs, **categorical_inputs})
 
     # --- Encoder String ke Angka ---
     encoded_evidence = {}
-    for col in ALL_FEATURES:
-        try:
-            raw_val = evidence_dict[col]
-            le = encoders[col]
-            encoded_val = le.transform([raw_val])[0]
+    with metrics.stage('encode'):
+        for col, label in evidence_dict.items():
+            encoded_val = bundle.preprocessor.encode(col, label)
+            if encoded_val < 0:
+                print(f"Error encoding {col} dengan nilai {label}: kategori tidak dikenal")
+                continue
             encoded_evidence[col] = encoded_val
-        except Exception as e:
-            print(f"Error encoding {col} dengan nilai {evidence_dict.get(col)}: {e}")
-            pass
-            
-    return encoded_evidence, reasons, feature_contributions
+
+    if not encoded_evidence:
+        raise ValueError(NO_EVIDENCE_ERROR)
+    return encoded_evidence, reasons
+
+def compute_posterior(bundle, evidence):
+    # Jalur cepat: lookup tabel posterior (semua fitur blanket diketahui);
+    # evidence sebagian dijawab junction tree
+    posterior = bundle.posterior_table.lookup(evidence)
+    if posterior is None:
+        posterior = bundle.junction_tree.query(evidence)
+    return posterior
+
+def explain_prediction(bundle, evidence, posterior):
+    # Kontribusi tiap fitur menurut model: selisih P(HeartDisease) dengan vs tanpa evidence fitur itu.
+    # Jika blanket lengkap, fitur blanket diambil dari tabel leave-one-out dan fitur di luar blanket
+    # tidak mengubah posterior (0). Tabel fitur yang butuh tetangga moral yang tidak diketahui
+    # dilewati, jadi fitur itu (dan semua fitur jika blanket tidak lengkap) dihitung lewat
+    # junction tree, semua leave-one-out dalam satu query_batch. 0 hanya untuk fitur yang tidak
+    # ada di evidence. Urut dari pengaruh terbesar.
+    positive = bundle.positive_index
+    if bundle.posterior_table.lookup(evidence) is not None:
+        deltas = bundle.contribution_tables.contributions(evidence, posterior, positive)
+        pending = [col for col in bundle.contribution_tables.tables if col in evidence and col not in deltas]
+    else:
+        deltas, pending = {}, list(evidence)
+    if pending:
+        without = bundle.junction_tree.leave_one_out(evidence, pending)
+        for col, row in zip(pending, without):
+            deltas[col] = float(posterior[positive] - row[positive])
+    deltas = {col: deltas.get(col, 0.0) for col in bundle.features}
+    return dict(sorted(deltas.items(), key=lambda item: abs(item[1]), reverse=True))
+
+# Form yang berbeda sering jatuh ke bin/kategori yang sama, jadi posterior + kontribusi
+# di-cache per evidence ter-encode. Key menyertakan versi model, dan cache dikosongkan
+# setiap kali model dimuat ulang.
+prediction_cache = LRUCache(maxsize=PREDICTION_CACHE_SIZE)
+model_reloader.on_swap.append(prediction_cache.clear)
+
+def predict_evidence(bundle, evidence):
+    # (posterior, kontribusi fitur); hasil di-cache, jangan diubah oleh pemanggil
+    key = (bundle.version, tuple(sorted(evidence.items())))
+    result = prediction_cache.get(key)
+    if result is None:
+        posterior = compute_posterior(bundle, evidence)
+        result = (posterior, explain_prediction(bundle, evidence, posterior))
+        prediction_cache.set(key, result)
+    return result
+
+def parse_batch_records():
+    # Terima JSON array, {"patients": [...]}, atau NDJSON (satu pasien per baris)
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        lines = request.get_data(as_text=True).splitlines()
+        records = [json.loads(line) for line in lines if line.strip()]
+    else:
+        records = request.get_json(silent=True)
+        if isinstance(records, dict):
+            records = records.get('patients')
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise ValueError("Body harus berupa array JSON (atau NDJSON) berisi objek pasien.")
+    return records
 
 # --- Rute Aplikasi ---
 
 @app.route('/')
 def home():
-    return render_template('index.html', feature_importance=FEATURE_IMPORTANCE)
+    with metrics.stage('render'):
+        return render_template('index.html', feature_importance=model_reloader.bundle.feature_importance)
 
 @app.route('/predict', methods=['POST'])
 def predict():
+    bundle = model_reloader.bundle
     try:
-        form_data = request.form
-        evidence, reasons, feature_contributions = preprocess_input(form_data)
+        with metrics.stage('parse'):
+            form_data = request.form
+        evidence, reasons = preprocess_input(bundle, form_data)
         
-        target_encoder = encoders['HeartDisease']
-        target_value_index = int(target_encoder.transform(['1'])[0])
-
-        print(f"Melakukan query dengan evidence: {evidence}")
-        result_phi = inference.query(
-            variables=['HeartDisease'],
-            evidence=evidence
-        )
+        with metrics.stage('inference'):
+            posterior, feature_contributions = predict_evidence(bundle, evidence)
         
-        risk_probability = result_phi.values[target_value_index]
+        risk_probability = posterior[bundle.positive_index]
         risk_percentage = round(risk_probability * 100, 2)
         
         print(f"Hasil Probabilitas: {risk_probability} ({risk_percentage}%)")
         
         # Tentukan warna
-        if risk_percentage > 70:
-            risk_color = "text-red-500"
-            risk_category = "Sangat Tinggi"
-        elif risk_percentage > 40:
-            risk_color = "text-yellow-500"
-            risk_category = "Menengah"
-        else:
-            risk_color = "text-green-500"
-            risk_category = "Rendah"
+        risk_color, risk_category = categorize_risk(risk_percentage)
 
         if not reasons:
             reasons = ["Faktor risiko Anda terlihat terkendali."]
 
-        return render_template('index.html',
-                               risk=risk_percentage,
-                               reasons=reasons,
-                               risk_color=risk_color,
-                               risk_category=risk_category,
-                               form_data=form_data,
-                               feature_importance=FEATURE_IMPORTANCE,
-                               feature_contributions=feature_contributions,
-                               scroll_to='result')
-
+        with metrics.stage('render'):
+            return render_template('index.html',
+                                   risk=risk_percentage,
+                                   reasons=reasons,
+                                   risk_color=risk_color,
+                                   risk_category=risk_category,
+                                   form_data=form_data,
+                                   feature_importance=bundle.feature_importance,
+                                   feature_contributions=feature_contributions,
+                                   scroll_to='result')
+
+    except (KeyError, TypeError, ValueError) as e:
+        # Input form tidak valid: 400 supaya tercatat sebagai error di /metrics
+        print(f"Input prediksi tidak valid: {e}")
+        return render_predict_error(bundle, e), 400
     except Exception as e:
         print(f"Terjadi error saat prediksi: {e}")
-        return render_template('index.html',
-                               error=f"Terjadi kesalahan: {e}. Pastikan semua input terisi.",
-                               feature_importance=FEATURE_IMPORTANCE,
-                               scroll_to='result')
+        return render_predict_error(bundle, e), 500
+
+def render_predict_error(bundle, error):
+    return render_template('index.html',
+                           error=f"Terjadi kesalahan: {error}. Pastikan semua input terisi.",
+                           feature_importance=bundle.feature_importance,
+                           scroll_to='result')
+
+# --- RUTE API UNTUK SIMULASI WHAT-IF ---
+@functools.lru_cache(maxsize=2)
+def what_if_options(bundle):
+    # Per fitur: (label, kode) tiap bin/kategori yang dikenal encoder, urut seperti di form.
+    # Di-cache per bundle (bundle lama tersingkir setelah reload)
+    preprocessor = bundle.preprocessor
+    options = {}
+    for col in bundle.features:
+        labels = bundle.discretizer_bins[col][1] if col in bundle.discretizer_bins else list(preprocessor.codes[col])
+        options[col] = [(str(label), preprocessor.encode(col, label)) for label in labels
+                        if preprocessor.encode(col, label) >= 0]
+    return options
+
+def what_if(bundle, evidence):
+    # Risiko jika satu fitur diganti ke tiap bin/kategori lain (fitur lain tetap).
+    # Semua alternatif fitur blanket diambil sekaligus dari tabel posterior; fitur
+    # di luar blanket tidak mengubah posterior, jadi risikonya sama dengan baseline.
+    # Evidence sebagian: semua alternatif semua fitur dihitung dalam satu batch junction tree.
+    positive = bundle.positive_index
+    sweep = bundle.posterior_table.sweep(evidence)
+    if sweep is None:
+        sweep = bundle.junction_tree.sweep(evidence, bundle.features)
+    baseline = round(float(compute_posterior(bundle, evidence)[positive]) * 100, 2)
+    features = {}
+    for col, options in what_if_options(bundle).items():
+        if col in sweep:
+            # Kombinasi berprobabilitas nol menghasilkan NaN -> risk None
+            risks = [None if np.isnan(r) else r for r in np.round(sweep[col][:, positive] * 100, 2).tolist()]
+        else:
+            risks = [baseline] * len(bundle.preprocessor.codes[col])
+        option_risks = [risks[code] for _, code in options if risks[code] is not None]
+        features[col] = {
+            'current': next((label for label, code in options if code == evidence.get(col)), None),
+            'affects_risk': bool(option_risks) and max(option_risks) > min(option_risks),
+            'options': [{'value': label, 'risk': risks[code],
+                         'delta': None if risks[code] is None else round(risks[code] - baseline, 2)}
+                        for label, code in options],
+        }
+    return {'risk': baseline, 'features': features}
+
+@app.route('/api/what_if', methods=['POST'])
+def what_if_route():
+    bundle = model_reloader.bundle
+    with metrics.stage('parse'):
+        form_data = request.get_json(silent=True) or request.form
+    try:
+        evidence, _ = preprocess_input(bundle, form_data)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify(status="error", message=f"Input tidak valid: {e}"), 400
+
+    try:
+        with metrics.stage('inference'):
+            result = what_if(bundle, evidence)
+        return jsonify(status="success", **result)
+    except Exception as e:
+        print(f"Error simulasi what-if: {e}")
+        return jsonify(status="error", message=str(e)), 500
+
+# --- HOT RELOAD MODEL ---
+# Pasien contoh untuk warm-up: jalur /predict (lookup + kontribusi), what-if, dan junction tree
+# (evidence sebagian) dijalankan sekali pada bundle baru sebelum mulai melayani request
+WARMUP_PATIENT = {'Age': 54, 'Sex': 'M', 'ChestPainType': 'ASY', 'RestingBP': 140, 'Cholesterol': 239,
+                  'FastingBS': '0', 'RestingECG': 'Normal', 'MaxHR': 136, 'ExerciseAngina': 'Y',
+                  'Oldpeak': 1.0, 'ST_Slope': 'Flat'}
+
+def warm_up(bundle):
+    for form_data in (WARMUP_PATIENT, {k: v for k, v in WARMUP_PATIENT.items() if k != 'ST_Slope'}):
+        evidence, _ = preprocess_input(bundle, form_data)
+        explain_prediction(bundle, evidence, compute_posterior(bundle, evidence))
+        what_if(bundle, evidence)
+
+model_reloader.warmup = warm_up
+model_reloader.start_watcher()
+
+def admin_authorized():
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+@app.route('/admin/reload_model', methods=['POST'])
+def reload_model():
+    # Muat ulang model sekarang (tanpa menunggu watcher); {"force": true} melewati batas selisih canary
+    if not admin_authorized():
+        return jsonify(status="error", message="Tidak diizinkan."), 403
+    force = bool((request.get_json(silent=True) or {}).get('force'))
+    result = model_reloader.reload(force=force)
+    code = {'swapped': 200, 'unchanged': 200, 'rejected': 409}.get(result['status'], 500)
+    return jsonify(status="success" if code == 200 else "error", reload=result), code
+
+@app.route('/admin/model', methods=['GET'])
+def model_status():
+    if not admin_authorized():
+        return jsonify(status="error", message="Tidak diizinkan."), 403
+    return jsonify(status="success", model=model_reloader.stats())
+
+# --- RUTE API UNTUK SKORING BATCH ---
+@app.route('/api/predict_batch', methods=['POST'])
+def predict_batch():
+    ndjson = request.mimetype in ('application/x-ndjson', 'application/jsonl')
+    try:
+        with metrics.stage('parse'):
+            records = parse_batch_records()
+    except ValueError as e:
+        return jsonify(status="error", message=str(e)), 400
+    if len(records) > BATCH_MAX_RECORDS:
+        return jsonify(status="error", message=f"Maksimal {BATCH_MAX_RECORDS} pasien per request."), 413
+
+    try:
+        results = []
+        if records:
+            with metrics.stage('inference'):
+                scores = BatchScorer.from_bundle(model_reloader.bundle).score(pd.DataFrame.from_records(records))
+            for i, record in enumerate(records):
+                result = {'index': i}
+                if 'id' in record:
+                    result['id'] = record['id']
+                if scores['error'][i] is not None:
+                    result['error'] = scores['error'][i]
+                else:
+                    result['risk'] = float(scores['risk'][i])
+                    result['risk_category'] = scores['risk_category'][i]
+                    result['reasons'] = scores['reasons'][i] or ["Faktor risiko Anda terlihat terkendali."]
+                results.append(result)
+
+        if ndjson:
+            body = ''.join(json.dumps(result) + '\n' for result in results)
+            return app.response_class(body, mimetype='application/x-ndjson')
+        return jsonify(status="success", count=len(results), results=results)
+
+    except Exception as e:
+        print(f"Terjadi error saat prediksi batch: {e}")
+        return jsonify(status="error", message=str(e)), 500
 
 # --- RUTE BARU UNTUK EXPORT PDF ---
 @app.route('/export_report', methods=['POST'])
 def export_report():
     try:
         data = request.json
-        
-        # Buat buffer untuk PDF
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-        
-        # Container untuk elemen PDF
-        elements = []
-        
-        # Style
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1e40af'),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#1e40af'),
-            spaceAfter=12,
-            spaceBefore=12,
-            fontName='Helvetica-Bold'
-        )
-        
-        normal_style = styles['Normal']
-        normal_style.fontSize = 10
-        normal_style.leading = 14
-        
-        # Header
-        elements.append(Paragraph("LAPORAN MEDIS", title_style))
-        elements.append(Paragraph("Prediksi Risiko Penyakit Jantung", styles['Heading2']))
-        elements.append(Paragraph(f"Tanggal: {datetime.now().strftime('%d %B %Y, %H:%M')}", normal_style))
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Informasi Pasien
-        elements.append(Paragraph("INFORMASI PASIEN", heading_style))
-        patient_data = [
-            ['Nama', ':', data.get('Name', '-')],
-            ['Usia', ':', f"{data.get('Age', '-')} tahun"],
-            ['Jenis Kelamin', ':', 'Laki-laki' if data.get('Sex') == 'M' else 'Perempuan'],
-        ]
-        patient_table = Table(patient_data, colWidths=[2*inch, 0.3*inch, 3*inch])
-        patient_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#374151')),
-            ('TEXTCOLOR', (2, 0), (2, -1), colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
-        elements.append(patient_table)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Hasil Prediksi (HIGHLIGHT)
-        risk = float(data.get('risk', 0))
-        risk_category = data.get('risk_category', 'N/A')
-        
-        if risk > 70:
-            risk_color = colors.red
-        elif risk > 40:
-            risk_color = colors.orange
-        else:
-            risk_color = colors.green
-            
-        elements.append(Paragraph("HASIL PREDIKSI", heading_style))
-        risk_data = [
-            ['Tingkat Risiko', f"{risk}%"],
-            ['Kategori', risk_category]
-        ]
-        risk_table = Table(risk_data, colWidths=[2.5*inch, 3*inch])
-        risk_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#374151')),
-            ('TEXTCOLOR', (1, 0), (1, -1), risk_color),
-            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f3f4f6')),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('BOX', (0, 0), (-1, -1), 2, colors.HexColor('#1e40af')),
-        ]))
-        elements.append(risk_table)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Data Medis Input
-        elements.append(Paragraph("DATA MEDIS", heading_style))
-        medical_data = [
-            ['Parameter', 'Nilai', 'Pengaruh (%)'],
-            ['Tekanan Darah Istirahat', f"{data.get('RestingBP', '-')} mmHg", f"{FEATURE_IMPORTANCE['RestingBP']}%"],
-            ['Kolesterol', f"{data.get('Cholesterol', '-')} mg/dl", f"{FEATURE_IMPORTANCE['Cholesterol']}%"],
-            ['Gula Darah Puasa', 'Ya (>120)' if data.get('FastingBS') == '1' else 'Tidak (≤120)', f"{FEATURE_IMPORTANCE['FastingBS']}%"],
-            ['Detak Jantung Maksimal', f"{data.get('MaxHR', '-')} bpm", f"{FEATURE_IMPORTANCE['MaxHR']}%"],
-            ['Oldpeak (Depresi ST)', data.get('Oldpeak', '-'), f"{FEATURE_IMPORTANCE['Oldpeak']}%"],
-        ]
-        medical_table = Table(medical_data, colWidths=[2.5*inch, 2*inch, 1*inch])
-        medical_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('ALIGN', (2, 0), (2, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ]))
-        elements.append(medical_table)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Data EKG
-        ekg_data = [
-            ['Parameter', 'Nilai', 'Pengaruh (%)'],
-            ['Tipe Nyeri Dada', data.get('ChestPainType', '-'), f"{FEATURE_IMPORTANCE['ChestPainType']}%"],
-            ['EKG Istirahat', data.get('RestingECG', '-'), f"{FEATURE_IMPORTANCE['RestingECG']}%"],
-            ['Angina Saat Olahraga', 'Ya' if data.get('ExerciseAngina') == 'Y' else 'Tidak', f"{FEATURE_IMPORTANCE['ExerciseAngina']}%"],
-            ['ST Slope', data.get('ST_Slope', '-'), f"{FEATURE_IMPORTANCE['ST_Slope']}%"],
-        ]
-        ekg_table = Table(ekg_data, colWidths=[2.5*inch, 2*inch, 1*inch])
-        ekg_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('ALIGN', (2, 0), (2, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ]))
-        elements.append(ekg_table)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Faktor Risiko
-        elements.append(Paragraph("FAKTOR RISIKO UTAMA", heading_style))
-        reasons = data.get('reasons', [])
-        if reasons:
-            for reason in reasons:
-                elements.append(Paragraph(f"• {reason}", normal_style))
-        else:
-            elements.append(Paragraph("• Faktor risiko terlihat terkendali", normal_style))
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Rekomendasi AI (jika ada)
-        if data.get('ai_advice'):
-            elements.append(PageBreak())
-            elements.append(Paragraph("REKOMENDASI & NASIHAT KESEHATAN", heading_style))
-            advice_text = data.get('ai_advice', '')
-            # Format advice
-            for line in advice_text.split('\n'):
-                if line.strip():
-                    elements.append(Paragraph(line, normal_style))
-            elements.append(Spacer(1, 0.3*inch))
-        
-        # Footer / Disclaimer
-        elements.append(Spacer(1, 0.5*inch))
-        disclaimer = """
-        <b>CATATAN PENTING:</b><br/>
-        Hasil prediksi ini dihasilkan oleh model machine learning Bayesian Network dan bukan merupakan diagnosis medis resmi. 
-        Selalu konsultasikan dengan dokter atau tenaga medis profesional untuk pemeriksaan lebih lanjut dan diagnosis yang akurat.
-        Model ini memiliki tingkat akurasi yang baik, namun tidak menggantikan penilaian klinis dokter.
-        """
-        disclaimer_style = ParagraphStyle(
-            'Disclaimer',
-            parent=normal_style,
-            fontSize=8,
-            textColor=colors.HexColor('#6b7280'),
-            alignment=TA_JUSTIFY,
-            borderWidth=1,
-            borderColor=colors.HexColor('#9ca3af'),
-            borderPadding=10,
-            backColor=colors.HexColor('#f9fafb')
-        )
-        elements.append(Paragraph(disclaimer, disclaimer_style))
-        
-        # Build PDF
-        doc.build(elements)
-        
-        # Kirim file
-        buffer.seek(0)
-        filename = f"Laporan_Medis_{data.get('Name', 'Pasien').replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        
+        # Render berjalan di process pool; thread ini hanya menunggu hasilnya
+        with metrics.stage('pdf'):
+            pdf = report_jobs.render(data, model_reloader.bundle.feature_importance)
         return send_file(
-            buffer,
+            io.BytesIO(pdf),
             as_attachment=True,
-            download_name=filename,
+            download_name=report_filename(data),
             mimetype='application/pdf'
         )
-        
+
+    except ReportQueueFull as e:
+        return report_busy_response(e)
     except Exception as e:
         print(f"Error saat export PDF: {e}")
         return jsonify(status="error", message=str(e)), 500
 
+def report_busy_response(error):
+    response = jsonify(status="error", message=str(error))
+    response.status_code = 503
+    response.headers['Retry-After'] = '5'
+    return response
+
+# Mode job: POST membuat job render, klien lalu polling status dan mengunduh hasilnya
+@app.route('/export_report/jobs', methods=['POST'])
+def create_report_job():
+    try:
+        data = request.json
+        job_id = report_jobs.submit(data, model_reloader.bundle.feature_importance, report_filename(data))
+        return jsonify(status="success", job_id=job_id,
+                       status_url=url_for('report_job_status', job_id=job_id),
+                       download_url=url_for('download_report_job', job_id=job_id)), 202
+    except ReportQueueFull as e:
+        return report_busy_response(e)
+    except Exception as e:
+        print(f"Error saat membuat job PDF: {e}")
+        return jsonify(status="error", message=str(e)), 500
+
+@app.route('/export_report/jobs/<job_id>', methods=['GET'])
+def report_job_status(job_id):
+    job_status = report_jobs.status(job_id)
+    if job_status is None:
+        return jsonify(status="error", message="Job tidak ditemukan atau sudah kedaluwarsa."), 404
+    return jsonify(status="success", job=job_status)
+
+@app.route('/export_report/jobs/<job_id>/download', methods=['GET'])
+def download_report_job(job_id):
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify(status="error", message="Job tidak ditemukan atau sudah kedaluwarsa."), 404
+    future = job['future']
+    if not future.done():
+        return jsonify(status="error", message="Laporan masih diproses."), 409
+    if future.exception() is not None:
+        print(f"Error saat export PDF: {future.exception()}")
+        return jsonify(status="error", message=str(future.exception())), 500
+    return send_file(
+        io.BytesIO(future.result()),
+        as_attachment=True,
+        download_name=job['filename'],
+        mimetype='application/pdf'
+    )
+
+# Ekspor massal: zip berisi laporan PDF pasien tersimpan (berdasarkan id atau batas risiko)
+@app.route('/export_report/bulk', methods=['POST'])
+def export_report_bulk():
+    slot = ExitStack()
+    try:
+        data = request.get_json(silent=True) or {}
+        ids, risk_above = data.get('ids'), data.get('risk_above')
+        if (ids is None) == (risk_above is None):
+            return jsonify(status="error", message="Isi salah satu: 'ids' (daftar id) atau 'risk_above' (angka)."), 400
+        if ids is not None and (not isinstance(ids, list) or not ids):
+            return jsonify(status="error", message="'ids' harus berupa daftar id yang tidak kosong."), 400
+
+        slot.enter_context(bulk_export.bulkhead.slot())
+        # Batch pertama diambil di sini supaya error database / hasil kosong masih bisa dibalas sebagai JSON
+        batches = bulk_export.iter_saved_rows(ids=ids, risk_above=risk_above)
+        with metrics.stage('db'):
+            first_batch = next(batches, None)
+        if first_batch is None:
+            slot.close()
+            return jsonify(status="error", message="Tidak ada pasien yang cocok dengan filter."), 404
+    except BulkheadFull as e:
+        slot.close()
+        response = jsonify(status="error", message="Ekspor massal lain sedang berjalan. Coba lagi nanti.")
+        response.status_code = 503
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    except PoolTimeout as e:
+        slot.close()
+        return jsonify(status="error", message=str(e)), 503
+    except (ValueError, TypeError):
+        slot.close()
+        return jsonify(status="error", message="Parameter 'ids'/'risk_above' tidak valid."), 400
+    except Exception as e:
+        slot.close()
+        print(f"Error saat ekspor massal: {e}")
+        return jsonify(status="error", message=str(e)), 500
+
+    bundle = model_reloader.bundle
+
+    def chunks():
+        yield from bulk_export.export_zip(itertools.chain([first_batch], batches), bundle)
+        # Zip selesai: lepas slot sekarang, tanpa menunggu server menutup response
+        slot.close()
+
+    filename = f"Laporan_Medis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    response = Response(chunks(), mimetype='application/zip',
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+    # Selain itu slot dilepas saat server menutup response (error, klien putus), termasuk jika
+    # klien putus sebelum chunk pertama: finally di generator yang belum pernah berjalan tidak
+    # pernah dieksekusi. slot.close() aman dipanggil lebih dari sekali
+    response.call_on_close(slot.close)
+    return response
+
+@app.route('/report_stats', methods=['GET'])
+def report_stats():
+    return jsonify(report_jobs.stats())
+
 # --- RUTE GEMINI UNTUK REKOMENDASI PENGURANGAN RISIKO ---
 @app.route('/get_gemini_advice', methods=['POST'])
 def get_gemini_advice():
@@ -485,100 +482,135 @@ def get_gemini_advice():
         form_data = data.get('formData', {})
         
         # 2. Pilih Model AI
-        # Default kita set ke 'gemini-2.0-flash' karena di daftar Anda ini yang STATUSNYA ✅ WORKING!
-        model_name = data.get('model', 'gemini-2.0-flash')
-        
-        # API Key (Gunakan key Anda)
-        api_key = "ISI API KEY DISINI YA VISITOR GITHUB KU"
-        api_url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={api_key}"
-
-        # 3. Siapkan Data untuk Prompt
-        # Data Medis (Yang dipakai untuk prediksi numerik)
-        data_medis_model = {
-            'Usia': f"{form_data.get('Age')} tahun",
-            'Jenis Kelamin': 'Laki-laki' if form_data.get('Sex') == 'M' else 'Perempuan',
-            'Tipe Nyeri Dada': form_data.get('ChestPainType'),
-            'Tekanan Darah': f"{form_data.get('RestingBP')} mmHg",
-            'Kolesterol': f"{form_data.get('Cholesterol')} mg/dl",
-            'Gula Darah Puasa > 120': 'Ya' if form_data.get('FastingBS') == '1' else 'Tidak',
-            'EKG Istirahat': form_data.get('RestingECG'),
-            'Detak Jantung Maks': form_data.get('MaxHR'),
-            'Angina Olahraga': 'Ya' if form_data.get('ExerciseAngina') == 'Y' else 'Tidak',
-            'Oldpeak (Depresi ST)': form_data.get('Oldpeak'),
-            'ST Slope': form_data.get('ST_Slope')
-        }
-        
-        # Data Gaya Hidup (Yang SANGAT PENTING untuk nasihat dokter tapi tidak masuk rumus matematika model)
-        data_gaya_hidup = {
-            'Tinggi Badan': f"{form_data.get('Height')} cm",
-            'Berat Badan': f"{form_data.get('Weight')} kg",
-            'Riwayat Keluarga Jantung': form_data.get('FamilyHistory', 'Tidak ada info'),
-            'Status Merokok': form_data.get('SmokingStatus', 'Tidak ada info'),
-            'Konsumsi Alkohol': form_data.get('AlcoholIntake', 'Tidak ada info'),
-            'Aktivitas Fisik': form_data.get('PhysicalActivity', 'Tidak ada info')
-        }
-        
-        # Ambil hasil prediksi persentase terakhir (dikirim dari frontend)
-        hasil_prediksi = form_data.get('LastRiskPercentage', 'Belum diprediksi')
-
-        # 4. Buat System Prompt (Persona AI)
-        system_prompt = (
-            "Anda adalah Dokter Spesialis Jantung (Kardiolog) senior yang ramah, empatik, namun tegas dalam hal kesehatan. "
-            "Tugas Anda: Memberikan interpretasi hasil prediksi risiko jantung dan saran gaya hidup yang PERSONAL."
-            "\nATURAN PENTING:"
-            "\n1. Jangan mendiagnosis secara medis (gunakan bahasa 'berisiko', 'indikasi', dll)."
-            "\n2. Selalu sarankan konsultasi ke dokter sungguhan di akhir."
-            "\n3. Fokuslah menghubungkan 'Data Gaya Hidup' (seperti merokok/berat badan) dengan 'Hasil Prediksi'."
-            "\n4. Gunakan format Markdown (bold, list) agar mudah dibaca."
-            "\n5. Gunakan Bahasa Indonesia yang baik, formal tapi hangat."
-        )
-
-        # 5. Buat User Query (Data Pasien)
-        user_query = (
-            f"Halo Dokter AI. Berikut data pasien saya:\n\n"
-            f"--- DATA UTAMA ---\n"
-            f"Nama: {form_data.get('Name', 'Pasien')}\n"
-            f"HASIL PREDIKSI SISTEM: Risiko Penyakit Jantung {hasil_prediksi}%\n\n"
-            f"--- DATA KLINIS ---\n{json.dumps(data_medis_model, indent=2)}\n\n"
-            f"--- GAYA HIDUP & FISIK ---\n{json.dumps(data_gaya_hidup, indent=2)}\n\n"
-            f"Mohon berikan:\n"
-            f"1. Penjelasan singkat apa arti risiko {hasil_prediksi}% ini.\n"
-            f"2. Analisis faktor gaya hidup saya (terutama {data_gaya_hidup.get('Status Merokok')} dan {data_gaya_hidup.get('Aktivitas Fisik')}).\n"
-            f"3. 3-5 Langkah konkret yang bisa saya lakukan mulai besok untuk menurunkan risiko ini."
-        )
-
-        # 6. Kirim Request ke Google Gemini API
-        payload = {
-            "contents": [{"parts": [{"text": user_query}]}],
-            "systemInstruction": {"parts": [{"text": system_prompt}]}
-        }
-
-        print(f"Mengirim request ke model: {model_name}...") # Debugging log
-        response = requests.post(api_url, json=payload, headers={'Content-Type': 'application/json'})
-        
-        # 7. Cek Error dari API
-        if response.status_code != 200:
-            error_msg = f"API Error {response.status_code}: {response.text}"
-            print(error_msg)
-            return jsonify(status="error", message="Maaf, server AI sedang sibuk. Coba model lain atau tunggu sebentar."), 500
-
-        # 8. Parsing Hasil
-        result_json = response.json()
-        
-        # Ambil teks jawaban dengan aman (mengantisipasi struktur JSON yang kosong)
-        try:
-            advice_text = result_json['candidates'][0]['content']['parts'][0]['text']
-        except (KeyError, IndexError):
-            advice_text = "Maaf, AI tidak memberikan respons yang valid. Silakan coba lagi."
-
+        model_name = data.get('model', gemini_client.GEMINI_DEFAULT_MODEL)
+
+        # 3. Prompt dibangun dari data pasien; hasil identik diambil dari cache,
+        #    request identik yang sedang berjalan digabung jadi satu panggilan API
+        advice_text = gemini_client.cached_advice(form_data, model_name)
+        if advice_text is None:
+            # Panggilan upstream dibatasi bulkhead agar tidak menghabiskan thread worker
+            with gemini_client.bulkhead.slot(), metrics.stage('gemini'):
+                advice_text = gemini_client.get_advice(form_data, model_name)
         return jsonify(status="success", advice=advice_text)
 
+    except BulkheadFull as e:
+        return advice_busy_response(e)
+    except gemini_client.GeminiError as e:
+        print(e)
+        return jsonify(status="error", message="Maaf, server AI sedang sibuk. Coba model lain atau tunggu sebentar."), 500
     except Exception as e:
         print(f"CRITICAL ERROR di /get_gemini_advice: {e}")
         return jsonify(status="error", message=f"Terjadi kesalahan sistem: {str(e)}"), 500
 
+def advice_busy_response(error):
+    # Bulkhead penuh: tolak cepat supaya klien mencoba lagi nanti, bukan menahan thread worker
+    response = jsonify(status="error", message="Layanan AI sedang penuh. Silakan coba lagi beberapa saat lagi.")
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.route('/get_gemini_advice/stream', methods=['POST'])
+def stream_gemini_advice():
+    # Versi streaming (Server-Sent Events): teks dikirim ke browser begitu token pertama tiba
+    slot = ExitStack()
+    try:
+        data = request.json
+        form_data = data.get('formData', {})
+        model_name = data.get('model', gemini_client.GEMINI_DEFAULT_MODEL)
+        # Cache hit dikirim sebagai satu potongan. Miss: slot bulkhead dipegang selama stream
+        # berjalan (dilepas di akhir events / saat response ditutup)
+        cached = gemini_client.cached_advice(form_data, model_name)
+        if cached is not None:
+            chunks = iter([cached])
+        else:
+            slot.enter_context(gemini_client.bulkhead.slot())
+            chunks = gemini_client.stream_advice(form_data, model_name)
+        # Tarik potongan pertama di sini agar error upstream masih bisa dibalas sebagai JSON biasa
+        with metrics.stage('gemini'):
+            first_chunk = next(chunks)
+    except BulkheadFull as e:
+        slot.close()
+        return advice_busy_response(e)
+    except gemini_client.GeminiError as e:
+        slot.close()
+        print(e)
+        return jsonify(status="error", message="Maaf, server AI sedang sibuk. Coba model lain atau tunggu sebentar."), 500
+    except Exception as e:
+        slot.close()
+        print(f"CRITICAL ERROR di /get_gemini_advice/stream: {e}")
+        return jsonify(status="error", message=f"Terjadi kesalahan sistem: {str(e)}"), 500
+
+    def events():
+        try:
+            yield sse_event({'text': first_chunk})
+            for text in chunks:
+                yield sse_event({'text': text})
+            yield sse_event({'status': 'success'}, event='done')
+        except gemini_client.GeminiError as e:
+            print(e)
+            yield sse_event({'status': 'error', 'message': "Maaf, koneksi ke server AI terputus. Silakan coba lagi."}, event='error')
+        finally:
+            slot.close()
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Klien yang putus sebelum event pertama: generator tidak pernah berjalan, finally-nya tidak
+    # dieksekusi, jadi slot juga dilepas saat server menutup response
+    response.call_on_close(slot.close)
+    return response
+
+@app.route('/gemini_cache_stats', methods=['GET'])
+def gemini_cache_stats():
+    return jsonify(gemini_client.stats())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/prediction_cache_stats', methods=['GET'])
+def prediction_cache_stats():
+    return jsonify(model_version=model_reloader.bundle.version, **prediction_cache.stats())
+
 # --- RUTE DATABASE ---
 
+SAVED_USERS_PAGE_SIZE = 50
+SAVED_USERS_MAX_PAGE_SIZE = 200
+
+# Index yang dibutuhkan query SavedInformation; dibuat oleh create_table_if_not_exists.
+# idx_saved_name meng-cover listing pasien (ORDER BY Name, id + LastRiskPercentage).
+SAVED_INFORMATION_INDEXES = {
+    'idx_saved_name': '(Name, id, LastRiskPercentage)',
+    'idx_saved_diagnosed': '(DiagnosedAt, id)',
+}
+# Kolom yang ditambahkan setelah tabel pertama kali dibuat (ALTER TABLE untuk tabel lama).
+# HeartDisease = diagnosis terkonfirmasi (0/1, NULL = belum diketahui); hanya baris yang sudah
+# berdiagnosis yang dipakai update_model.py untuk memperbarui model. DiagnosedAt = kapan
+# diagnosis terakhir diisi/diubah/dihapus (watermark update_model.py).
+SAVED_INFORMATION_COLUMNS = {
+    'HeartDisease': 'TINYINT NULL',
+    'DiagnosedAt': 'DATETIME(6) NULL',
+}
+
+def diagnosis_value(value):
+    # '' / None = belum diketahui; selain itu harus 0 atau 1
+    if value is None or str(value).strip() == '':
+        return None
+    if str(value).strip() not in ('0', '1'):
+        raise ValueError("HeartDisease harus 0, 1, atau kosong.")
+    return int(value)
+
+def encode_users_cursor(name, user_id):
+    raw = json.dumps([name, user_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_users_cursor(token):
+    name, user_id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    return str(name), int(user_id)
+
 @app.route('/save_info', methods=['POST'])
 def save_info():
     data = request.form
@@ -586,11 +618,15 @@ def save_info():
         INSERT INTO SavedInformation 
         (Name, Age, Sex, ChestPainType, RestingBP, Cholesterol, FastingBS, 
         RestingECG, MaxHR, ExerciseAngina, Oldpeak, ST_Slope, LastRiskPercentage,
-        Height, Weight, FamilyHistory, SmokingStatus, AlcoholIntake, PhysicalActivity)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        Height, Weight, FamilyHistory, SmokingStatus, AlcoholIntake, PhysicalActivity, HeartDisease, DiagnosedAt)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
     """
     try:
-        with get_db_connection() as conn:
+        heart_disease = diagnosis_value(data.get('HeartDisease'))
+    except ValueError as e:
+        return jsonify(status="error", message=str(e)), 400
+    try:
+        with metrics.stage('db'), get_db_connection() as conn:
             with conn.cursor(dictionary=True) as cursor:
                 cursor.execute(sql, (
                     data['Name'], int(data['Age']), data['Sex'], data['ChestPainType'],
@@ -600,34 +636,94 @@ def save_info():
                     int(data['Height']) if data['Height'] else None,
                     int(data['Weight']) if data['Weight'] else None,
                     data['FamilyHistory'], data['SmokingStatus'], 
-                    data['AlcoholIntake'], data['PhysicalActivity']
+                    data['AlcoholIntake'], data['PhysicalActivity'], heart_disease,
+                    datetime.now() if heart_disease is not None else None
                 ))
             conn.commit() 
         
         return jsonify(status="success", message="Prediksi berhasil disimpan!")
         
+    except PoolTimeout as e:
+        return jsonify(status="error", message=str(e)), 503
     except Exception as e:
         print(f"Error saat menyimpan: {e}")
         return jsonify(status="error", message=str(e)), 500
 
+@app.route('/save_diagnosis/<int:user_id>', methods=['POST'])
+def save_diagnosis(user_id):
+    # Diagnosis terkonfirmasi untuk pasien tersimpan (form atau JSON {"HeartDisease": 0/1/null})
+    data = request.get_json(silent=True) or request.form
+    try:
+        heart_disease = diagnosis_value(data.get('HeartDisease'))
+    except ValueError as e:
+        return jsonify(status="error", message=str(e)), 400
+    try:
+        with metrics.stage('db'), get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                # DiagnosedAt juga diisi saat diagnosis dihapus (NULL): update_model.py mengurangi count-nya
+                cursor.execute("UPDATE SavedInformation SET HeartDisease = %s, DiagnosedAt = %s WHERE id = %s",
+                               (heart_disease, datetime.now(), user_id))
+                # rowcount MySQL = baris yang berubah; cek keberadaan baris secara terpisah
+                cursor.execute("SELECT id FROM SavedInformation WHERE id = %s", (user_id,))
+                found = cursor.fetchone() is not None
+            conn.commit()
+        if not found:
+            return jsonify(status="error", message="User tidak ditemukan."), 404
+        return jsonify(status="success", message="Diagnosis berhasil disimpan.")
+    except PoolTimeout as e:
+        return jsonify(status="error", message=str(e)), 503
+    except Exception as e:
+        print(f"Error saat menyimpan diagnosis: {e}")
+        return jsonify(status="error", message=str(e)), 500
+
 @app.route('/get_saved_users', methods=['GET'])
 def get_saved_users():
-    sql = "SELECT id, Name, LastRiskPercentage FROM SavedInformation ORDER BY Name"
+    # Keyset pagination pada (Name, id): query tetap memakai index berapapun posisi halamannya
     try:
-        with get_db_connection() as conn:
+        limit = min(max(int(request.args.get('limit', SAVED_USERS_PAGE_SIZE)), 1), SAVED_USERS_MAX_PAGE_SIZE)
+        prefix = request.args.get('q', '').strip()
+        cursor_token = request.args.get('cursor')
+        after = decode_users_cursor(cursor_token) if cursor_token else None
+    except (ValueError, TypeError):
+        return jsonify(status="error", message="Parameter limit/cursor tidak valid."), 400
+
+    conditions, params = [], []
+    if prefix:
+        escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append("Name LIKE %s")
+        params.append(escaped + '%')
+    if after:
+        conditions.append("(Name > %s OR (Name = %s AND id > %s))")
+        params.extend([after[0], after[0], after[1]])
+    sql = "SELECT id, Name, LastRiskPercentage FROM SavedInformation"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY Name, id LIMIT %s"
+    params.append(limit + 1)
+
+    try:
+        with metrics.stage('db'), get_db_connection() as conn:
             with conn.cursor(dictionary=True) as cursor:
-                cursor.execute(sql)
+                cursor.execute(sql, params)
                 users_list = cursor.fetchall() 
-        return jsonify(users_list)
+        next_cursor = None
+        if len(users_list) > limit:
+            users_list = users_list[:limit]
+            last = users_list[-1]
+            next_cursor = encode_users_cursor(last['Name'], last['id'])
+        return jsonify(users=users_list, next_cursor=next_cursor)
+    except PoolTimeout as e:
+        print(f"Error mengambil users: {e}")
+        return jsonify(users=[], next_cursor=None), 503
     except Exception as e:
         print(f"Error mengambil users: {e}")
-        return jsonify([]), 500
+        return jsonify(users=[], next_cursor=None), 500
 
 @app.route('/get_user_details/<int:user_id>', methods=['GET'])
 def get_user_details(user_id):
     sql = "SELECT * FROM SavedInformation WHERE id = %s"
     try:
-        with get_db_connection() as conn:
+        with metrics.stage('db'), get_db_connection() as conn:
             with conn.cursor(dictionary=True) as cursor:
                 cursor.execute(sql, (user_id,))
                 user = cursor.fetchone()
@@ -635,16 +731,18 @@ def get_user_details(user_id):
             return jsonify(user)
         else:
             return jsonify(error="User not found"), 404
+    except PoolTimeout as e:
+        return jsonify(error=str(e)), 503
     except Exception as e:
         print(f"Error mengambil detail user: {e}")
-        return jsonify(error=str(e)), 500@app.route('/delete_user/<int:user_id>', methods=['POST'])
+        return jsonify(error=str(e)), 500
 
 @app.route('/delete_user/<int:user_id>', methods=['POST'])
 def delete_user(user_id):
     sql = "DELETE FROM SavedInformation WHERE id = %s"
     rows_affected = 0
     try:
-        with get_db_connection() as conn:
+        with metrics.stage('db'), get_db_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(sql, (user_id,))
                 rows_affected = cursor.rowcount
@@ -657,6 +755,8 @@ def delete_user(user_id):
             print(f"User {user_id} tidak ditemukan.")
             return jsonify(status="error", message="User tidak ditemukan."), 404
             
+    except PoolTimeout as e:
+        return jsonify(status="error", message=str(e)), 503
     except Exception as e:
         print(f"Error saat menghapus: {e}")
         return jsonify(status="error", message=str(e)), 500
@@ -682,18 +782,50 @@ def create_table_if_not_exists():
         FamilyHistory VARCHAR(10) NULL,
         SmokingStatus VARCHAR(20) NULL,
         AlcoholIntake VARCHAR(20) NULL,
-        PhysicalActivity VARCHAR(20) NULL
+        PhysicalActivity VARCHAR(20) NULL,
+        HeartDisease TINYINT NULL,
+        DiagnosedAt DATETIME(6) NULL,
+    INDEX idx_saved_name (Name, id, LastRiskPercentage),
+    INDEX idx_saved_diagnosed (DiagnosedAt, id)
     )
     """
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cursor: 
                 cursor.execute(sql)
+                # Tabel lama (dibuat sebelum ada index) perlu ditambahkan index-nya
+                cursor.execute(
+                    "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'SavedInformation'"
+                )
+                existing = {row[0] for row in cursor.fetchall()}
+                cursor.execute(
+                    "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'SavedInformation'"
+                )
+                existing_columns = {row[0] for row in cursor.fetchall()}
+                for name, definition in SAVED_INFORMATION_COLUMNS.items():
+                    if name not in existing_columns:
+                        print(f"Menambahkan kolom '{name}' ke tabel 'SavedInformation'...")
+                        cursor.execute(f"ALTER TABLE SavedInformation ADD COLUMN {name} {definition}")
+                        if name == 'DiagnosedAt':
+                            # Diagnosis yang sudah ada sebelum kolom ini dibaca update_model.py berikutnya
+                            cursor.execute("UPDATE SavedInformation SET DiagnosedAt = %s WHERE HeartDisease IS NOT NULL",
+                                           (datetime.now(),))
+                for name, columns in SAVED_INFORMATION_INDEXES.items():
+                    if name not in existing:
+                        print(f"Menambahkan index '{name}' ke tabel 'SavedInformation'...")
+                        cursor.execute(f"ALTER TABLE SavedInformation ADD INDEX {name} {columns}")
             conn.commit()
         print("Tabel 'SavedInformation' berhasil dicek/dibuat.")
     except Exception as e:
         print(f"Error saat membuat tabel: {e}")
         
+@app.route('/db_pool_stats', methods=['GET'])
+def db_pool_stats():
+    # Statistik pool koneksi (in_use, waiting, created, ...) untuk menentukan ukuran pool
+    return jsonify(db_pool.stats())
+
 @app.route('/stats')
 def stats():
     return render_template('stats.html')
@@ -0,0 +1,251 @@
+import os
+import json
+import struct
+import hashlib
+import tempfile
+from contextlib import contextmanager, suppress
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: server dev satu proses, tidak ada worker yang mengekspor bersamaan
+    fcntl = None
+
+import numpy as np
+
+from inference_engine import TARGET, PosteriorTable, ContributionTables, JunctionTree, extract_cpds
+from preprocessing import Preprocessor
+
+# Artefak model untuk serving: CPD, tabel hasil kompilasi, dan potensial junction tree
+# sebagai array mentah + metadata JSON (kategori encoder, bins, urutan fitur) dalam satu
+# file datar tanpa pickle. Memuatnya cukup dengan numpy; pgmpy/sklearn/joblib hanya
+# dibutuhkan saat ekspor (train.py, atau ekspor ulang otomatis dari model.joblib).
+#
+# Format file:  MAGIC | panjang header (uint64 LE) | header JSON | array (tiap array rata 64 byte)
+# Header JSON memuat metadata + {"arrays": {nama: {offset, shape, dtype}}}; offset relatif
+# terhadap awal bagian data. Array di-memory-map read-only (np.memmap), jadi semua worker
+# gunicorn di satu host berbagi page fisik yang sama dari page cache, bukan salinan per proses.
+
+ARTIFACT_PATH = os.environ.get('MODEL_ARTIFACT', 'model_artifact.bin')
+MODEL_PATH = 'model.joblib'
+ARTIFACT_VERSION = 2
+MAGIC = b'HDBNART\x00'
+ALIGNMENT = 64
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _bins_to_json(bins):
+    # JSON standar tidak punya Infinity; simpan batas tak hingga sebagai string "inf"/"-inf"
+    return [float(b) if np.isfinite(b) else str(float(b)) for b in bins]
+
+
+def export_artifact(model_package, path=ARTIFACT_PATH):
+    """Tulis artefak dari paket model.joblib (dict hasil train.py); kembalikan metadata-nya."""
+    meta, arrays = build_artifact(model_package)
+    write_artifact(path, meta, arrays)
+    return meta
+
+
+def build_artifact(model_package):
+    """(meta, arrays) artefak di memori; ModelBundle(meta, arrays) bisa langsung dipakai tanpa file."""
+    model = model_package['model']
+    cpds = extract_cpds(model)
+    posterior_table = PosteriorTable.compile(model)
+    contribution_tables = ContributionTables.compile(model)
+
+    junction_tree = JunctionTree.from_cpds(cpds)
+
+    arrays = {f'cpd_{var}': values for var, (_, values) in cpds.items()}
+    arrays['posterior_table'] = posterior_table.table
+    for feature, (_, table) in contribution_tables.tables.items():
+        arrays[f'contribution_{feature}'] = table
+    for i, potential in enumerate(junction_tree.potentials):
+        arrays[f'clique_{i}'] = potential
+
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+
+    meta = {
+        'format_version': ARTIFACT_VERSION,
+        'model_version': digest.hexdigest()[:12],
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'target': TARGET,
+        'features': list(model_package['all_features']),
+        'categories': {col: [str(c) for c in le.classes_] for col, le in model_package['encoders'].items()},
+        'discretizer_bins': {col: [_bins_to_json(bins), [str(l) for l in labels]]
+                             for col, (bins, labels) in model_package['discretizer_bins'].items()},
+        'medians': {col: float(value) for col, value in model_package.get('medians', {}).items()},
+        'cpds': {var: variables for var, (variables, _) in cpds.items()},
+        'posterior_table': posterior_table.variables,
+        'contribution_tables': {feature: variables for feature, (variables, _) in contribution_tables.tables.items()},
+        'importance': contribution_tables.importance,
+        'junction_tree': {'cliques': junction_tree.cliques,
+                          'parents': [[i, parent] for i, parent in junction_tree.parents.items()]},
+    }
+    return meta, arrays
+
+
+@contextmanager
+def atomic_write(path):
+    """File (mode 'wb') yang setelah selesai di-rename ke `path`; dibuang jika penulisan gagal.
+
+    Nama sementaranya unik (mkstemp, direktori yang sama): beberapa proses yang menulis `path`
+    bersamaan tidak saling menimpa file setengah jadi. Pembaca tidak pernah melihat file
+    setengah jadi, dan worker yang masih memetakan file lama tetap membaca isi lama.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+        os.chmod(tmp_path, 0o644)  # mkstemp membuat file 0600
+        os.replace(tmp_path, path)
+    except BaseException:
+        with suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_artifact(path, meta, arrays):
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        layout[name] = {'offset': offset, 'shape': list(array.shape), 'dtype': array.dtype.str}
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({**meta, 'arrays': layout}, indent=2).encode('utf-8')
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    with atomic_write(path) as f:
+        f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+
+
+def read_meta(path=ARTIFACT_PATH):
+    """Header JSON artefak (tanpa membaca array)."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"'{path}' bukan artefak model")
+        (length,) = struct.unpack('<Q', f.read(8))
+        meta = json.loads(f.read(length))
+    if meta.get('format_version') != ARTIFACT_VERSION:
+        raise ValueError(f"Versi artefak {meta.get('format_version')} tidak didukung (butuh {ARTIFACT_VERSION})")
+    meta['data_start'] = _align(len(MAGIC) + 8 + length)
+    return meta
+
+
+def read_artifact(path=ARTIFACT_PATH, mmap=True):
+    """Kembalikan (meta, {nama: array}); dengan mmap=True array berupa view read-only ke file."""
+    meta = read_meta(path)
+    if mmap:
+        # asarray: view ndarray biasa (bukan subclass memmap) yang tetap menahan mapping-nya
+        buffer = np.asarray(np.memmap(path, dtype=np.uint8, mode='r'))
+    else:
+        with open(path, 'rb') as f:
+            buffer = np.frombuffer(f.read(), dtype=np.uint8)
+    arrays = {}
+    for name, spec in meta['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        start = meta['data_start'] + spec['offset']
+        count = int(np.prod(spec['shape']))
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+    return meta, arrays
+
+
+class ModelBundle:
+    """Semua yang dibutuhkan untuk serving, dibangun dari isi artefak (tanpa pgmpy/sklearn)."""
+
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        self.version = meta['model_version']
+        self.target = meta['target']
+        self.features = meta['features']
+        self.categories = meta['categories']
+        self.discretizer_bins = {col: ([float(b) for b in bins], labels)
+                                 for col, (bins, labels) in meta['discretizer_bins'].items()}
+        self.medians = meta.get('medians', {})
+        self.preprocessor = Preprocessor(self.discretizer_bins, self.categories, self.medians)
+        self.positive_index = self.categories[self.target].index('1')
+
+        self.cpds = {var: (variables, arrays[f'cpd_{var}']) for var, variables in meta['cpds'].items()}
+        self.posterior_table = PosteriorTable(self.target, meta['posterior_table'], arrays['posterior_table'])
+        self.contribution_tables = ContributionTables(
+            self.target,
+            {feature: (variables, arrays[f'contribution_{feature}'])
+             for feature, variables in meta['contribution_tables'].items()},
+            meta['importance'])
+        tree = meta['junction_tree']
+        self.junction_tree = JunctionTree(
+            self.target,
+            {var: values.shape[0] for var, (_, values) in self.cpds.items()},
+            tree['cliques'],
+            [arrays[f'clique_{i}'] for i in range(len(tree['cliques']))],
+            {i: parent for i, parent in tree['parents']})
+        self.feature_importance = self.contribution_tables.importance_percent()
+
+    @classmethod
+    def load(cls, path=ARTIFACT_PATH, mmap=True):
+        return cls(*read_artifact(path, mmap))
+
+
+@contextmanager
+def export_lock(path):
+    """Kunci antar proses (file `path`.lock) untuk ekspor ulang artefak `path`."""
+    with open(f"{path}.lock", 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _load_current(path, model_path):
+    # Bundle jika artefak ada, valid, dan tidak lebih lama dari model.joblib; selain itu None
+    try:
+        if not (os.path.exists(model_path) and os.path.getmtime(model_path) > os.path.getmtime(path)):
+            return ModelBundle.load(path)
+    except (OSError, KeyError, ValueError):
+        if not os.path.exists(model_path):
+            raise
+    return None
+
+
+def load_bundle(path=ARTIFACT_PATH, model_path=MODEL_PATH):
+    """Muat artefak; ekspor ulang dari model.joblib jika artefak tidak ada, basi, atau versinya lain.
+
+    Semua worker pre-fork melihat model.joblib baru hampir bersamaan: ekspor dikerjakan di bawah
+    export_lock, dan worker yang mendapat lock belakangan memuat hasil ekspor worker pertama.
+    """
+    bundle = _load_current(path, model_path)
+    if bundle is not None:
+        return bundle
+    with export_lock(path):
+        bundle = _load_current(path, model_path)
+        if bundle is not None:
+            return bundle
+        print(f"'{path}' tidak ada/basi, mengekspor ulang dari '{model_path}'...")
+        import joblib
+        export_artifact(joblib.load(model_path), path)
+    return ModelBundle.load(path)
+
+
+if __name__ == '__main__':
+    import sys
+
+    if sys.argv[1:] == ['--info']:
+        meta = read_meta()
+        arrays = meta.pop('arrays')
+        print(json.dumps({**meta, 'arrays': {name: spec['shape'] for name, spec in arrays.items()}}, indent=2))
+        sys.exit()
+
+    import joblib
+
+    print(f"Mengekspor artefak dari '{MODEL_PATH}'...")
+    meta = export_artifact(joblib.load(MODEL_PATH))
+    print(f"Artefak versi {meta['model_version']} ({os.path.getsize(ARTIFACT_PATH) / 1024:.0f} KB) "
+          f"disimpan ke '{ARTIFACT_PATH}'.")
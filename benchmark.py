@@ -0,0 +1,309 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import platform
+import statistics
+import contextlib
+import subprocess
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Benchmark yang bisa diulang untuk jalur inferensi, preprocessing, dan rute Flask, supaya
+# perubahan (upgrade pgmpy, struktur train.py baru, ...) bisa dibandingkan antar run.
+# Berjalan offline: MySQL diganti SQLite in-memory, Gemini diganti mock_gemini.py.
+#
+# Jalankan:  python benchmark.py -o baseline.json
+#            python benchmark.py -o hasil.json --compare baseline.json   (exit 1 jika ada regresi)
+#            python benchmark.py --quick --only inference,routes
+
+SAMPLE_DATA = 'data/heart.csv'
+BATCH_SIZE = 100
+# Regresi = p50 lebih lambat dari baseline lebih dari threshold relatif DAN dari batas absolut ini (ms),
+# supaya noise pada operasi skala mikrodetik tidak ikut ditandai
+REGRESSION_MIN_DELTA_MS = 0.005
+
+SAVE_INFO_EXTRA = {'Name': 'Pasien Benchmark', 'LastRiskPercentage': '50', 'Height': '170', 'Weight': '70',
+                   'FamilyHistory': 'Tidak', 'SmokingStatus': 'Tidak', 'AlcoholIntake': 'Tidak',
+                   'PhysicalActivity': 'Sedang'}
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS SavedInformation (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, Name TEXT NOT NULL, Age INT NOT NULL, Sex TEXT NOT NULL,
+    ChestPainType TEXT NOT NULL, RestingBP INT NOT NULL, Cholesterol INT NOT NULL, FastingBS TEXT NOT NULL,
+    RestingECG TEXT NOT NULL, MaxHR INT NOT NULL, ExerciseAngina TEXT NOT NULL, Oldpeak REAL NOT NULL,
+    ST_Slope TEXT NOT NULL, LastRiskPercentage REAL NOT NULL, Height INT NULL, Weight INT NULL,
+    FamilyHistory TEXT NULL, SmokingStatus TEXT NULL, AlcoholIntake TEXT NULL, PhysicalActivity TEXT NULL,
+    HeartDisease INT NULL, DiagnosedAt TEXT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_saved_name ON SavedInformation (Name, id, LastRiskPercentage);
+"""
+
+
+# --- Pengganti MySQL: subset API mysql-connector yang dipakai app.py, di atas SQLite ---
+class _SQLiteCursor:
+    def __init__(self, conn, dictionary):
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(sql.replace('%s', '?'), tuple(params))
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip([d[0] for d in self._cursor.description], row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+
+class SQLiteConnection:
+    def __init__(self, uri):
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def cursor(self, dictionary=False):
+        return _SQLiteCursor(self._conn, dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect=False):
+        self._conn.execute('SELECT 1')
+
+    def close(self):
+        self._conn.close()
+
+
+def use_sqlite_database(rows, name='benchmark'):
+    """Arahkan pool database ke SQLite in-memory `name` (dibagi semua koneksi) berisi `rows`."""
+    import database
+
+    uri = f'file:{name}?mode=memory&cache=shared'
+    keeper = SQLiteConnection(uri)  # database in-memory hilang jika tidak ada koneksi yang terbuka
+    keeper._conn.executescript(SQLITE_SCHEMA)
+    columns = list(rows[0])
+    keeper._conn.executemany(
+        f"INSERT INTO SavedInformation ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [tuple(row[col] for col in columns) for row in rows])
+    keeper.commit()
+    database.db_pool = database.ConnectionPool(lambda: SQLiteConnection(uri))
+    return keeper
+
+
+# --- Pengukuran ---
+def measure(fn, iterations, warmup=None, items=1):
+    """Jalankan fn(i) sebanyak `iterations` kali (setelah warm-up), kembalikan statistik latensi."""
+    for i in range(warmup if warmup is not None else max(1, iterations // 10)):
+        fn(i)
+    times = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        times.append(time.perf_counter() - start)
+    total = sum(times)
+    result = {
+        'iterations': iterations,
+        'mean_ms': round(statistics.mean(times) * 1000, 4),
+        'p50_ms': round(float(np.percentile(times, 50)) * 1000, 4),
+        'p95_ms': round(float(np.percentile(times, 95)) * 1000, 4),
+        'min_ms': round(min(times) * 1000, 4),
+        'ops_per_sec': round(iterations / total, 1) if total else None,
+    }
+    if items > 1:
+        result['items_per_sec'] = round(iterations * items / total, 1) if total else None
+    return result
+
+
+def sample_records(n=None):
+    df = pd.read_csv(SAMPLE_DATA, dtype={'FastingBS': str})
+    records = df.drop(columns='HeartDisease').head(n).to_dict('records')
+    return [{col: str(value) for col, value in record.items()} for record in records]
+
+
+def run_benchmarks(scale=1.0, only=None):
+    def iterations(n):
+        return max(5, int(n * scale))
+
+    def enabled(group):
+        return only is None or group in only
+
+    results = {}
+
+    def run(name, group, fn, n, **kwargs):
+        if enabled(group):
+            # stdout sedang dialihkan (lihat di bawah); progres ke stderr
+            print(f"  {name}...", file=sys.stderr, flush=True)
+            results[name] = measure(fn, iterations(n), **kwargs)
+
+    from artifact import ModelBundle, ARTIFACT_PATH
+    run('model_load', 'model', lambda i: ModelBundle.load(ARTIFACT_PATH), 50, warmup=2)
+
+    # stdout app (print per prediksi) dibuang selama pengukuran
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        import app
+    from scoring import BatchScorer
+    import gemini_client
+    import mock_gemini
+
+    bundle = app.model_reloader.bundle
+    records = sample_records()
+    partial_records = [{k: v for k, v in record.items() if k != 'ST_Slope'} for record in records]
+    evidences = [app.preprocess_input(bundle, record)[0] for record in records]
+    partial_evidences = [app.preprocess_input(bundle, record)[0] for record in partial_records]
+
+    def pick(items, i):
+        return items[i % len(items)]
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        run('preprocess_input', 'preprocessing', lambda i: app.preprocess_input(bundle, pick(records, i)), 5000)
+
+        def infer(evidence):
+            posterior = app.compute_posterior(bundle, evidence)
+            return app.explain_prediction(bundle, evidence, posterior)
+        run('inference_single', 'inference', lambda i: infer(pick(evidences, i)), 5000)
+        run('inference_single_partial', 'inference', lambda i: infer(pick(partial_evidences, i)), 1000)
+        run('what_if', 'inference', lambda i: app.what_if(bundle, pick(evidences, i)), 1000)
+
+        frame = pd.DataFrame.from_records(records)
+        scorer = BatchScorer.from_bundle(bundle)
+        run('inference_batch', 'inference', lambda i: scorer.score(frame), 50, items=len(frame))
+
+        client = app.app.test_client()
+        batch = records[:BATCH_SIZE]
+
+        def request(method, path, **kwargs):
+            response = client.open(path, method=method, **kwargs)
+            if response.status_code != 200:
+                raise RuntimeError(f"{method} {path} -> HTTP {response.status_code}")
+            return response
+
+        def post(path, **kwargs):
+            return request('POST', path, **kwargs)
+
+        run('route_predict', 'routes', lambda i: post('/predict', data=pick(records, i)), 1000)
+        run('route_predict_uncached', 'routes',
+            lambda i: (app.prediction_cache.clear(), post('/predict', data=pick(records, i))), 1000)
+        run('route_what_if', 'routes', lambda i: post('/api/what_if', json=pick(records, i)), 500)
+        run('route_predict_batch', 'routes', lambda i: post('/api/predict_batch', json=batch), 100,
+            items=len(batch))
+
+        if enabled('database'):
+            keeper = use_sqlite_database([{**record, 'Name': f"Pasien {i:04d}", 'LastRiskPercentage': 50.0}
+                                          for i, record in enumerate(records)])
+            run('route_save_info', 'database',
+                lambda i: post('/save_info', data={**pick(records, i), **SAVE_INFO_EXTRA}), 500)
+            run('route_get_saved_users', 'database',
+                lambda i: request('GET', '/get_saved_users?limit=50&q=Pasien'), 500)
+            keeper.close()
+
+        if enabled('gemini'):
+            mock_server, gemini_client.GEMINI_API_BASE = mock_gemini.start_in_thread()
+            # Nama berbeda tiap iterasi supaya tidak kena cache jawaban Gemini
+            run('route_gemini_advice', 'gemini',
+                lambda i: post('/get_gemini_advice', json={'formData': {**pick(records, i), 'Name': f"B{i}"}}), 200)
+            mock_server.shutdown()
+
+        report = {**records[0], 'Name': 'Pasien Benchmark', 'risk': 76.3, 'risk_category': 'Sangat Tinggi',
+                  'reasons': ['Kolesterol Tinggi (239 mg/dl)'], 'ai_advice': '**Saran**\n* Olahraga teratur'}
+        run('route_export_report', 'reports', lambda i: post('/export_report', json=report), 30, warmup=3)
+
+    return results, bundle.version
+
+
+def environment(model_version):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'model_version': model_version,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(baseline, current, threshold):
+    """Bandingkan p50 tiap benchmark; kembalikan daftar nama yang regresi."""
+    regressions = []
+    print(f"\n{'benchmark':<28} {'baseline p50':>13} {'sekarang p50':>13} {'perubahan':>10}")
+    for name, result in current['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if old is None:
+            print(f"{name:<28} {'-':>13} {result['p50_ms']:>10.4f} ms {'baru':>10}")
+            continue
+        change = result['p50_ms'] / old['p50_ms'] - 1 if old['p50_ms'] else 0.0
+        regressed = change > threshold and result['p50_ms'] - old['p50_ms'] > REGRESSION_MIN_DELTA_MS
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<28} {old['p50_ms']:>10.4f} ms {result['p50_ms']:>10.4f} ms {change:>+9.1%}"
+              f"{'  REGRESI' if regressed else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark inferensi, preprocessing, dan rute Flask (offline).")
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help="File JSON hasil")
+    parser.add_argument('--compare', help="File JSON hasil run sebelumnya sebagai baseline")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Batas perlambatan relatif p50 sebelum ditandai regresi (0.2 = 20%%)")
+    parser.add_argument('--quick', action='store_true', help="Iterasi 10x lebih sedikit (cek cepat, lebih noisy)")
+    parser.add_argument('--only', help="Grup dipisah koma: model,preprocessing,inference,routes,database,gemini,reports")
+    args = parser.parse_args(argv)
+
+    # Watcher reload model tidak dibutuhkan selama benchmark
+    os.environ.setdefault('MODEL_WATCH_INTERVAL', '0')
+    only = set(args.only.split(',')) if args.only else None
+
+    print("Menjalankan benchmark...")
+    results, model_version = run_benchmarks(scale=0.1 if args.quick else 1.0, only=only)
+    output = {'environment': environment(model_version), 'quick': args.quick, 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2)
+    print(f"Hasil disimpan ke '{args.output}'.")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, output, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark lebih lambat dari baseline: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nTidak ada regresi.")
+    else:
+        for name, result in results.items():
+            print(f"{name:<28} p50 {result['p50_ms']:>10.4f} ms  p95 {result['p95_ms']:>10.4f} ms")
+
+
+if __name__ == '__main__':
+    main()
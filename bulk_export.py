@@ -0,0 +1,197 @@
+import os
+import re
+import argparse
+import multiprocessing
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from database import get_db_connection
+from preprocessing import CATEGORICAL_FEATURES, categorize_risk, build_reasons_batch
+from report_pdf import build_report_pdf
+from bulkhead import Bulkhead
+
+# Ekspor massal laporan PDF pasien tersimpan (tabel SavedInformation) ke satu file zip.
+# Baris dibaca bertahap dari MySQL, PDF dirender paralel di process pool dengan jumlah
+# render in-flight yang dibatasi, dan zip ditulis sebagai stream (tidak ada zip utuh di memori).
+#
+# CLI:  python bulk_export.py --risk-above 70 -o laporan.zip
+#       python bulk_export.py --ids 1 2 3 -o laporan.zip
+
+# Jumlah baris per query, proses render, dan render in-flight per proses
+BULK_FETCH_SIZE = int(os.environ.get('BULK_FETCH_SIZE', 500))
+BULK_EXPORT_WORKERS = int(os.environ.get('BULK_EXPORT_WORKERS', os.cpu_count() or 1))
+BULK_IN_FLIGHT_PER_WORKER = 4
+# Ekspor lewat web memakai semua core; batasi berapa yang boleh berjalan bersamaan
+BULK_EXPORT_MAX_CONCURRENT = int(os.environ.get('BULK_EXPORT_MAX_CONCURRENT', 1))
+
+bulkhead = Bulkhead('bulk_export', BULK_EXPORT_MAX_CONCURRENT, 0, 0, 30)
+
+SAVED_COLUMNS = ("id, Name, Age, Sex, ChestPainType, RestingBP, Cholesterol, FastingBS, RestingECG, "
+                 "MaxHR, ExerciseAngina, Oldpeak, ST_Slope, LastRiskPercentage")
+
+
+def iter_saved_rows(ids=None, risk_above=None, batch_size=BULK_FETCH_SIZE):
+    """Generator batch baris SavedInformation (list of dict), urut berdasarkan id.
+
+    Tiap batch memakai koneksi pool sendiri (keyset pada id), jadi koneksi tidak
+    tertahan selama PDF dirender atau selama klien lambat mengunduh zip.
+    """
+    if ids is not None:
+        ids = sorted({int(i) for i in ids})
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            sql = (f"SELECT {SAVED_COLUMNS} FROM SavedInformation "
+                   f"WHERE id IN ({', '.join(['%s'] * len(chunk))}) ORDER BY id")
+            with get_db_connection() as conn:
+                with conn.cursor(dictionary=True) as cursor:
+                    cursor.execute(sql, chunk)
+                    rows = cursor.fetchall()
+            if rows:
+                yield rows
+        return
+
+    last_id = 0
+    while True:
+        conditions, params = ["id > %s"], [last_id]
+        if risk_above is not None:
+            conditions.append("LastRiskPercentage > %s")
+            params.append(float(risk_above))
+        sql = (f"SELECT {SAVED_COLUMNS} FROM SavedInformation WHERE {' AND '.join(conditions)} "
+               f"ORDER BY id LIMIT %s")
+        with get_db_connection() as conn:
+            with conn.cursor(dictionary=True) as cursor:
+                cursor.execute(sql, params + [batch_size])
+                rows = cursor.fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+def report_filename_for(row):
+    name = re.sub(r'[^A-Za-z0-9_-]+', '_', str(row['Name'])).strip('_') or 'Pasien'
+    return f"{row['id']:06d}_{name}.pdf"
+
+
+def report_payloads(row_batches, preprocessor):
+    """Ubah batch baris database menjadi (nama file, data laporan) untuk build_report_pdf."""
+    for rows in row_batches:
+        # Alasan risiko dari aturan dan Preprocessor model yang sama dengan /predict (nilai 0 diganti
+        # median training; diskretisasi per kolom untuk satu batch)
+        labels, values = {}, {}
+        for col in preprocessor.edges:
+            values[col] = preprocessor.impute(col, np.asarray([row[col] for row in rows], dtype=np.float64))
+            labels[col] = preprocessor.discretize(col, values[col])
+        for col in CATEGORICAL_FEATURES:
+            labels[col] = values[col] = np.asarray([str(row[col]) for row in rows], dtype=object)
+        reasons = build_reasons_batch(labels, values)
+
+        for row, row_reasons in zip(rows, reasons):
+            risk = round(float(row['LastRiskPercentage']), 2)
+            data = {col: row[col] for col in row if col not in ('id', 'LastRiskPercentage')}
+            data['FastingBS'] = str(row['FastingBS'])
+            data['risk'] = risk
+            data['risk_category'] = categorize_risk(risk)[1]
+            data['reasons'] = row_reasons
+            yield report_filename_for(row), data
+
+
+def render_reports(payloads, feature_importance, workers=BULK_EXPORT_WORKERS, max_in_flight=None):
+    """Render paralel; hasil (nama file, pdf bytes atau exception) dikembalikan sesuai urutan input.
+
+    Paling banyak max_in_flight render yang sudah dikirim tapi belum diambil,
+    sehingga memori tetap konstan berapapun jumlah pasiennya.
+    """
+    max_in_flight = max_in_flight or workers * BULK_IN_FLIGHT_PER_WORKER
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        try:
+            for filename, data in payloads:
+                pending.append((filename, pool.submit(build_report_pdf, data, feature_importance)))
+                if len(pending) >= max_in_flight:
+                    yield _collect(*pending.popleft())
+            while pending:
+                yield _collect(*pending.popleft())
+        finally:
+            # Klien memutus unduhan: batalkan render yang belum mulai
+            for _, future in pending:
+                future.cancel()
+
+
+def _collect(filename, future):
+    try:
+        return filename, future.result()
+    except Exception as e:
+        return filename, e
+
+
+class _ZipSink:
+    """Target tulis zipfile yang tidak bisa di-seek; isinya diambil per potongan."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(reports):
+    """Generator potongan bytes file zip dari iterable (nama file, pdf bytes atau exception).
+
+    PDF dari ReportLab sudah terkompresi, jadi disimpan tanpa kompresi ulang (ZIP_STORED).
+    Render yang gagal dicatat di errors.txt di akhir arsip.
+    """
+    sink = _ZipSink()
+    errors = []
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for filename, pdf in reports:
+            if isinstance(pdf, Exception):
+                errors.append(f"{filename}: {pdf}")
+                continue
+            zf.writestr(zipfile.ZipInfo(filename, datetime.now().timetuple()[:6]), pdf)
+            yield sink.drain()
+        if errors:
+            zf.writestr('errors.txt', '\n'.join(errors) + '\n')
+    yield sink.drain()
+
+
+def export_zip(row_batches, bundle, workers=BULK_EXPORT_WORKERS):
+    """Zip laporan (stream bytes) untuk batch baris; `bundle` = model aktif (preprocessor, feature importance)."""
+    return iter_zip(render_reports(report_payloads(row_batches, bundle.preprocessor), bundle.feature_importance,
+                                   workers))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ekspor laporan PDF pasien tersimpan ke satu file zip.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--ids', type=int, nargs='+', help="Daftar id SavedInformation")
+    group.add_argument('--risk-above', type=float, help="Semua pasien dengan LastRiskPercentage di atas nilai ini")
+    parser.add_argument('-o', '--output', default='laporan.zip', help="File zip tujuan")
+    parser.add_argument('--workers', type=int, default=BULK_EXPORT_WORKERS, help="Jumlah proses render")
+    args = parser.parse_args()
+
+    from artifact import load_bundle
+    bundle = load_bundle()
+
+    start = time.perf_counter()
+    with open(args.output, 'wb') as f:
+        rows = iter_saved_rows(ids=args.ids, risk_above=args.risk_above)
+        for chunk in export_zip(rows, bundle, workers=args.workers):
+            f.write(chunk)
+    with zipfile.ZipFile(args.output) as zf:
+        count = sum(1 for name in zf.namelist() if name.endswith('.pdf'))
+    print(f"{count} laporan ditulis ke '{args.output}' dalam {time.perf_counter() - start:.1f} detik.")
@@ -0,0 +1,74 @@
+import threading
+from contextlib import contextmanager
+
+# Bulkhead: batasi berapa banyak thread worker yang boleh "terjebak" menunggu
+# dependency lambat (misal Gemini), supaya rute lain (/predict, /save_info)
+# selalu punya thread tersisa. Request yang tidak kebagian tempat langsung
+# ditolak (HTTP 503 + Retry-After) alih-alih ikut mengantre tanpa batas.
+
+
+class BulkheadFull(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Bulkhead:
+    """Isolasi berbasis semaphore: max_concurrent berjalan, max_queue menunggu.
+
+    Di WSGI thread request tetap harus menunggu hasil upstream, jadi executor
+    terpisah tidak membebaskan worker; yang penting adalah membatasi jumlah
+    thread yang boleh tertahan dan menolak sisanya secepat mungkin.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout, retry_after):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._admission = threading.BoundedSemaphore(max_concurrent + max_queue)
+        self._running = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queued = 0
+        self._counters = {'accepted': 0, 'rejected_queue_full': 0, 'rejected_timeout': 0}
+
+    @contextmanager
+    def slot(self):
+        if not self._admission.acquire(blocking=False):
+            with self._lock:
+                self._counters['rejected_queue_full'] += 1
+            raise BulkheadFull(f"Bulkhead '{self.name}' penuh (antrian {self.max_queue}).", self.retry_after)
+        try:
+            with self._lock:
+                self._queued += 1
+            acquired = self._running.acquire(timeout=self.queue_timeout)
+            with self._lock:
+                self._queued -= 1
+                if acquired:
+                    self._active += 1
+                    self._counters['accepted'] += 1
+                else:
+                    self._counters['rejected_timeout'] += 1
+            if not acquired:
+                raise BulkheadFull(f"Bulkhead '{self.name}': menunggu slot lebih dari {self.queue_timeout} detik.",
+                                   self.retry_after)
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._active -= 1
+                self._running.release()
+        finally:
+            self._admission.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'active': self._active,
+                'queued': self._queued,
+                **self._counters,
+            }
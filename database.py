@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from collections import deque
+import mysql.connector
+
+# Konfigurasi database (bisa di-override lewat environment variable)
+db_config = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', ''),
+    'database': os.environ.get('DB_NAME', 'heart_disease')
+}
+
+# Ukuran pool, batas waktu menunggu koneksi (detik), dan interval health check (detik)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))
+DB_POOL_HEALTH_CHECK = float(os.environ.get('DB_POOL_HEALTH_CHECK', 30))
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    """Proxy koneksi MySQL; close()/keluar dari `with` mengembalikan koneksi ke pool."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+
+class ConnectionPool:
+    """Pool koneksi dengan ukuran maksimum, timeout acquire, dan health check.
+
+    Koneksi dibuat secara lazy sampai max_size. Koneksi idle yang sudah lama
+    tidak dipakai di-ping dulu sebelum diberikan lagi; yang mati dibuang.
+    """
+
+    def __init__(self, connect, max_size=DB_POOL_SIZE, acquire_timeout=DB_POOL_TIMEOUT,
+                 health_check_interval=DB_POOL_HEALTH_CHECK):
+        self._connect = connect
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self._idle = deque()  # (koneksi, waktu terakhir dipakai)
+        self._cond = threading.Condition()
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._counters = {'created': 0, 'closed': 0, 'acquired': 0, 'timeouts': 0, 'health_check_failures': 0}
+
+    def acquire(self, timeout=None):
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            conn, last_used = self._reserve(deadline, timeout)
+            if conn is None:
+                conn = self._create()
+            elif time.monotonic() - last_used > self.health_check_interval and not self._is_healthy(conn):
+                self._discard(conn)
+                continue
+            with self._cond:
+                self._counters['acquired'] += 1
+            return PooledConnection(self, conn)
+
+    def _reserve(self, deadline, timeout):
+        # Ambil koneksi idle atau "slot" untuk koneksi baru; tunggu jika pool penuh
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._idle:
+                        self._in_use += 1
+                        return self._idle.pop()
+                    if self._size < self.max_size:
+                        self._size += 1
+                        self._in_use += 1
+                        return None, None
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolTimeout(f"Tidak ada koneksi database tersedia dalam {timeout} detik "
+                                          f"(pool penuh: {self.max_size}).")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+    def _create(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._counters['created'] += 1
+        return conn
+
+    def _is_healthy(self, conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._cond:
+                self._counters['health_check_failures'] += 1
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._in_use -= 1
+            self._counters['closed'] += 1
+            self._cond.notify()
+
+    def release(self, conn):
+        # Batalkan transaksi yang tidak di-commit agar koneksi bersih (dan snapshot baca tidak basi)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                **self._counters,
+            }
+
+
+db_pool = ConnectionPool(lambda: mysql.connector.connect(**db_config))
+
+
+def get_db_connection():
+    try:
+        return db_pool.acquire()
+    except Exception as e:
+        print(f"Error koneksi ke database: {e}")
+        raise
@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import argparse
+import platform
+import warnings
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from artifact import ModelBundle, build_artifact
+from preprocessing import CATEGORICAL_FEATURES, NUMERIC_FEATURES, TARGET, Preprocessor
+from rebalancing import REBALANCE_METHODS, rebalance
+from scoring import BatchScorer
+from structure_learning import STRUCTURE_SCORES, FamilyScorer, ParallelHillClimb
+from sufficient_stats import SufficientStats, column_counts, encode_frame, fit_encoders, read_training_csv
+
+# Evaluasi model dengan k-fold cross-validation (stratified) atas seluruh pipeline training:
+# preprocess (median, encoder) -> rebalancing -> pencarian struktur -> CPD, semuanya di-fit
+# hanya pada data latih fold. Fold berjalan paralel di process pool; fold uji diskor seperti
+# di produksi (BatchScorer: diskretisasi + lookup tabel posterior sekaligus untuk semua baris),
+# lalu metrik per fold dan gabungan (prediksi out-of-fold) ditulis ke laporan JSON.
+#
+# CLI:  python evaluate.py --folds 5 --jobs 4 -o evaluation_report.json
+
+CALIBRATION_BINS = 10
+
+
+def fit_pipeline(train_df, rebalance_method='smote-tomek', score='bic', equivalent_sample_size=10,
+                 max_indegree=None, seed=42):
+    """Latih model dari DataFrame mentah (seperti train.py); kembalikan (ModelBundle, info)."""
+    seconds = {}
+    start = time.perf_counter()
+    medians, encoders, discretizer_bins = fit_encoders(column_counts(train_df))
+    preprocessor = Preprocessor.from_encoders(discretizer_bins, encoders, medians)
+    codes = encode_frame(train_df, preprocessor)
+    data = pd.DataFrame({col: codes[col] for col in train_df.columns})
+    seconds['preprocess'] = time.perf_counter() - start
+
+    X, y, class_weights, seconds['rebalance'] = rebalance(
+        rebalance_method, data.drop(columns=TARGET), data[TARGET], random_state=seed, n_jobs=1)
+    resampled = pd.concat([X, y], axis=1)
+
+    start = time.perf_counter()
+    codes = {col: resampled[col].to_numpy() for col in resampled.columns}
+    cards = {col: len(encoders[col].classes_) for col in resampled.columns}
+    stats = SufficientStats(cards, medians=medians, class_weights=class_weights)
+    scorer = FamilyScorer(codes, cards, score, equivalent_sample_size, weights=stats.row_weights(codes))
+    hc = ParallelHillClimb(scorer)
+    edges = hc.estimate(max_indegree=max_indegree, seed=seed)
+    seconds['structure'] = time.perf_counter() - start
+
+    from pgmpy.models import DiscreteBayesianNetwork
+
+    start = time.perf_counter()
+    model = DiscreteBayesianNetwork(edges)
+    stats.fit_families(model, scorer)
+    model.add_cpds(*stats.cpds())
+    package = {'model': model, 'encoders': encoders, 'discretizer_bins': discretizer_bins, 'medians': medians,
+               'all_features': NUMERIC_FEATURES + CATEGORICAL_FEATURES}
+    bundle = ModelBundle(*build_artifact(package))
+    seconds['fit'] = time.perf_counter() - start
+    return bundle, {'train_rows': len(train_df), 'resampled_rows': len(resampled), 'edges': edges,
+                    'structure_score': hc.best_score, 'seconds': seconds}
+
+
+def predict_proba(bundle, df):
+    """P(HeartDisease=1) per baris lewat skoring batch; NaN untuk baris yang tidak bisa diskor."""
+    scorer = BatchScorer.from_bundle(bundle)
+    codes, _, _, errors = scorer.preprocess(df)
+    probability = scorer.posterior(codes, errors)[:, bundle.positive_index]
+    probability[pd.notna(errors)] = np.nan
+    return probability
+
+
+def calibration_table(y_true, probability, bins=CALIBRATION_BINS):
+    edges = np.linspace(0, 1, bins + 1)
+    index = np.clip(np.digitize(probability, edges[1:-1]), 0, bins - 1)
+    table = []
+    for b in range(bins):
+        mask = index == b
+        if mask.any():
+            table.append({'bin': [round(edges[b], 2), round(edges[b + 1], 2)], 'count': int(mask.sum()),
+                          'mean_predicted': float(probability[mask].mean()),
+                          'observed_rate': float(y_true[mask].mean())})
+    return table
+
+
+def classification_metrics(y_true, probability, threshold=0.5):
+    from sklearn import metrics as skm
+
+    y_true = np.asarray(y_true, dtype=int)
+    predicted = (probability >= threshold).astype(int)
+    calibration = calibration_table(y_true, probability)
+    tn, fp, fn, tp = skm.confusion_matrix(y_true, predicted, labels=[0, 1]).ravel()
+    return {
+        'rows': int(len(y_true)),
+        'accuracy': float(skm.accuracy_score(y_true, predicted)),
+        'precision': float(skm.precision_score(y_true, predicted, zero_division=0)),
+        'recall': float(skm.recall_score(y_true, predicted, zero_division=0)),
+        'specificity': float(tn / (tn + fp)) if tn + fp else 0.0,
+        'f1': float(skm.f1_score(y_true, predicted, zero_division=0)),
+        'roc_auc': float(skm.roc_auc_score(y_true, probability)) if len(set(y_true)) > 1 else None,
+        'brier': float(skm.brier_score_loss(y_true, probability)),
+        'log_loss': float(skm.log_loss(y_true, np.clip(probability, 1e-15, 1 - 1e-15), labels=[0, 1])),
+        # Expected calibration error: rata-rata |prediksi - kejadian| per bin, dibobot jumlah baris
+        'ece': float(sum(b['count'] * abs(b['mean_predicted'] - b['observed_rate']) for b in calibration)
+                     / len(y_true)),
+        'confusion_matrix': {'tn': int(tn), 'fp': int(fp), 'fn': int(fn), 'tp': int(tp)},
+    }
+
+
+# --- Process pool: data dikirim sekali per worker, tiap task hanya indeks fold ---
+_worker_data = None
+
+
+def _init_worker(data):
+    global _worker_data
+    warnings.filterwarnings('ignore')
+    _worker_data = data
+
+
+def run_fold(fold, train_index, test_index, options, data=None):
+    data = _worker_data if data is None else data
+    bundle, info = fit_pipeline(data.iloc[train_index], **options)
+    test = data.iloc[test_index]
+    start = time.perf_counter()
+    probability = predict_proba(bundle, test)
+    info['seconds']['score'] = time.perf_counter() - start
+    info.update(fold=fold, test_rows=len(test), model_version=bundle.version)
+    return info, test_index, probability
+
+
+def cross_validate(data, folds=5, jobs=1, seed=42, **options):
+    """k-fold stratified CV; kembalikan ([(info, indeks uji) per fold], probabilitas out-of-fold per baris)."""
+    from sklearn.model_selection import StratifiedKFold
+
+    splits = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(data, data[TARGET])
+    tasks = [(fold, train_index, test_index, {**options, 'seed': seed})
+             for fold, (train_index, test_index) in enumerate(splits)]
+    if jobs <= 1:
+        results = [run_fold(*task, data=data) for task in tasks]
+    else:
+        # 'spawn': sama seperti pool lain di repo ini (aman dari proses multi-thread)
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(data,)) as pool:
+            results = list(pool.map(run_fold, *zip(*tasks)))
+
+    probability = np.full(len(data), np.nan)
+    for info, test_index, fold_probability in results:
+        probability[test_index] = fold_probability
+    return [(info, test_index) for info, test_index, _ in results], probability
+
+
+def evaluate(data, folds=5, jobs=1, seed=42, threshold=0.5, **options):
+    """Jalankan CV dan susun laporan: metrik out-of-fold gabungan, per fold, dan mean/std antar fold."""
+    start = time.perf_counter()
+    fold_infos, probability = cross_validate(data, folds, jobs, seed, **options)
+    y_true = (data[TARGET].astype(str) == '1').to_numpy()
+    scored = ~np.isnan(probability)
+
+    fold_reports = []
+    for info, test_index in fold_infos:
+        mask = scored[test_index]
+        fold_reports.append({
+            **{key: value for key, value in info.items() if key != 'edges'},
+            'edges': [list(edge) for edge in info['edges']],
+            'seconds': {stage: round(value, 4) for stage, value in info['seconds'].items()},
+            'scored_rows_per_sec': round(info['test_rows'] / info['seconds']['score']) if info['seconds']['score'] else None,
+            'metrics': classification_metrics(y_true[test_index][mask], probability[test_index][mask], threshold),
+        })
+
+    summary = {}
+    for name in ('accuracy', 'precision', 'recall', 'specificity', 'f1', 'roc_auc', 'brier', 'log_loss', 'ece'):
+        values = [fold['metrics'][name] for fold in fold_reports if fold['metrics'][name] is not None]
+        summary[name] = {'mean': float(np.mean(values)), 'std': float(np.std(values))}
+
+    return {
+        'config': {'folds': folds, 'jobs': jobs, 'seed': seed, 'threshold': threshold, **options},
+        'rows': int(len(data)),
+        'unscored_rows': int((~scored).sum()),
+        'overall': classification_metrics(y_true[scored], probability[scored], threshold),
+        'calibration': calibration_table(y_true[scored].astype(int), probability[scored]),
+        'fold_summary': summary,
+        'folds': fold_reports,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validation pipeline training + laporan metrik.")
+    parser.add_argument('--data', default='data/heart.csv', help="File CSV dataset")
+    parser.add_argument('--folds', type=int, default=5, help="Jumlah fold")
+    parser.add_argument('--jobs', type=int, help="Jumlah proses (default: min(folds, jumlah CPU))")
+    parser.add_argument('--seed', type=int, default=42, help="Seed pembagian fold dan rebalancing")
+    parser.add_argument('--threshold', type=float, default=0.5, help="Batas probabilitas untuk kelas positif")
+    parser.add_argument('--rebalance', choices=REBALANCE_METHODS, default='smote-tomek', help="Metode rebalancing")
+    parser.add_argument('--score', choices=STRUCTURE_SCORES, default='bic', help="Skor pencarian struktur")
+    parser.add_argument('--ess', type=float, default=10, help="Equivalent sample size untuk skor bdeu")
+    parser.add_argument('--max-indegree', type=int, help="Batas jumlah parent per node")
+    parser.add_argument('-o', '--output', default='evaluation_report.json', help="File JSON laporan")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings('ignore')
+    jobs = args.jobs or min(args.folds, os.cpu_count() or 1)
+    data = read_training_csv(args.data)
+    print(f"Cross-validation {args.folds} fold atas {len(data)} baris ({jobs} proses, rebalancing {args.rebalance})...")
+    report = evaluate(data, args.folds, jobs, args.seed, args.threshold, rebalance_method=args.rebalance,
+                      score=args.score, equivalent_sample_size=args.ess, max_indegree=args.max_indegree)
+    report['environment'] = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'data': args.data,
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+    }
+
+    print(f"\n{'metrik':<12} {'out-of-fold':>12} {'mean fold':>10} {'std':>8}")
+    for name, values in report['fold_summary'].items():
+        print(f"{name:<12} {report['overall'][name]:>12.4f} {values['mean']:>10.4f} {values['std']:>8.4f}")
+    print(f"\nConfusion matrix (out-of-fold): {report['overall']['confusion_matrix']}")
+    for fold in report['folds']:
+        print(f"Fold {fold['fold']}: {fold['train_rows']} latih / {fold['test_rows']} uji, {len(fold['edges'])} edge, "
+              f"waktu {fold['seconds']}, skoring {fold['scored_rows_per_sec']} baris/detik")
+    if report['unscored_rows']:
+        print(f"{report['unscored_rows']} baris tidak bisa diskor (field tidak valid).")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nLaporan disimpan ke '{args.output}' ({report['seconds']} detik).")
+
+
+if __name__ == '__main__':
+    main()
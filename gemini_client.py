@@ -0,0 +1,228 @@
+import os
+import json
+import hashlib
+import requests
+from requests.adapters import HTTPAdapter
+from caching import LRUCache, SingleFlight
+from bulkhead import Bulkhead
+
+# Klien Google Gemini untuk rute /get_gemini_advice:
+# satu Session (keep-alive) dengan timeout eksplisit, cache LRU+TTL untuk
+# prompt yang identik, dan penggabungan request identik yang sedang berjalan.
+
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', "ISI API KEY DISINI YA VISITOR GITHUB KU")
+GEMINI_API_BASE = os.environ.get('GEMINI_API_BASE', "https://generativelanguage.googleapis.com/v1beta")
+# Default kita set ke 'gemini-2.0-flash' karena di daftar Anda ini yang STATUSNYA ✅ WORKING!
+GEMINI_DEFAULT_MODEL = 'gemini-2.0-flash'
+
+# (connect timeout, read timeout) dalam detik
+GEMINI_TIMEOUT = (float(os.environ.get('GEMINI_CONNECT_TIMEOUT', 5)),
+                  float(os.environ.get('GEMINI_READ_TIMEOUT', 60)))
+GEMINI_POOL_SIZE = int(os.environ.get('GEMINI_POOL_SIZE', 10))
+GEMINI_CACHE_SIZE = int(os.environ.get('GEMINI_CACHE_SIZE', 512))
+GEMINI_CACHE_TTL = float(os.environ.get('GEMINI_CACHE_TTL', 6 * 3600))
+
+# Bulkhead: maksimum panggilan Gemini paralel, panjang antrian, lama menunggu di antrian (detik),
+# dan nilai Retry-After saat ditolak. Jaga MAX_CONCURRENT + MAX_QUEUE < jumlah thread worker.
+GEMINI_MAX_CONCURRENT = int(os.environ.get('GEMINI_MAX_CONCURRENT', 4))
+GEMINI_MAX_QUEUE = int(os.environ.get('GEMINI_MAX_QUEUE', 4))
+GEMINI_QUEUE_TIMEOUT = float(os.environ.get('GEMINI_QUEUE_TIMEOUT', 2))
+GEMINI_RETRY_AFTER = int(os.environ.get('GEMINI_RETRY_AFTER', 5))
+
+INVALID_RESPONSE_TEXT = "Maaf, AI tidak memberikan respons yang valid. Silakan coba lagi."
+
+SYSTEM_PROMPT = (
+    "Anda adalah Dokter Spesialis Jantung (Kardiolog) senior yang ramah, empatik, namun tegas dalam hal kesehatan. "
+    "Tugas Anda: Memberikan interpretasi hasil prediksi risiko jantung dan saran gaya hidup yang PERSONAL."
+    "\nATURAN PENTING:"
+    "\n1. Jangan mendiagnosis secara medis (gunakan bahasa 'berisiko', 'indikasi', dll)."
+    "\n2. Selalu sarankan konsultasi ke dokter sungguhan di akhir."
+    "\n3. Fokuslah menghubungkan 'Data Gaya Hidup' (seperti merokok/berat badan) dengan 'Hasil Prediksi'."
+    "\n4. Gunakan format Markdown (bold, list) agar mudah dibaca."
+    "\n5. Gunakan Bahasa Indonesia yang baik, formal tapi hangat."
+)
+
+
+class GeminiError(Exception):
+    pass
+
+
+def _build_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=GEMINI_POOL_SIZE, pool_maxsize=GEMINI_POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Content-Type': 'application/json', 'x-goog-api-key': GEMINI_API_KEY})
+    return session
+
+
+session = _build_session()
+advice_cache = LRUCache(maxsize=GEMINI_CACHE_SIZE, ttl=GEMINI_CACHE_TTL)
+inflight = SingleFlight()
+bulkhead = Bulkhead('gemini', GEMINI_MAX_CONCURRENT, GEMINI_MAX_QUEUE, GEMINI_QUEUE_TIMEOUT, GEMINI_RETRY_AFTER)
+
+
+def normalize_form_data(form_data):
+    # Samakan representasi input (spasi, angka vs string) supaya prompt yang setara = key cache yang sama
+    return {key: str(value).strip() for key, value in form_data.items() if value is not None}
+
+
+def build_payload(form_data):
+    form_data = normalize_form_data(form_data)
+
+    # Data Medis (Yang dipakai untuk prediksi numerik)
+    data_medis_model = {
+        'Usia': f"{form_data.get('Age')} tahun",
+        'Jenis Kelamin': 'Laki-laki' if form_data.get('Sex') == 'M' else 'Perempuan',
+        'Tipe Nyeri Dada': form_data.get('ChestPainType'),
+        'Tekanan Darah': f"{form_data.get('RestingBP')} mmHg",
+        'Kolesterol': f"{form_data.get('Cholesterol')} mg/dl",
+        'Gula Darah Puasa > 120': 'Ya' if form_data.get('FastingBS') == '1' else 'Tidak',
+        'EKG Istirahat': form_data.get('RestingECG'),
+        'Detak Jantung Maks': form_data.get('MaxHR'),
+        'Angina Olahraga': 'Ya' if form_data.get('ExerciseAngina') == 'Y' else 'Tidak',
+        'Oldpeak (Depresi ST)': form_data.get('Oldpeak'),
+        'ST Slope': form_data.get('ST_Slope')
+    }
+
+    # Data Gaya Hidup (Yang SANGAT PENTING untuk nasihat dokter tapi tidak masuk rumus matematika model)
+    data_gaya_hidup = {
+        'Tinggi Badan': f"{form_data.get('Height')} cm",
+        'Berat Badan': f"{form_data.get('Weight')} kg",
+        'Riwayat Keluarga Jantung': form_data.get('FamilyHistory', 'Tidak ada info'),
+        'Status Merokok': form_data.get('SmokingStatus', 'Tidak ada info'),
+        'Konsumsi Alkohol': form_data.get('AlcoholIntake', 'Tidak ada info'),
+        'Aktivitas Fisik': form_data.get('PhysicalActivity', 'Tidak ada info')
+    }
+
+    # Ambil hasil prediksi persentase terakhir (dikirim dari frontend)
+    hasil_prediksi = form_data.get('LastRiskPercentage', 'Belum diprediksi')
+
+    # User Query (Data Pasien)
+    user_query = (
+        f"Halo Dokter AI. Berikut data pasien saya:\n\n"
+        f"--- DATA UTAMA ---\n"
+        f"Nama: {form_data.get('Name', 'Pasien')}\n"
+        f"HASIL PREDIKSI SISTEM: Risiko Penyakit Jantung {hasil_prediksi}%\n\n"
+        f"--- DATA KLINIS ---\n{json.dumps(data_medis_model, indent=2)}\n\n"
+        f"--- GAYA HIDUP & FISIK ---\n{json.dumps(data_gaya_hidup, indent=2)}\n\n"
+        f"Mohon berikan:\n"
+        f"1. Penjelasan singkat apa arti risiko {hasil_prediksi}% ini.\n"
+        f"2. Analisis faktor gaya hidup saya (terutama {data_gaya_hidup.get('Status Merokok')} dan {data_gaya_hidup.get('Aktivitas Fisik')}).\n"
+        f"3. 3-5 Langkah konkret yang bisa saya lakukan mulai besok untuk menurunkan risiko ini."
+    )
+
+    return {
+        "contents": [{"parts": [{"text": user_query}]}],
+        "systemInstruction": {"parts": [{"text": SYSTEM_PROMPT}]}
+    }
+
+
+def cache_key(model_name, payload):
+    # Prompt sepenuhnya diturunkan dari input yang sudah dinormalisasi, jadi cukup di-hash
+    raw = json.dumps({'model': model_name, 'payload': payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def model_url(model_name, method='generateContent'):
+    return f"{GEMINI_API_BASE}/models/{model_name}:{method}"
+
+
+def _request_advice(model_name, payload):
+    print(f"Mengirim request ke model: {model_name}...") # Debugging log
+    try:
+        response = session.post(model_url(model_name), json=payload, timeout=GEMINI_TIMEOUT)
+    except requests.RequestException as e:
+        raise GeminiError(f"Request ke Gemini gagal: {e}") from e
+
+    if response.status_code != 200:
+        raise GeminiError(f"API Error {response.status_code}: {response.text}")
+
+    # Ambil teks jawaban dengan aman (mengantisipasi struktur JSON yang kosong)
+    try:
+        return response.json()['candidates'][0]['content']['parts'][0]['text']
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+def cached_advice(form_data, model_name=GEMINI_DEFAULT_MODEL):
+    # Cek cache tanpa menyentuh upstream (dipakai sebelum masuk bulkhead). Ini satu-satunya
+    # lookup yang dihitung di hit/miss; get_advice/stream_advice setelahnya hanya peek
+    return advice_cache.get(cache_key(model_name, build_payload(form_data)))
+
+
+def get_advice(form_data, model_name=GEMINI_DEFAULT_MODEL):
+    """Nasihat Gemini untuk data pasien (setelah cached_advice() miss); hasil yang valid di-cache per prompt+model."""
+    payload = build_payload(form_data)
+    key = cache_key(model_name, payload)
+
+    # Bisa sudah diisi request lain selama menunggu slot bulkhead
+    advice_text = advice_cache.peek(key)
+    if advice_text is not None:
+        return advice_text
+
+    def fetch():
+        text = _request_advice(model_name, payload)
+        if text is not None:
+            advice_cache.set(key, text)
+        return text
+
+    advice_text = inflight.do(key, fetch)
+    return advice_text if advice_text is not None else INVALID_RESPONSE_TEXT
+
+
+def _chunk_text(chunk):
+    try:
+        return ''.join(part.get('text', '') for part in chunk['candidates'][0]['content']['parts'])
+    except (KeyError, IndexError, TypeError):
+        return ''
+
+
+def stream_advice(form_data, model_name=GEMINI_DEFAULT_MODEL):
+    """Generator potongan teks dari endpoint streaming Gemini (SSE).
+
+    Dipanggil setelah cached_advice() miss; jawaban yang sudah ada di cache (diisi request lain
+    sementara itu) dikirim sebagai satu potongan. Jawaban lengkap hasil streaming disimpan ke
+    cache yang sama dengan get_advice.
+    """
+    payload = build_payload(form_data)
+    key = cache_key(model_name, payload)
+
+    advice_text = advice_cache.peek(key)
+    if advice_text is not None:
+        yield advice_text
+        return
+
+    print(f"Mengirim request streaming ke model: {model_name}...") # Debugging log
+    try:
+        response = session.post(model_url(model_name, 'streamGenerateContent'), params={'alt': 'sse'},
+                                json=payload, timeout=GEMINI_TIMEOUT, stream=True)
+    except requests.RequestException as e:
+        raise GeminiError(f"Request ke Gemini gagal: {e}") from e
+
+    with response:
+        if response.status_code != 200:
+            raise GeminiError(f"API Error {response.status_code}: {response.text}")
+        response.encoding = 'utf-8'
+        parts = []
+        try:
+            # chunk_size=None: teruskan data segera setelah tiba, jangan tunggu buffer penuh
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line.startswith('data:'):
+                    continue
+                text = _chunk_text(json.loads(line[5:]))
+                if text:
+                    parts.append(text)
+                    yield text
+        except (requests.RequestException, ValueError) as e:
+            raise GeminiError(f"Stream Gemini terputus: {e}") from e
+
+    if parts:
+        advice_cache.set(key, ''.join(parts))
+    else:
+        yield INVALID_RESPONSE_TEXT
+
+
+def stats():
+    return {'cache': advice_cache.stats(), 'in_flight': inflight.in_flight(), 'coalesced': inflight.coalesced,
+            'bulkhead': bulkhead.stats()}
@@ -0,0 +1,385 @@
+import numpy as np
+
+# Mesin inferensi berbasis NumPy untuk Bayesian Network hasil train.py.
+# Semua tabel memakai kode hasil LabelEncoder sebagai indeks sumbu,
+# jadi evidence dari preprocess_input bisa langsung dipakai sebagai indeks array.
+
+TARGET = 'HeartDisease'
+
+
+def extract_cpds(model):
+    """Ambil CPD pgmpy sebagai {variabel: (daftar_variabel, array_nilai)}."""
+    cpds = {}
+    for cpd in model.get_cpds():
+        values = np.asarray(cpd.values, dtype=np.float64)
+        for axis, var in enumerate(cpd.variables):
+            states = [int(s) for s in cpd.state_names[var]]
+            order = np.argsort(states)
+            if sorted(states) != list(range(len(states))):
+                raise ValueError(f"State '{var}' bukan kode 0..k-1: {states}")
+            values = np.take(values, order, axis=axis)
+        cpds[cpd.variable] = (list(cpd.variables), values)
+    return cpds
+
+
+def markov_blanket(cpds, target=TARGET):
+    parents = cpds[target][0][1:]
+    children = [var for var, (variables, _) in cpds.items() if target in variables[1:]]
+    blanket = set(parents) | set(children)
+    for child in children:
+        blanket |= set(cpds[child][0][1:])
+    blanket.discard(target)
+    # Urutan mengikuti urutan node di CPD agar hasilnya deterministik
+    return [var for var in cpds if var in blanket]
+
+
+def moral_neighbors(cpds, var):
+    """Tetangga var di moral graph: parent, child, dan sesama parent dari child-nya."""
+    neighbors = set()
+    for variables, _ in cpds.values():
+        if var in variables:
+            neighbors |= set(variables)
+    neighbors.discard(var)
+    return neighbors
+
+
+def moral_graph(cpds):
+    """Adjacency moral graph: tiap family (variabel + parent-nya) menjadi clique."""
+    adjacency = {var: set() for var in cpds}
+    for variables, _ in cpds.values():
+        for var in variables:
+            adjacency[var] |= set(variables) - {var}
+    return adjacency
+
+
+def min_fill_cliques(adjacency, cards):
+    """Triangulasi dengan eliminasi min-fill; kembalikan clique maksimal (list variabel).
+
+    Tie-break: ukuran tabel clique terkecil, lalu urutan variabel (deterministik).
+    """
+    adjacency = {var: set(neighbors) for var, neighbors in adjacency.items()}
+    order = list(adjacency)
+
+    def cost(var):
+        neighbors = list(adjacency[var])
+        fill = sum(1 for i, a in enumerate(neighbors) for b in neighbors[i + 1:] if b not in adjacency[a])
+        return fill, int(np.prod([cards[v] for v in neighbors + [var]])), order.index(var)
+
+    cliques = []
+    while adjacency:
+        var = min(adjacency, key=cost)
+        neighbors = adjacency.pop(var)
+        for other in neighbors:
+            adjacency[other] |= neighbors - {other}
+            adjacency[other].discard(var)
+        clique = neighbors | {var}
+        # Clique yang muncul belakangan tidak memuat var yang sudah dieliminasi,
+        # jadi cukup cek apakah clique ini bagian dari clique sebelumnya
+        if not any(clique <= other for other in cliques):
+            cliques.append(clique)
+    return [[var for var in order if var in clique] for clique in cliques]
+
+
+def cardinalities(cpds):
+    return {var: values.shape[0] for var, (_, values) in cpds.items()}
+
+
+def marginal(cpds, keep_vars):
+    """Distribusi gabungan P(keep_vars) dengan menjumlahkan variabel lain (einsum)."""
+    index = {var: i for i, var in enumerate(cpds)}
+    operands = []
+    for variables, values in cpds.values():
+        operands.append(values)
+        operands.append([index[v] for v in variables])
+    return np.einsum(*operands, [index[v] for v in keep_vars], optimize=True)
+
+
+def conditional_table(cpds, target, given_vars):
+    """Tabel P(target | given_vars) dengan sumbu [given_vars..., target]."""
+    joint = marginal(cpds, list(given_vars) + [target])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return joint / joint.sum(axis=-1, keepdims=True)
+
+
+def mutual_information(joint):
+    """I(X; Y) dalam bit dari tabel gabungan 2 dimensi P(X, Y)."""
+    joint = joint / joint.sum()
+    independent = joint.sum(axis=1, keepdims=True) * joint.sum(axis=0, keepdims=True)
+    nonzero = joint > 0
+    return float(np.sum(joint[nonzero] * np.log2(joint[nonzero] / independent[nonzero])))
+
+
+class PosteriorTable:
+    """P(target | Markov blanket) yang sudah dikompilasi menjadi array padat.
+
+    Karena form selalu mengirim semua fitur, posterior target cukup
+    ditentukan oleh Markov blanket-nya, sehingga satu prediksi = satu lookup.
+    """
+
+    def __init__(self, target, variables, table):
+        self.target = target
+        self.variables = list(variables)
+        self.table = table
+
+    @classmethod
+    def compile(cls, model, target=TARGET):
+        cpds = extract_cpds(model)
+        variables = markov_blanket(cpds, target)
+        return cls(target, variables, conditional_table(cpds, target, variables))
+
+    def lookup(self, evidence):
+        """Distribusi posterior target, atau None jika evidence blanket tidak lengkap/valid."""
+        try:
+            index = tuple(int(evidence[var]) for var in self.variables)
+        except (KeyError, TypeError, ValueError):
+            return None
+        for i, size in zip(index, self.table.shape):
+            if not 0 <= i < size:
+                return None
+        posterior = self.table[index]
+        if not np.all(np.isfinite(posterior)):
+            return None
+        return posterior
+
+    def sweep(self, evidence):
+        """Posterior untuk setiap state alternatif tiap variabel blanket (fitur lain tetap).
+
+        Semua alternatif (jumlah kardinalitas blanket) diambil dengan satu gather.
+        Kembalikan {variabel: array (kardinalitas, state target)}, atau None jika
+        evidence blanket tidak lengkap/valid.
+        """
+        if self.lookup(evidence) is None:
+            return None
+        cards = self.table.shape[:-1]
+        offsets = np.cumsum((0,) + cards)
+        index = np.tile([int(evidence[var]) for var in self.variables], (offsets[-1], 1))
+        for j, card in enumerate(cards):
+            index[offsets[j]:offsets[j + 1], j] = np.arange(card)
+        rows = self.table[tuple(index.T)]
+        return {var: rows[offsets[j]:offsets[j + 1]] for j, var in enumerate(self.variables)}
+
+    def lookup_batch(self, codes):
+        """Posterior untuk banyak baris sekaligus (codes: {variabel: array kode}).
+
+        Baris dengan kode blanket yang tidak valid (-1/di luar rentang) bernilai NaN.
+        """
+        index = [np.asarray(codes[var], dtype=np.intp) for var in self.variables]
+        valid = np.ones(len(index[0]), dtype=bool)
+        for idx, size in zip(index, self.table.shape):
+            valid &= (idx >= 0) & (idx < size)
+        posterior = self.table[tuple(np.where(valid, idx, 0) for idx in index)]
+        posterior[~valid] = np.nan
+        return posterior
+
+
+class ContributionTables:
+    """Posterior target jika evidence satu fitur dihilangkan (leave-one-out), per fitur.
+
+    Menghilangkan fitur f = memarginalkan f. Di moral graph, blanket target
+    yang baru adalah (N(target) ∪ N(f)) tanpa {f, target}, jadi tiap fitur blanket
+    cukup punya satu tabel kecil. Fitur di luar blanket tidak mengubah posterior
+    selama blanket teramati (kontribusinya 0), sehingga tidak perlu tabel.
+    """
+
+    def __init__(self, target, tables, importance):
+        self.target = target
+        self.tables = tables          # {fitur: (variabel evidence, tabel P(target | variabel))}
+        self.importance = importance  # {fitur: mutual information dengan target (bit)}
+
+    @classmethod
+    def compile(cls, model, target=TARGET):
+        cpds = extract_cpds(model)
+        blanket = markov_blanket(cpds, target)
+        tables = {}
+        for feature in blanket:
+            relevant = (set(blanket) | moral_neighbors(cpds, feature)) - {feature, target}
+            given = [var for var in cpds if var in relevant]
+            tables[feature] = (given, conditional_table(cpds, target, given))
+        importance = {var: mutual_information(marginal(cpds, [var, target])) for var in cpds if var != target}
+        return cls(target, tables, importance)
+
+    def contributions(self, evidence, posterior, positive_index):
+        """{fitur: P(positif | semua evidence) - P(positif | evidence tanpa fitur tsb)}.
+
+        Fitur yang tabelnya butuh evidence yang tidak ada/invalid dilewati.
+        """
+        result = {}
+        for feature, (variables, table) in self.tables.items():
+            try:
+                without = table[tuple(int(evidence[var]) for var in variables)][positive_index]
+            except (KeyError, TypeError, ValueError, IndexError):
+                continue
+            result[feature] = float(posterior[positive_index] - without)
+        return result
+
+    def importance_percent(self):
+        """Mutual information tiap fitur dinormalisasi menjadi persentase (total 100)."""
+        total = sum(self.importance.values())
+        return {f: round(value / total * 100, 1) for f, value in self.importance.items()}
+
+
+class JunctionTree:
+    """Clique tree untuk P(target | evidence sebagian) tanpa VariableElimination per query.
+
+    Dibangun sekali dari CPD: moral graph -> triangulasi min-fill -> clique maksimal ->
+    maximum spanning tree atas ukuran sepset. Jadwal message (post-order menuju clique
+    target) dikompilasi di awal. Evidence masuk sebagai vektor
+    indikator (semua 1 untuk fitur yang tidak diketahui), jadi setiap query menjalankan
+    program einsum yang sama berapapun subset evidence-nya.
+    """
+
+    def __init__(self, target, cards, cliques, potentials, parents):
+        self.target = target
+        self.cards = cards
+        self.cliques = cliques
+        self.potentials = potentials
+        self.parents = parents  # {clique: clique parent}, root = None
+        self.variables = [var for var in cards if var != target]
+        # Baris terakhir (kode -1) = semua 1 = fitur tidak diketahui
+        self._indicators = {var: np.vstack([np.eye(cards[var]), np.ones(cards[var])]) for var in self.variables}
+        self._axis = {var: i for i, var in enumerate(cards)}
+        self._batch_axis = len(cards)
+        self._schedule = self._build_schedule()
+
+    @classmethod
+    def compile(cls, model, target=TARGET):
+        return cls.from_cpds(extract_cpds(model), target)
+
+    @classmethod
+    def from_cpds(cls, cpds, target=TARGET):
+        cards = cardinalities(cpds)
+        cliques = min_fill_cliques(moral_graph(cpds), cards)
+
+        def size(i):
+            return int(np.prod([cards[v] for v in cliques[i]]))
+
+        # Potensial clique = perkalian CPD yang family-nya ditempatkan di clique terkecil yang memuatnya
+        assigned = {i: [] for i in range(len(cliques))}
+        for var, (variables, values) in cpds.items():
+            home = min((i for i, clique in enumerate(cliques) if set(variables) <= set(clique)), key=size)
+            assigned[home].append((variables, values))
+        index = {var: i for i, var in enumerate(cards)}
+        potentials = []
+        for i, clique in enumerate(cliques):
+            operands = [np.ones([cards[v] for v in clique]), [index[v] for v in clique]]
+            for variables, values in assigned[i]:
+                operands += [values, [index[v] for v in variables]]
+            potentials.append(np.einsum(*operands, [index[v] for v in clique]))
+
+        # Maximum spanning tree (Kruskal) dengan bobot = ukuran sepset; sepset kosong
+        # tetap boleh dipakai supaya komponen yang terpisah tetap terhubung jadi satu pohon
+        group = list(range(len(cliques)))
+
+        def find(i):
+            while group[i] != i:
+                group[i] = group[group[i]]
+                i = group[i]
+            return i
+
+        edges = sorted(((-len(set(a) & set(b)), i, j) for i, a in enumerate(cliques)
+                        for j, b in enumerate(cliques) if i < j))
+        neighbors = {i: [] for i in range(len(cliques))}
+        for _, i, j in edges:
+            if find(i) != find(j):
+                group[find(i)] = find(j)
+                neighbors[i].append(j)
+                neighbors[j].append(i)
+
+        root = min((i for i, clique in enumerate(cliques) if target in clique), key=size)
+        parents, stack = {root: None}, [root]
+        while stack:
+            i = stack.pop()
+            for j in neighbors[i]:
+                if j not in parents:
+                    parents[j] = i
+                    stack.append(j)
+        return cls(target, cards, cliques, potentials, parents)
+
+    def _build_schedule(self):
+        # Tiap variabel evidence dimasukkan di satu clique (yang terkecil) yang memuatnya
+        def size(i):
+            return self.potentials[i].size
+        slots = {var: min((i for i, c in enumerate(self.cliques) if var in c), key=size) for var in self.variables}
+
+        # Post-order: anak selalu dijadwalkan sebelum parent-nya; root terakhir
+        root = next(i for i, parent in self.parents.items() if parent is None)
+        children = {i: [j for j, parent in self.parents.items() if parent == i] for i in self.parents}
+        order, stack = [], [root]
+        while stack:
+            i = stack.pop()
+            order.append(i)
+            stack.extend(children[i])
+        order.reverse()
+
+        schedule = []
+        for i in order:
+            parent = self.parents[i]
+            if parent is None:
+                output = [self.target]
+            else:
+                output = [v for v in self.cliques[i] if v in self.cliques[parent]]
+            evidence = [var for var in self.variables if slots[var] == i]
+            sepsets = [(j, [v for v in self.cliques[j] if v in self.cliques[i]]) for j in children[i]]
+            schedule.append((i, output, evidence, sepsets))
+        return schedule
+
+    def _collect(self, indicators, batch):
+        b = [self._batch_axis] if batch else []
+        messages = {}
+        for i, output, evidence, sepsets in self._schedule:
+            operands = [self.potentials[i], [self._axis[v] for v in self.cliques[i]]]
+            for var in evidence:
+                operands += [indicators[var], b + [self._axis[var]]]
+            for j, sepset in sepsets:
+                operands += [messages.pop(j), b + [self._axis[v] for v in sepset]]
+            # Clique di sini kecil: einsum langsung (tanpa optimize) jauh lebih murah per panggilan
+            messages[i] = np.einsum(*operands, b + [self._axis[v] for v in output])
+        (root_message,) = messages.values()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return root_message / root_message.sum(axis=-1, keepdims=True)
+
+    def query(self, evidence):
+        """Distribusi posterior target untuk evidence {variabel: kode} (boleh sebagian).
+
+        Variabel yang tidak ada di evidence (atau berkode -1) dianggap tidak diketahui.
+        Evidence dengan probabilitas nol menghasilkan NaN.
+        """
+        indicators = {}
+        for var in self.variables:
+            code = int(evidence.get(var, -1))
+            if not -1 <= code < self.cards[var]:
+                raise ValueError(f"Kode evidence {var}={code} di luar rentang")
+            indicators[var] = self._indicators[var][code]
+        return self._collect(indicators, batch=False)
+
+    def query_batch(self, codes):
+        """Posterior untuk banyak baris sekaligus (codes: {variabel: array kode}, -1 = tidak diketahui)."""
+        n = len(next(iter(codes.values())))
+        indicators = {}
+        for var in self.variables:
+            column = np.asarray(codes.get(var, np.full(n, -1)), dtype=np.intp)
+            if np.any((column < -1) | (column >= self.cards[var])):
+                raise ValueError(f"Kode evidence {var} di luar rentang")
+            indicators[var] = self._indicators[var][column]
+        return self._collect(indicators, batch=True)
+
+    def leave_one_out(self, evidence, variables):
+        """Posterior tanpa evidence tiap variabel di `variables` (satu baris per variabel), dalam satu query_batch."""
+        codes = {var: np.full(len(variables), int(evidence.get(var, -1))) for var in self.variables}
+        for i, var in enumerate(variables):
+            codes[var][i] = -1
+        return self.query_batch(codes)
+
+    def sweep(self, evidence, variables=None):
+        """Seperti PosteriorTable.sweep, untuk evidence sebagian: {variabel: (kardinalitas, state target)}.
+
+        Semua alternatif dihitung dalam satu query_batch.
+        """
+        variables = [var for var in (variables or self.variables) if var in self.cards and var != self.target]
+        sizes = [self.cards[var] for var in variables]
+        offsets = np.cumsum([0] + sizes)
+        codes = {var: np.full(offsets[-1], int(evidence.get(var, -1))) for var in self.variables}
+        for j, var in enumerate(variables):
+            codes[var][offsets[j]:offsets[j + 1]] = np.arange(sizes[j])
+        rows = self.query_batch(codes)
+        return {var: rows[offsets[j]:offsets[j + 1]] for j, var in enumerate(variables)}
@@ -0,0 +1,174 @@
+import argparse
+import json
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+
+import requests
+
+import mock_gemini
+import gemini_client
+from bulkhead import Bulkhead
+
+# Uji beban bulkhead: banjiri /get_gemini_advice dengan upstream Gemini yang lambat
+# sambil mengukur latensi /predict, dengan bulkhead aktif vs nonaktif.
+#
+# Server WSGI di sini memakai thread pool berukuran tetap (seperti gunicorn --threads N),
+# karena di server seperti itu request Gemini yang lambat benar-benar bisa menghabiskan worker.
+#
+# Jalankan:  python loadtest_bulkhead.py --threads 16 --advice-clients 32 --delay 3
+
+PREDICT_PAYLOAD = {
+    'Age': 54, 'Sex': 'M', 'ChestPainType': 'ASY', 'RestingBP': 140, 'Cholesterol': 239,
+    'FastingBS': 0, 'RestingECG': 'Normal', 'MaxHR': 122, 'ExerciseAngina': 'Y',
+    'Oldpeak': 1.5, 'ST_Slope': 'Flat',
+}
+
+# /predict membaca request.form dan selalu merender index.html; prediksi yang berhasil berisi
+# risiko di input LastRiskPercentage, halaman error berisi banner "Sistem Error"
+RISK_RESULT = re.compile(r'name="LastRiskPercentage" value="(\d+(?:\.\d+)?)"')
+ERROR_BANNER = 'Sistem Error'
+
+
+def is_prediction(response):
+    return (response.status_code == 200 and ERROR_BANNER not in response.text
+            and RISK_RESULT.search(response.text) is not None)
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGIServer dengan jumlah thread worker tetap; request lain menunggu di antrian."""
+
+    def __init__(self, *args, threads=8, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def run_scenario(base_url, duration, advice_clients, predict_interval):
+    stop = threading.Event()
+    advice_status = {}
+    predict_latencies = []
+    predict_failures = []
+    lock = threading.Lock()
+
+    def advice_worker(worker_id):
+        http = requests.Session()
+        n = 0
+        while not stop.is_set():
+            # Nama berbeda tiap request agar tidak kena cache / penggabungan request
+            payload = {'formData': dict(PREDICT_PAYLOAD, Name=f"Pasien {worker_id}-{n}", LastRiskPercentage='75')}
+            n += 1
+            try:
+                status = http.post(f"{base_url}/get_gemini_advice", json=payload, timeout=60).status_code
+            except requests.RequestException:
+                status = 'error'
+            with lock:
+                advice_status[status] = advice_status.get(status, 0) + 1
+            if status == 503:
+                time.sleep(0.2)
+
+    def predict_worker():
+        http = requests.Session()
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                ok = is_prediction(http.post(f"{base_url}/predict", data=PREDICT_PAYLOAD, timeout=60))
+            except requests.RequestException:
+                ok = False
+            (predict_latencies if ok else predict_failures).append((time.perf_counter() - start) * 1000)
+            stop.wait(predict_interval)
+
+    threads = [threading.Thread(target=advice_worker, args=(i,), daemon=True) for i in range(advice_clients)]
+    threads.append(threading.Thread(target=predict_worker, daemon=True))
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join(timeout=120)
+
+    return {
+        'predict_requests': len(predict_latencies),
+        'predict_failures': len(predict_failures),
+        'predict_p50_ms': round(percentile(predict_latencies, 50) or 0, 1),
+        'predict_p99_ms': round(percentile(predict_latencies, 99) or 0, 1),
+        'predict_max_ms': round(max(predict_latencies, default=0), 1),
+        'predict_mean_ms': round(statistics.mean(predict_latencies), 1) if predict_latencies else 0,
+        'advice_status': {str(k): v for k, v in sorted(advice_status.items(), key=lambda kv: str(kv[0]))},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Uji beban bulkhead Gemini vs latensi /predict.")
+    parser.add_argument('--threads', type=int, default=16, help="Jumlah thread worker server WSGI")
+    parser.add_argument('--advice-clients', type=int, default=32, help="Klien paralel yang meminta saran AI")
+    parser.add_argument('--delay', type=float, default=3.0, help="Latensi upstream Gemini tiruan (detik)")
+    parser.add_argument('--duration', type=float, default=10.0, help="Lama tiap skenario (detik)")
+    parser.add_argument('--predict-interval', type=float, default=0.05, help="Jeda antar request /predict (detik)")
+    args = parser.parse_args()
+
+    from app import app
+
+    mock_server, mock_base = mock_gemini.start_in_thread(delay=args.delay)
+    gemini_client.GEMINI_API_BASE = mock_base
+
+    server = make_server('127.0.0.1', 0, app, server_class=partial(PooledWSGIServer, threads=args.threads),
+                         handler_class=_QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    # Pastikan payload benar-benar menghasilkan prediksi sebelum latensinya diukur
+    if not is_prediction(requests.post(f"{base_url}/predict", data=PREDICT_PAYLOAD, timeout=60)):
+        raise SystemExit("ERROR: /predict tidak mengembalikan hasil prediksi untuk PREDICT_PAYLOAD.")
+
+    configured = gemini_client.bulkhead
+    # "Nonaktif" = batas yang tidak pernah tercapai
+    unlimited = Bulkhead('gemini', 10 ** 6, 0, configured.queue_timeout, configured.retry_after)
+
+    results = {}
+    for label, bulkhead in (('bulkhead_off', unlimited), ('bulkhead_on', configured)):
+        gemini_client.bulkhead = bulkhead
+        print(f"Menjalankan skenario {label} ({args.duration} detik)...")
+        results[label] = run_scenario(base_url, args.duration, args.advice_clients, args.predict_interval)
+        results[label]['bulkhead'] = bulkhead.stats()
+        # Tunggu panggilan Gemini yang masih berjalan selesai sebelum skenario berikutnya
+        time.sleep(args.delay + 1)
+
+    results['config'] = {
+        'threads': args.threads, 'advice_clients': args.advice_clients, 'upstream_delay': args.delay,
+        'max_concurrent': configured.max_concurrent, 'max_queue': configured.max_queue,
+        'queue_timeout': configured.queue_timeout, 'upstream_requests': mock_server.stats['requests'],
+    }
+    print(json.dumps(results, indent=2))
+    server.shutdown()
+    mock_server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+# Metrik in-process dalam format teks Prometheus (tanpa dependensi prometheus_client).
+# Satu observasi = perf_counter + bisect + increment di bawah lock (~1 us), jadi aman
+# dibiarkan aktif di produksi. Nilai dihitung per proses: dengan beberapa worker gunicorn,
+# tiap worker punya angka sendiri.
+
+# Batas bucket (detik): dari cache hit (mikrodetik) sampai panggilan Gemini (puluhan detik)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labelvalues -> [jumlah per bucket (+Inf terakhir), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labelvalues, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    labels = _labels(self.labelnames, labelvalues, [('le', _number(bound))])
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                labels = _labels(self.labelnames, labelvalues)
+                lines.append(f'{self.name}_sum{labels} {_number(total)}')
+                lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+REQUESTS = Counter('http_requests_total', "Jumlah request per route, method, dan status.",
+                   ('route', 'method', 'status'))
+REQUEST_SECONDS = Histogram('http_request_duration_seconds',
+                            "Durasi request per route (untuk respons streaming: sampai header dikirim).",
+                            ('route', 'method'))
+STAGE_SECONDS = Histogram('stage_duration_seconds', "Durasi tiap tahap pemrosesan per route.",
+                          ('route', 'stage'))
+
+REGISTRY = [REQUESTS, REQUEST_SECONDS, STAGE_SECONDS]
+
+
+@contextmanager
+def stage(name):
+    """Ukur satu tahap (parse, discretize, encode, inference, render, db, gemini, ...).
+
+    Di dalam request, waktu tahap yang sama dijumlahkan dan dicatat sekali saat request
+    selesai (lihat finish_request); di luar request (misal stream yang berjalan setelah
+    header terkirim) langsung dicatat dengan route '-'.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if has_request_context():
+            stages = g.setdefault('metrics_stages', {})
+            stages[name] = stages.get(name, 0.0) + elapsed
+        else:
+            STAGE_SECONDS.observe(elapsed, '-', name)
+
+
+def start_request():
+    g.metrics_start = time.perf_counter()
+
+
+def finish_request(route, method, status):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, route, method)
+    REQUESTS.inc(route, method, str(status))
+    for name, elapsed in g.pop('metrics_stages', {}).items():
+        STAGE_SECONDS.observe(elapsed, route, name)
+
+
+def render():
+    """Semua metrik dalam format teks Prometheus (text/plain; version=0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.expose())
+    return '\n'.join(lines) + '\n'
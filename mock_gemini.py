@@ -0,0 +1,114 @@
+import argparse
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Server tiruan Google Gemini API untuk pengujian lokal & benchmark (tanpa API key/internet).
+# Mendukung :generateContent (JSON biasa) dan :streamGenerateContent?alt=sse (SSE, chunked).
+#
+# Jalankan:  python mock_gemini.py --port 8765 --delay 0.2 --chunk-delay 0.05
+# Lalu:      GEMINI_API_BASE=http://127.0.0.1:8765/v1beta python app.py
+
+DEFAULT_TEXT = (
+    "**Penjelasan Risiko**\n"
+    "Hasil ini adalah respons dari server Gemini tiruan untuk pengujian lokal.\n"
+    "* Kurangi konsumsi garam dan lemak jenuh.\n"
+    "* Lakukan aktivitas fisik 150 menit per minggu.\n"
+    "* Konsultasikan hasil ini dengan dokter Anda."
+)
+
+
+def _response_json(text):
+    return {'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}, 'finishReason': 'STOP'}]}
+
+
+class MockGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    # Diisi oleh make_server()
+    delay = 0.0
+    chunk_delay = 0.0
+    text = DEFAULT_TEXT
+    status_code = 200
+    stats = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.stats['lock']:
+            self.stats['requests'] += 1
+        try:
+            json.loads(body or b'{}')
+        except ValueError:
+            return self._send_json(400, {'error': {'message': 'Invalid JSON payload'}})
+
+        # Latensi upstream sebelum token pertama
+        time.sleep(self.delay)
+        if self.status_code != 200:
+            return self._send_json(self.status_code, {'error': {'message': 'Mock error'}})
+        if ':streamGenerateContent' in self.path:
+            return self._send_stream()
+        if ':generateContent' in self.path:
+            return self._send_json(200, _response_json(self.text))
+        return self._send_json(404, {'error': {'message': 'Not found'}})
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        words = self.text.split(' ')
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.chunk_delay)
+            piece = word if i == len(words) - 1 else word + ' '
+            event = f"data: {json.dumps(_response_json(piece))}\r\n\r\n".encode('utf-8')
+            self.wfile.write(f"{len(event):X}\r\n".encode('ascii') + event + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def make_server(port=0, delay=0.0, chunk_delay=0.0, text=DEFAULT_TEXT, status_code=200):
+    handler = type('Handler', (MockGeminiHandler,), {
+        'delay': delay, 'chunk_delay': chunk_delay, 'text': text, 'status_code': status_code,
+        'stats': {'requests': 0, 'lock': threading.Lock()},
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    server.stats = handler.stats
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Jalankan server di thread background; kembalikan (server, base_url untuk GEMINI_API_BASE)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1beta"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Server tiruan Gemini API untuk pengujian lokal.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.2, help="Detik sebelum respons/token pertama")
+    parser.add_argument('--chunk-delay', type=float, default=0.05, help="Detik antar potongan saat streaming")
+    parser.add_argument('--status', type=int, default=200, help="Status HTTP yang dikembalikan (uji jalur error)")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.delay, args.chunk_delay, status_code=args.status)
+    print(f"Mock Gemini berjalan di http://127.0.0.1:{server.server_port}/v1beta")
+    print(f"Set GEMINI_API_BASE=http://127.0.0.1:{server.server_port}/v1beta sebelum menjalankan app.py")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
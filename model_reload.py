@@ -0,0 +1,196 @@
+import os
+import time
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from artifact import ARTIFACT_PATH, MODEL_PATH, load_bundle
+from preprocessing import CATEGORICAL_FEATURES
+from scoring import BatchScorer
+
+# Hot reload model tanpa restart server. Artefak baru (atau model.joblib baru, yang lalu
+# diekspor ulang) dimuat di thread background, divalidasi dengan canary (output model lama
+# vs baru pada sampel tetap), di-warm-up, baru kemudian referensi bundle aktif ditukar
+# dengan satu assignment. Request yang sedang berjalan tetap memakai bundle yang diambilnya
+# di awal request, jadi tidak ada request yang melihat campuran model lama dan baru.
+
+# Interval cek perubahan file model (detik, 0 = watcher mati; reload hanya lewat admin)
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 5))
+# Sampel tetap untuk canary: N baris pertama file ini
+MODEL_CANARY_DATA = os.environ.get('MODEL_CANARY_DATA', 'data/heart.csv')
+MODEL_CANARY_SIZE = int(os.environ.get('MODEL_CANARY_SIZE', 200))
+# Model baru ditolak jika rata-rata selisih risiko di sampel canary melebihi ini (poin persen)
+MODEL_CANARY_MAX_MEAN_DIFF = float(os.environ.get('MODEL_CANARY_MAX_MEAN_DIFF', 10))
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class ModelReloader:
+    """Pemegang ModelBundle aktif + pemuat ulang (watcher file dan pemicu manual).
+
+    `bundle` selalu berisi bundle yang sudah lolos validasi; baca sekali per request.
+    `warmup(bundle)` (opsional) dipanggil pada bundle baru sebelum ditukar, dan tiap
+    callable di `on_swap` dipanggil setelahnya (misal untuk mengosongkan cache hasil).
+    """
+
+    def __init__(self, path=ARTIFACT_PATH, model_path=MODEL_PATH, warmup=None,
+                 canary_data=MODEL_CANARY_DATA, canary_size=MODEL_CANARY_SIZE,
+                 max_mean_diff=MODEL_CANARY_MAX_MEAN_DIFF):
+        self.path = path
+        self.model_path = model_path
+        self.warmup = warmup
+        self.on_swap = []
+        self.canary_data = canary_data
+        self.canary_size = canary_size
+        self.max_mean_diff = max_mean_diff
+        self._bundle = load_bundle(path, model_path)
+        self._loaded_at = datetime.now().isoformat(timespec='seconds')
+        self._signature = self._file_signature()
+        self._canary = None
+        self._lock = threading.Lock()  # satu reload dalam satu waktu (watcher vs admin)
+        self._watcher = None
+        self._stop = threading.Event()
+        self._counters = {'swapped': 0, 'unchanged': 0, 'rejected': 0, 'failed': 0}
+        self._last_result = None
+
+    @property
+    def bundle(self):
+        return self._bundle
+
+    def _file_signature(self):
+        return _mtime(self.path), _mtime(self.model_path)
+
+    def canary_sample(self):
+        """DataFrame sampel canary (dibaca sekali), atau None jika filenya tidak ada."""
+        if self._canary is None and os.path.exists(self.canary_data):
+            self._canary = pd.read_csv(self.canary_data, nrows=self.canary_size,
+                                       dtype={col: str for col in CATEGORICAL_FEATURES})
+        return self._canary
+
+    def canary(self, old, new):
+        """Bandingkan risiko bundle lama vs baru pada sampel canary."""
+        df = self.canary_sample()
+        if df is None:
+            # Tanpa sampel: minimal pastikan prior model baru valid
+            prior = new.junction_tree.query({})
+            return {'rows': 0, 'invalid': int(not (np.all(np.isfinite(prior)) and abs(prior.sum() - 1) < 1e-6))}
+        old_scores = BatchScorer.from_bundle(old).score(df, reasons=False)
+        new_scores = BatchScorer.from_bundle(new).score(df, reasons=False)
+        old_risk, new_risk = old_scores['risk'], new_scores['risk']
+        valid = ~np.isnan(old_risk)
+        # Baris yang valid di model lama harus tetap menghasilkan risiko 0-100 di model baru
+        invalid = valid & (np.isnan(new_risk) | (new_risk < 0) | (new_risk > 100))
+        compared = valid & ~invalid
+        diff = np.abs(new_risk[compared] - old_risk[compared])
+        return {
+            'rows': len(df),
+            'invalid': int(invalid.sum()),
+            'mean_abs_diff': round(float(diff.mean()), 4) if len(diff) else 0.0,
+            'max_abs_diff': round(float(diff.max()), 4) if len(diff) else 0.0,
+            'category_changes': int((old_scores['risk_category'][compared] != new_scores['risk_category'][compared]).sum()),
+        }
+
+    def reload(self, force=False):
+        """Muat, validasi, warm-up, lalu tukar bundle. `force` mengabaikan batas selisih canary
+        (tapi tidak mengabaikan baris yang hasilnya tidak valid)."""
+        with self._lock:
+            start = time.perf_counter()
+            old = self._bundle
+            result = {'previous_version': old.version}
+            try:
+                candidate = load_bundle(self.path, self.model_path)
+            except Exception as e:
+                return self._finish('failed', result, start, error=str(e))
+            finally:
+                # Dicatat setelah load (yang bisa mengekspor ulang artefak) dan juga saat gagal/ditolak,
+                # supaya watcher tidak mencoba file yang sama berulang kali; file yang berubah lagi
+                # selama validasi tetap terdeteksi pada pengecekan berikutnya
+                self._signature = self._file_signature()
+            result['version'] = candidate.version
+            if candidate.version == old.version:
+                return self._finish('unchanged', result, start)
+            if candidate.target != old.target or set(candidate.features) != set(old.features):
+                return self._finish('rejected', result, start, error="Fitur/target model baru berbeda dengan model aktif.")
+
+            try:
+                result['canary'] = self.canary(old, candidate)
+            except Exception as e:
+                return self._finish('failed', result, start, error=f"Canary gagal: {e}")
+            if result['canary']['invalid']:
+                return self._finish('rejected', result, start,
+                                    error=f"{result['canary']['invalid']} baris canary menghasilkan risiko tidak valid.")
+            if not force and result['canary'].get('mean_abs_diff', 0) > self.max_mean_diff:
+                return self._finish('rejected', result, start,
+                                    error=f"Rata-rata selisih risiko {result['canary']['mean_abs_diff']} poin "
+                                          f"melebihi batas {self.max_mean_diff} (pakai force untuk tetap memuat).")
+
+            try:
+                if self.warmup is not None:
+                    self.warmup(candidate)
+            except Exception as e:
+                return self._finish('failed', result, start, error=f"Warm-up gagal: {e}")
+
+            # Assignment referensi bersifat atomik; request baru langsung memakai bundle ini
+            self._bundle = candidate
+            self._loaded_at = datetime.now().isoformat(timespec='seconds')
+            for callback in self.on_swap:
+                callback()
+            return self._finish('swapped', result, start)
+
+    def _finish(self, status, result, start, error=None):
+        # Dipanggil dengan lock dipegang
+        result = {'status': status, **result, 'seconds': round(time.perf_counter() - start, 3),
+                  'at': datetime.now().isoformat(timespec='seconds')}
+        if error:
+            result['error'] = error
+        self._counters[status] += 1
+        self._last_result = result
+        message = f"Reload model: {status}"
+        if status == 'swapped':
+            message += f" ({result['previous_version']} -> {result['version']})"
+        print(message + (f" - {error}" if error else ""))
+        return result
+
+    def check(self):
+        """Reload jika file artefak / model.joblib berubah sejak pengecekan terakhir."""
+        if self._file_signature() != self._signature:
+            return self.reload()
+        return None
+
+    def start_watcher(self, interval=MODEL_WATCH_INTERVAL):
+        if interval <= 0 or self._watcher is not None:
+            return
+
+        def watch():
+            while not self._stop.wait(interval):
+                try:
+                    self.check()
+                except Exception as e:
+                    print(f"Error watcher model: {e}")
+
+        self._watcher = threading.Thread(target=watch, name='model-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def stats(self):
+        # Tanpa lock: status tetap bisa dibaca selagi reload berjalan
+        bundle = self._bundle
+        return {
+            'version': bundle.version,
+            'created_at': bundle.meta.get('created_at'),
+            'loaded_at': self._loaded_at,
+            'path': self.path,
+            'watching': self._watcher is not None and not self._stop.is_set(),
+            'reloading': self._lock.locked(),
+            **self._counters,
+            'last_reload': self._last_result,
+        }
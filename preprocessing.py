@@ -0,0 +1,173 @@
+from bisect import bisect_right
+import numpy as np
+
+# Definisi fitur & aturan diskretisasi yang dipakai bersama oleh train.py, app.py, dan bulk_export.py.
+# Satu sumber kebenaran supaya bin saat training dan saat serving tidak bisa berbeda.
+
+CATEGORICAL_FEATURES = ['Sex', 'ChestPainType', 'FastingBS', 'RestingECG', 'ExerciseAngina', 'ST_Slope']
+NUMERIC_FEATURES = ['Age', 'RestingBP', 'Cholesterol', 'MaxHR', 'Oldpeak']
+INTEGER_FEATURES = ['Age', 'RestingBP', 'Cholesterol', 'MaxHR']
+TARGET = 'HeartDisease'
+
+# Bin numerik (batas kiri inklusif, seperti pd.cut(..., right=False))
+DISCRETIZER_BINS = {
+    'Age': ([0, 40, 60, 100], ['<40', '40-60', '>60']),
+    'RestingBP': ([0, 120, 140, 160, 300], ['Normal', 'Elevated', 'High S1', 'High S2']),
+    'Cholesterol': ([0, 200, 240, 600], ['Normal', 'Borderline', 'High']),
+    'MaxHR': ([0, 100, 140, 170, 250], ['Very Low', 'Low', 'Normal', 'High']),
+    'Oldpeak': ([-np.inf, 0, 1, 2.5, np.inf], ['Normal', 'Low', 'Medium', 'High']),
+}
+
+# Label untuk nilai di luar bins (sama dengan str(NaN) hasil pd.cut)
+OUT_OF_RANGE = 'nan'
+
+# Nilai 0 tidak logis pada kolom ini (sesuai deskripsi data Kaggle): diganti median data
+# training, baik saat training maupun saat serving (median disimpan bersama model)
+ZERO_AS_MISSING = ['RestingBP', 'Cholesterol']
+
+# Pasien tanpa satu pun field yang bisa dijadikan evidence: posteriornya hanya prior (base rate),
+# jadi ditolak sebagai error, bukan dilaporkan sebagai prediksi
+NO_EVIDENCE_ERROR = "Tidak ada field pasien yang dikenal"
+
+# (fitur, bin/kategori, template pesan), urutan = urutan tampil di hasil
+REASON_RULES = [
+    ('Age', '>60', "Usia Lanjut ({value} tahun)"),
+    ('RestingBP', 'High S2', "Tekanan Darah Sangat Tinggi ({value} mmHg)"),
+    ('RestingBP', 'High S1', "Tekanan Darah Tinggi ({value} mmHg)"),
+    ('Cholesterol', 'High', "Kolesterol Tinggi ({value} mg/dl)"),
+    ('Cholesterol', 'Borderline', "Kolesterol Borderline ({value} mg/dl)"),
+    ('Oldpeak', 'High', "Depresi ST Sangat Tinggi ({value})"),
+    ('Oldpeak', 'Medium', "Depresi ST Sedang ({value})"),
+    ('ChestPainType', 'ASY', "Nyeri Dada Asymptomatic"),
+    ('ChestPainType', 'TA', "Nyeri Dada Typical Angina"),
+    ('ExerciseAngina', 'Y', "Angina saat Olahraga"),
+    ('ST_Slope', 'Flat', "ST Slope 'Flat'"),
+    ('ST_Slope', 'Down', "ST Slope 'Downsloping'"),
+]
+
+
+# Batas kategori risiko (persentase > batas), dicek berurutan
+RISK_LEVELS = [
+    (70, "text-red-500", "Sangat Tinggi"),
+    (40, "text-yellow-500", "Menengah"),
+]
+RISK_LEVEL_DEFAULT = ("text-green-500", "Rendah")
+
+
+def categorize_risk(risk_percentage):
+    for threshold, color, category in RISK_LEVELS:
+        if risk_percentage > threshold:
+            return color, category
+    return RISK_LEVEL_DEFAULT
+
+
+def _is_scalar(value):
+    # np.ndim terlalu mahal untuk jalur satu pasien; ini cukup untuk input form/JSON
+    return value is None or np.isscalar(value)
+
+
+def category_label(value):
+    """Label kategori dari nilai mentah: float bulat jadi int ('1', bukan '1.0').
+
+    Kolom kategorikal berisi angka (FastingBS) menjadi float64 di pandas begitu ada satu nilai
+    kosong (JSON tanpa field itu, Parquet nullable int), padahal encoder mengenal '0'/'1'.
+    """
+    if isinstance(value, (float, np.floating)) and np.isfinite(value) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def impute_zero(values, median):
+    """Ganti nilai 0 dengan `median` (skalar atau array; NaN dibiarkan)."""
+    if _is_scalar(values):
+        return median if values == 0 else values
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(values == 0, median, values)
+
+
+def discretize(values, bins, labels):
+    """Pengganti pd.cut(values, bins, labels, right=False) berbasis np.searchsorted.
+
+    Mengembalikan array object berisi label, NaN untuk nilai di luar bins.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    index = np.searchsorted(np.asarray(bins, dtype=np.float64), values, side='right') - 1
+    valid = (index >= 0) & (index < len(labels))
+    result = np.full(values.shape, np.nan, dtype=object)
+    result[valid] = np.asarray(labels, dtype=object)[index[valid]]
+    return result
+
+
+def build_reasons(evidence_dict, values):
+    return [template.format(value=values.get(col))
+            for col, label, template in REASON_RULES
+            if evidence_dict.get(col) == label]
+
+
+def build_reasons_batch(labels, values):
+    # labels/values: {fitur: array per baris}; hanya baris yang cocok aturan yang diformat
+    n = len(next(iter(labels.values())))
+    reasons = [[] for _ in range(n)]
+    for col, label, template in REASON_RULES:
+        for i in np.flatnonzero(np.asarray(labels[col]) == label):
+            value = values[col][i]
+            if col in INTEGER_FEATURES:
+                value = int(value)
+            reasons[i].append(template.format(value=value))
+    return reasons
+
+
+class Preprocessor:
+    """Diskretisasi + encoding yang sudah dikompilasi dari discretizer_bins dan encoders.
+
+    Semua method menerima skalar maupun array (satu kolom utuh). Kode -1 berarti
+    nilai tidak dikenal encoder (fitur tersebut tidak bisa dijadikan evidence).
+    `medians` ({fitur: median}): nilai 0 pada fitur ini diganti median sebelum diskretisasi.
+    """
+
+    def __init__(self, discretizer_bins, categories, medians=None):
+        # categories: {fitur: [kelas...]} dengan urutan = kode encoder
+        self.codes = {col: {str(c): i for i, c in enumerate(classes)} for col, classes in categories.items()}
+        self.medians = {col: float(value) for col, value in (medians or {}).items()}
+        self.edges = {}
+        self.labels = {}
+        self.bin_codes = {}
+        for col, (bins, labels) in discretizer_bins.items():
+            self.edges[col] = [float(b) for b in bins]
+            # Slot terakhir = label untuk nilai di luar bins
+            self.labels[col] = np.asarray([str(l) for l in labels] + [OUT_OF_RANGE], dtype=object)
+            self.bin_codes[col] = np.asarray([self.codes[col].get(l, -1) for l in self.labels[col]], dtype=np.int64)
+
+    @classmethod
+    def from_encoders(cls, discretizer_bins, encoders, medians=None):
+        return cls(discretizer_bins, {col: list(le.classes_) for col, le in encoders.items()}, medians)
+
+    def impute(self, col, values):
+        median = self.medians.get(col)
+        return values if median is None else impute_zero(values, median)
+
+    def bin_index(self, col, values):
+        values = self.impute(col, values)
+        edges = self.edges[col]
+        out_of_range = len(edges) - 1
+        if _is_scalar(values):
+            index = bisect_right(edges, float(values)) - 1
+            return index if 0 <= index < out_of_range else out_of_range
+        index = np.searchsorted(edges, np.asarray(values, dtype=np.float64), side='right') - 1
+        return np.where((index >= 0) & (index < out_of_range), index, out_of_range)
+
+    def discretize(self, col, values):
+        return self.labels[col][self.bin_index(col, values)]
+
+    def encode(self, col, labels):
+        codes = self.codes[col]
+        if _is_scalar(labels):
+            return codes.get(str(labels), -1)
+        uniques, inverse = np.unique(np.asarray(labels).astype(str), return_inverse=True)
+        return np.asarray([codes.get(u, -1) for u in uniques], dtype=np.int64)[inverse.reshape(-1)]
+
+    def transform(self, col, values):
+        # Nilai mentah -> kode encoder (numerik didiskretisasi dulu)
+        if col in self.bin_codes:
+            return self.bin_codes[col][self.bin_index(col, values)]
+        return self.encode(col, values)
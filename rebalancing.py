@@ -0,0 +1,124 @@
+import os
+import time
+
+import numpy as np
+
+from preprocessing import TARGET
+
+# Tahap penyeimbangan kelas untuk train.py. Pilihan:
+#   smote-tomek        SMOTE lalu hapus Tomek link (perilaku lama, hasil sama persis)
+#   smote              SMOTE saja (tanpa pass Tomek link, yang paling mahal: kNN atas semua baris)
+#   random-oversample  duplikasi acak baris kelas minoritas, O(n)
+#   reweight           tanpa resampling: tiap baris diberi bobot n / (k * n_kelas) sehingga total
+#                      bobot tiap kelas sama; diterapkan langsung ke count (statistik cukup),
+#                      jadi juga jalan di mode chunked dan di update_model.py
+#   none               data apa adanya
+# Metode berbasis tetangga (smote*) memakai n_jobs untuk pencarian tetangga terdekat.
+#
+# CLI (bandingkan waktu semua metode):  python rebalancing.py --scale 50 --jobs 4
+
+REBALANCE_METHODS = ('smote-tomek', 'smote', 'random-oversample', 'reweight', 'none')
+# Metode yang tidak butuh seluruh baris di memori (boleh dipakai dengan train.py --chunksize)
+STREAMING_METHODS = ('reweight', 'none')
+REBALANCE_JOBS = int(os.environ.get('REBALANCE_JOBS', 1))
+
+
+def balanced_class_weights(class_counts):
+    """{kelas: jumlah baris} -> {kelas: bobot}; total bobot tiap kelas = n / jumlah kelas."""
+    counts = {c: n for c, n in class_counts.items() if n > 0}
+    total = sum(counts.values())
+    return {c: total / (len(counts) * n) for c, n in counts.items()}
+
+
+def resampled_class_weights(y, y_resampled):
+    """Bobot per kelas agar satu baris asli sebanding dengan data hasil resampling (n_resample / n_asli).
+
+    Count training dari smote* / random-oversample berasal dari data hasil resampling; baris asli
+    yang ditambahkan update_model.py diberi bobot ini supaya proporsi kelas tidak bergeser.
+    """
+    raw = y.value_counts()
+    resampled = y_resampled.value_counts()
+    return {int(c): float(resampled.get(c, 0) / n) for c, n in raw.items() if n > 0}
+
+
+def row_weights(class_weights, target_codes):
+    """Bobot per baris dari bobot kelas (kode target di luar class_weights berbobot 1)."""
+    lookup = np.ones(max(max(class_weights) + 1, int(target_codes.max()) + 1))
+    for code, weight in class_weights.items():
+        lookup[code] = weight
+    return lookup[target_codes]
+
+
+def _smote(random_state, n_jobs):
+    from imblearn.over_sampling import SMOTE
+    from sklearn.neighbors import NearestNeighbors
+
+    # k_neighbors=5 (default SMOTE) -> 6 tetangga termasuk titik itu sendiri
+    return SMOTE(random_state=random_state, k_neighbors=NearestNeighbors(n_neighbors=6, n_jobs=n_jobs))
+
+
+def _smote_tomek(X, y, random_state, n_jobs):
+    from imblearn.combine import SMOTETomek
+    from imblearn.under_sampling import TomekLinks
+
+    # Sama dengan SMOTETomek(random_state=...) default, hanya saja kNN-nya paralel
+    sampler = SMOTETomek(random_state=random_state, smote=_smote(random_state, n_jobs),
+                         tomek=TomekLinks(sampling_strategy='all', n_jobs=n_jobs))
+    return sampler.fit_resample(X, y)
+
+
+def _smote_only(X, y, random_state, n_jobs):
+    return _smote(random_state, n_jobs).fit_resample(X, y)
+
+
+def _random_oversample(X, y, random_state, n_jobs):
+    from imblearn.over_sampling import RandomOverSampler
+
+    return RandomOverSampler(random_state=random_state).fit_resample(X, y)
+
+
+RESAMPLERS = {
+    'smote-tomek': _smote_tomek,
+    'smote': _smote_only,
+    'random-oversample': _random_oversample,
+}
+
+
+def rebalance(method, X, y, random_state=42, n_jobs=REBALANCE_JOBS):
+    """Kembalikan (X, y, class_weights, detik). class_weights hanya terisi untuk 'reweight'."""
+    if method not in REBALANCE_METHODS:
+        raise ValueError(f"Metode rebalancing '{method}' tidak dikenal (pilih: {', '.join(REBALANCE_METHODS)})")
+    start = time.perf_counter()
+    class_weights = None
+    if method in RESAMPLERS:
+        X, y = RESAMPLERS[method](X, y, random_state, n_jobs)
+    elif method == 'reweight':
+        class_weights = balanced_class_weights(y.value_counts().to_dict())
+    return X, y, class_weights, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    import argparse
+    import warnings
+
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Bandingkan waktu tiap metode rebalancing pada data training.")
+    parser.add_argument('--data', default='data/heart.csv', help="File CSV dataset")
+    parser.add_argument('--scale', type=int, default=1, help="Ulangi dataset sebanyak ini (simulasi kohort besar)")
+    parser.add_argument('--jobs', type=int, default=REBALANCE_JOBS, help="n_jobs pencarian tetangga terdekat")
+    parser.add_argument('--methods', default=','.join(REBALANCE_METHODS), help="Metode dipisah koma")
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    from train import preprocess
+
+    processed = preprocess(pd.read_csv(args.data))
+    processed = pd.concat([processed] * args.scale, ignore_index=True)
+    X, y = processed.drop(TARGET, axis=1), processed[TARGET]
+    print(f"{len(X)} baris, kelas: {y.value_counts().to_dict()}")
+    for method in args.methods.split(','):
+        X_out, y_out, class_weights, seconds = rebalance(method, X, y, n_jobs=args.jobs)
+        detail = (f"bobot {({c: round(w, 3) for c, w in class_weights.items()})}" if class_weights
+                  else f"kelas {y_out.value_counts().to_dict()}")
+        print(f"{method:<18} {seconds:8.3f} s  {len(X_out):>8} baris  {detail}")
@@ -0,0 +1,125 @@
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from report_pdf import build_report_pdf
+
+# Antrian render laporan PDF di process pool terpisah, supaya layout ReportLab
+# (berat di CPU & memegang GIL) tidak memperlambat thread yang melayani /predict.
+
+# Jumlah proses render, batas job yang belum selesai, dan umur job selesai (detik)
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+REPORT_MAX_PENDING = int(os.environ.get('REPORT_MAX_PENDING', 32))
+REPORT_JOB_TTL = float(os.environ.get('REPORT_JOB_TTL', 600))
+# Batas waktu menunggu render di jalur sinkron /export_report (detik)
+REPORT_TIMEOUT = float(os.environ.get('REPORT_TIMEOUT', 60))
+
+
+class ReportQueueFull(Exception):
+    pass
+
+
+class ReportJobs:
+    """Process pool + daftar job render (job_id -> future) dengan TTL.
+
+    Pool dibuat lazy dengan konteks 'spawn' (fork dari proses web yang
+    multi-thread bisa mewarisi lock yang sedang dipegang dan deadlock).
+    Script yang memakai pool ini wajib punya guard `if __name__ == '__main__'`.
+    """
+
+    def __init__(self, max_workers=REPORT_WORKERS, max_pending=REPORT_MAX_PENDING, ttl=REPORT_JOB_TTL):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = None
+        self._jobs = {}  # job_id -> {'future', 'filename', 'finished_at'}
+        self._inflight = set()  # semua future yang belum selesai (job + jalur sinkron)
+        self._lock = threading.Lock()
+        self._counters = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0}
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def _purge(self):
+        # Buang job selesai yang sudah melewati TTL (dipanggil dengan lock dipegang)
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finished_at'] is not None and now - job['finished_at'] > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _submit(self, data, feature_importance, job=None):
+        with self._lock:
+            self._purge()
+            if len(self._inflight) >= self.max_pending:
+                self._counters['rejected'] += 1
+                raise ReportQueueFull(f"Antrian laporan penuh ({self.max_pending} render sedang diproses).")
+            try:
+                future = self._pool().submit(build_report_pdf, data, feature_importance)
+            except BrokenProcessPool:
+                # Ada proses render yang mati (misal kehabisan memori): ganti dengan pool baru
+                self._executor = None
+                future = self._pool().submit(build_report_pdf, data, feature_importance)
+            self._inflight.add(future)
+            self._counters['submitted'] += 1
+
+        def on_done(done):
+            with self._lock:
+                self._inflight.discard(done)
+                self._counters['failed' if done.exception() else 'completed'] += 1
+                if job is not None:
+                    job['finished_at'] = time.monotonic()
+        future.add_done_callback(on_done)
+        return future
+
+    def submit(self, data, feature_importance, filename):
+        job = {'future': None, 'filename': filename, 'finished_at': None}
+        job['future'] = self._submit(data, feature_importance, job)
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = job
+        return job_id
+
+    def render(self, data, feature_importance, timeout=REPORT_TIMEOUT):
+        """Jalur sinkron: tetap dirender di pool, thread request hanya menunggu hasilnya."""
+        return self._submit(data, feature_importance).result(timeout=timeout)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        future = job['future']
+        if not future.done():
+            state = 'pending'
+        elif future.exception() is not None:
+            state = 'failed'
+        else:
+            state = 'done'
+        status = {'job_id': job_id, 'state': state, 'filename': job['filename']}
+        if state == 'failed':
+            status['error'] = str(future.exception())
+        return status
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'jobs': len(self._jobs),
+                'pending': len(self._inflight),
+                **self._counters,
+            }
+
+
+report_jobs = ReportJobs()
@@ -0,0 +1,199 @@
+import io
+from datetime import datetime
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+
+# Pembuatan laporan PDF (ReportLab). Semua style dibuat sekali saat modul dimuat dan
+# tidak pernah diubah setelahnya, jadi aman dipakai bersama oleh banyak render.
+# Modul ini sengaja tidak mengimpor app/model supaya ringan dimuat di process pool.
+
+STYLES = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=STYLES['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#1e40af'),
+    spaceAfter=30,
+    alignment=TA_CENTER,
+    fontName='Helvetica-Bold'
+)
+
+HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=STYLES['Heading2'],
+    fontSize=14,
+    textColor=colors.HexColor('#1e40af'),
+    spaceAfter=12,
+    spaceBefore=12,
+    fontName='Helvetica-Bold'
+)
+
+# Turunan dari 'Normal' (bukan mengubah styles['Normal'] yang dipakai bersama)
+NORMAL_STYLE = ParagraphStyle('ReportNormal', parent=STYLES['Normal'], fontSize=10, leading=14)
+
+DISCLAIMER_STYLE = ParagraphStyle(
+    'Disclaimer',
+    parent=NORMAL_STYLE,
+    fontSize=8,
+    textColor=colors.HexColor('#6b7280'),
+    alignment=TA_JUSTIFY,
+    borderWidth=1,
+    borderColor=colors.HexColor('#9ca3af'),
+    borderPadding=10,
+    backColor=colors.HexColor('#f9fafb')
+)
+
+PATIENT_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#374151')),
+    ('TEXTCOLOR', (2, 0), (2, -1), colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+
+RISK_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#374151')),
+    ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f3f4f6')),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('TOPPADDING', (0, 0), (-1, -1), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('BOX', (0, 0), (-1, -1), 2, colors.HexColor('#1e40af')),
+])
+
+# Warna nilai risiko; style tabelnya dibuat sekali per warna
+RISK_COLORS = [(70, colors.red), (40, colors.orange)]
+RISK_COLOR_DEFAULT = colors.green
+RISK_VALUE_STYLES = {
+    color: TableStyle([('TEXTCOLOR', (1, 0), (1, -1), color)], parent=RISK_TABLE_STYLE)
+    for color in [c for _, c in RISK_COLORS] + [RISK_COLOR_DEFAULT]
+}
+
+DETAIL_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (2, 0), (2, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+])
+
+DISCLAIMER = """
+<b>CATATAN PENTING:</b><br/>
+Hasil prediksi ini dihasilkan oleh model machine learning Bayesian Network dan bukan merupakan diagnosis medis resmi.
+Selalu konsultasikan dengan dokter atau tenaga medis profesional untuk pemeriksaan lebih lanjut dan diagnosis yang akurat.
+Model ini memiliki tingkat akurasi yang baik, namun tidak menggantikan penilaian klinis dokter.
+"""
+
+
+def risk_color(risk):
+    for threshold, color in RISK_COLORS:
+        if risk > threshold:
+            return color
+    return RISK_COLOR_DEFAULT
+
+
+def report_filename(data, now=None):
+    now = now or datetime.now()
+    return f"Laporan_Medis_{data.get('Name', 'Pasien').replace(' ', '_')}_{now.strftime('%Y%m%d_%H%M%S')}.pdf"
+
+
+def build_report_pdf(data, feature_importance):
+    """Render laporan medis satu pasien; kembalikan isi PDF (bytes)."""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+
+    # Container untuk elemen PDF
+    elements = []
+
+    # Header
+    elements.append(Paragraph("LAPORAN MEDIS", TITLE_STYLE))
+    elements.append(Paragraph("Prediksi Risiko Penyakit Jantung", STYLES['Heading2']))
+    elements.append(Paragraph(f"Tanggal: {datetime.now().strftime('%d %B %Y, %H:%M')}", NORMAL_STYLE))
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Informasi Pasien
+    elements.append(Paragraph("INFORMASI PASIEN", HEADING_STYLE))
+    patient_data = [
+        ['Nama', ':', data.get('Name', '-')],
+        ['Usia', ':', f"{data.get('Age', '-')} tahun"],
+        ['Jenis Kelamin', ':', 'Laki-laki' if data.get('Sex') == 'M' else 'Perempuan'],
+    ]
+    elements.append(Table(patient_data, colWidths=[2*inch, 0.3*inch, 3*inch], style=PATIENT_TABLE_STYLE))
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Hasil Prediksi (HIGHLIGHT)
+    risk = float(data.get('risk', 0))
+    risk_category = data.get('risk_category', 'N/A')
+
+    elements.append(Paragraph("HASIL PREDIKSI", HEADING_STYLE))
+    risk_data = [
+        ['Tingkat Risiko', f"{risk}%"],
+        ['Kategori', risk_category]
+    ]
+    elements.append(Table(risk_data, colWidths=[2.5*inch, 3*inch], style=RISK_VALUE_STYLES[risk_color(risk)]))
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Data Medis Input
+    elements.append(Paragraph("DATA MEDIS", HEADING_STYLE))
+    medical_data = [
+        ['Parameter', 'Nilai', 'Pengaruh (%)'],
+        ['Tekanan Darah Istirahat', f"{data.get('RestingBP', '-')} mmHg", f"{feature_importance['RestingBP']}%"],
+        ['Kolesterol', f"{data.get('Cholesterol', '-')} mg/dl", f"{feature_importance['Cholesterol']}%"],
+        ['Gula Darah Puasa', 'Ya (>120)' if data.get('FastingBS') == '1' else 'Tidak (≤120)', f"{feature_importance['FastingBS']}%"],
+        ['Detak Jantung Maksimal', f"{data.get('MaxHR', '-')} bpm", f"{feature_importance['MaxHR']}%"],
+        ['Oldpeak (Depresi ST)', data.get('Oldpeak', '-'), f"{feature_importance['Oldpeak']}%"],
+    ]
+    elements.append(Table(medical_data, colWidths=[2.5*inch, 2*inch, 1*inch], style=DETAIL_TABLE_STYLE))
+    elements.append(Spacer(1, 0.2*inch))
+
+    # Data EKG
+    ekg_data = [
+        ['Parameter', 'Nilai', 'Pengaruh (%)'],
+        ['Tipe Nyeri Dada', data.get('ChestPainType', '-'), f"{feature_importance['ChestPainType']}%"],
+        ['EKG Istirahat', data.get('RestingECG', '-'), f"{feature_importance['RestingECG']}%"],
+        ['Angina Saat Olahraga', 'Ya' if data.get('ExerciseAngina') == 'Y' else 'Tidak', f"{feature_importance['ExerciseAngina']}%"],
+        ['ST Slope', data.get('ST_Slope', '-'), f"{feature_importance['ST_Slope']}%"],
+    ]
+    elements.append(Table(ekg_data, colWidths=[2.5*inch, 2*inch, 1*inch], style=DETAIL_TABLE_STYLE))
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Faktor Risiko
+    elements.append(Paragraph("FAKTOR RISIKO UTAMA", HEADING_STYLE))
+    reasons = data.get('reasons', [])
+    if reasons:
+        for reason in reasons:
+            elements.append(Paragraph(f"• {reason}", NORMAL_STYLE))
+    else:
+        elements.append(Paragraph("• Faktor risiko terlihat terkendali", NORMAL_STYLE))
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Rekomendasi AI (jika ada)
+    if data.get('ai_advice'):
+        elements.append(PageBreak())
+        elements.append(Paragraph("REKOMENDASI & NASIHAT KESEHATAN", HEADING_STYLE))
+        for line in data.get('ai_advice', '').split('\n'):
+            if line.strip():
+                elements.append(Paragraph(line, NORMAL_STYLE))
+        elements.append(Spacer(1, 0.3*inch))
+
+    # Footer / Disclaimer
+    elements.append(Spacer(1, 0.5*inch))
+    elements.append(Paragraph(DISCLAIMER, DISCLAIMER_STYLE))
+
+    doc.build(elements)
+    return buffer.getvalue()
@@ -0,0 +1,162 @@
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from preprocessing import CATEGORICAL_FEATURES
+from scoring import BatchScorer
+from artifact import ModelBundle, load_bundle, ARTIFACT_PATH
+
+# Skoring offline file CSV/Parquet (format kolom seperti data/heart.csv) tanpa lewat Flask.
+# File dibaca per chunk, tiap chunk didiskretisasi + di-encode sekali jalan lalu posteriornya
+# diambil dari tabel blanket; memori dibatasi oleh ukuran chunk berapapun besar file-nya.
+#
+# Jalankan:  python score_cli.py data/heart.csv -o hasil.csv
+#            python score_cli.py kohort.parquet -o hasil.parquet --jobs 0 --reasons
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# Diisi sekali per proses (lihat _init_worker) agar model tidak dikirim ulang per chunk
+_scorer = None
+
+
+def _init_worker(model_path, fallback):
+    global _scorer
+    _scorer = BatchScorer.from_bundle(ModelBundle.load(model_path), fallback=fallback)
+
+
+def score_chunk(df, reasons=False, out_fmt='csv'):
+    """Skor satu chunk; kembalikan (jumlah baris, jumlah error, kolom, data siap tulis)."""
+    scores = _scorer.score(df, reasons=reasons)
+    out = df.copy()
+    out['risk'] = scores['risk']
+    out['risk_category'] = scores['risk_category']
+    out['error'] = scores['error']
+    if reasons:
+        out['reasons'] = ['; '.join(r) for r in scores['reasons']]
+    errors = int(out['error'].notna().sum())
+    if out_fmt == 'csv':
+        # Serialisasi CSV (bagian paling lambat) ikut dikerjakan di proses worker
+        return len(out), errors, list(out.columns), out.to_csv(index=False, header=False)
+    return len(out), errors, list(out.columns), out
+
+
+def file_format(path, explicit=None):
+    if explicit:
+        return explicit
+    return 'parquet' if path.lower().endswith(('.parquet', '.pq')) else 'csv'
+
+
+def read_chunks(path, fmt, chunk_size):
+    if fmt == 'csv':
+        # Kolom kategorikal dibaca sebagai string supaya '0'/'1' (FastingBS) tidak berubah jadi angka;
+        # kolom numerik diparse langsung oleh parser C (jauh lebih cepat daripada to_numeric dari string)
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype={col: str for col in CATEGORICAL_FEATURES})
+        return
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit("ERROR: Membaca Parquet membutuhkan 'pyarrow' (pip install pyarrow).")
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield batch.to_pandas()
+
+
+class ChunkWriter:
+    """Tulis hasil per chunk ke CSV (teks dari score_chunk) atau Parquet (satu row group per chunk)."""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self._csv = None
+        self._parquet = None
+
+    def write(self, columns, data):
+        if self.fmt == 'csv':
+            if self._csv is None:
+                self._csv = open(self.path, 'w', newline='', encoding='utf-8')
+                self._csv.write(pd.DataFrame(columns=columns).to_csv(index=False))
+            self._csv.write(data)
+        else:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                sys.exit("ERROR: Menulis Parquet membutuhkan 'pyarrow' (pip install pyarrow).")
+            table = pa.Table.from_pandas(data, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table.cast(self._parquet.schema))
+
+    def close(self):
+        if self._csv is not None:
+            self._csv.close()
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def iter_scored(chunks, jobs, model_path, reasons, fallback, out_fmt):
+    """Skor tiap chunk, sesuai urutan input; dengan jobs > 1 paling banyak 2*jobs chunk in-flight."""
+    if jobs <= 1:
+        _init_worker(model_path, fallback)
+        for df in chunks:
+            yield score_chunk(df, reasons, out_fmt)
+        return
+
+    pending = deque()
+    # 'spawn' seperti report_jobs.py/bulk_export.py: worker tidak mewarisi thread/state pgmpy proses induk
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(model_path, fallback)) as pool:
+        for df in chunks:
+            pending.append(pool.submit(score_chunk, df, reasons, out_fmt))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Skoring risiko penyakit jantung untuk file CSV/Parquet.")
+    parser.add_argument('input', help="File input (kolom seperti data/heart.csv)")
+    parser.add_argument('-o', '--output', required=True, help="File output (.csv atau .parquet)")
+    parser.add_argument('--model', default=ARTIFACT_PATH, help="Artefak model hasil train.py")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Jumlah baris per chunk")
+    parser.add_argument('--jobs', type=int, default=1, help="Jumlah proses skoring (0 = semua core)")
+    parser.add_argument('--input-format', choices=['csv', 'parquet'], help="Default: dari ekstensi file")
+    parser.add_argument('--output-format', choices=['csv', 'parquet'], help="Default: dari ekstensi file")
+    parser.add_argument('--reasons', action='store_true', help="Tambahkan kolom alasan risiko")
+    parser.add_argument('--no-fallback', action='store_true',
+                        help="Jangan pakai junction tree untuk baris dengan field kosong/kategori tidak dikenal (risk = kosong)")
+    args = parser.parse_args(argv)
+
+    jobs = args.jobs or os.cpu_count() or 1
+    in_fmt = file_format(args.input, args.input_format)
+    out_fmt = file_format(args.output, args.output_format)
+
+    # Ekspor ulang artefak yang basi sekali di sini, bukan di tiap proses worker
+    load_bundle(args.model)
+
+    start = time.perf_counter()
+    rows = errors = 0
+    writer = ChunkWriter(args.output, out_fmt)
+    try:
+        chunks = read_chunks(args.input, in_fmt, args.chunk_size)
+        for n, n_errors, columns, data in iter_scored(chunks, jobs, args.model, args.reasons,
+                                                      not args.no_fallback, out_fmt):
+            writer.write(columns, data)
+            rows += n
+            errors += n_errors
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"{rows} baris diskor ({errors} error) -> '{args.output}' dalam {elapsed:.2f} detik "
+          f"({rows / elapsed if elapsed else 0:.0f} baris/detik, {jobs} proses).")
+
+
+if __name__ == '__main__':
+    main()
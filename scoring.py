@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from preprocessing import (NUMERIC_FEATURES, INTEGER_FEATURES, CATEGORICAL_FEATURES, NO_EVIDENCE_ERROR,
+                           OUT_OF_RANGE, RISK_LEVELS, RISK_LEVEL_DEFAULT, build_reasons_batch, category_label)
+
+# Skoring batch tervektorisasi yang dipakai bersama oleh /api/predict_batch dan score_cli.py:
+# satu kali diskretisasi + encoding per kolom, lalu posterior diambil dari tabel blanket.
+
+
+class BatchScorer:
+    """Skoring DataFrame mentah (kolom seperti data/heart.csv) menjadi risiko per baris.
+
+    Field yang kosong dianggap tidak diketahui. Baris yang evidence blanket-nya tidak
+    lengkap (field kosong, kategori tidak dikenal) dihitung dengan junction tree jika
+    `junction_tree` diberikan, selain itu NaN. Baris tanpa evidence sama sekali = error.
+    """
+
+    def __init__(self, posterior_table, preprocessor, positive_index, junction_tree=None, features=None):
+        self.posterior_table = posterior_table
+        self.preprocessor = preprocessor
+        self.positive_index = positive_index
+        self.junction_tree = junction_tree
+        self.features = features or NUMERIC_FEATURES + CATEGORICAL_FEATURES
+
+    @classmethod
+    def from_bundle(cls, bundle, fallback=True):
+        return cls(bundle.posterior_table, bundle.preprocessor, bundle.positive_index,
+                   junction_tree=bundle.junction_tree if fallback else None,
+                   features=bundle.features)
+
+    def preprocess(self, df):
+        """Kembalikan (codes, labels, values, errors) per kolom untuk seluruh DataFrame."""
+        n = len(df)
+        errors = np.full(n, None, dtype=object)
+        labels, values, codes = {}, {}, {}
+
+        for col in NUMERIC_FEATURES + CATEGORICAL_FEATURES:
+            column = df[col] if col in df else pd.Series([None] * n, dtype=object)
+            if col in NUMERIC_FEATURES:
+                numbers = pd.to_numeric(column, errors='coerce').to_numpy(dtype=np.float64)
+                if col in INTEGER_FEATURES:
+                    numbers = np.trunc(numbers)
+                numbers = self.preprocessor.impute(col, numbers)
+                # Kosong = tidak diketahui; hanya nilai yang tidak bisa dibaca sebagai angka yang error
+                present = pd.notna(column).to_numpy()
+                if column.dtype == object:
+                    present = present & column.astype(str).str.strip().ne('').to_numpy()
+                bad = np.isnan(numbers) & present
+                bin_index = self.preprocessor.bin_index(col, numbers)
+                labels[col] = self.preprocessor.labels[col][bin_index]
+                # Field kosong = tidak diketahui (-1), bukan bin 'nan' untuk nilai di luar rentang
+                codes[col] = np.where(present, self.preprocessor.bin_codes[col][bin_index], -1)
+                values[col] = numbers
+            else:
+                # factorize (hash) sekali per kolom; kode -1 = kosong (None/NaN/pd.NA: label 'nan', tidak
+                # diketahui). Angka bulat dilabeli tanpa '.0' supaya kolom float tetap dikenal encoder
+                inverse, uniques = pd.factorize(column)
+                bad = np.zeros(n, dtype=bool)
+                names = np.asarray([category_label(u) for u in uniques] + [OUT_OF_RANGE], dtype=object)
+                labels[col] = values[col] = names[inverse]
+                codes[col] = np.asarray([self.preprocessor.encode(col, name) for name in names[:-1]] + [-1],
+                                        dtype=np.int64)[inverse]
+            errors[bad & pd.isna(errors)] = f"Field '{col}' tidak valid"
+
+        no_evidence = np.logical_and.reduce([codes[col] < 0 for col in codes])
+        errors[no_evidence & pd.isna(errors)] = NO_EVIDENCE_ERROR
+        return codes, labels, values, errors
+
+    def posterior(self, codes, errors):
+        posterior = self.posterior_table.lookup_batch(codes)
+        if self.junction_tree is not None:
+            # Baris yang evidence blanket-nya tidak lengkap dihitung sekaligus lewat junction tree
+            rows = np.flatnonzero(np.isnan(posterior[:, 0]) & pd.isna(errors))
+            if len(rows):
+                posterior[rows] = self.junction_tree.query_batch({col: codes[col][rows] for col in self.features})
+        return posterior
+
+    def score(self, df, reasons=True):
+        """Risiko (%), kategori, error, dan (opsional) alasan per baris, sebagai dict array."""
+        codes, labels, values, errors = self.preprocess(df)
+        posterior = self.posterior(codes, errors)
+        risk = np.round(posterior[:, self.positive_index] * 100, 2)
+        risk[pd.notna(errors)] = np.nan
+        result = {
+            'risk': risk,
+            'risk_category': categorize_risk_batch(risk),
+            'error': errors,
+        }
+        if reasons:
+            result['reasons'] = build_reasons_batch(labels, values)
+            for i in np.flatnonzero(pd.notna(errors)):
+                result['reasons'][i] = []
+        return result
+
+
+def categorize_risk_batch(risk):
+    categories = np.select([risk > threshold for threshold, _, _ in RISK_LEVELS],
+                           [category for _, _, category in RISK_LEVELS],
+                           default=RISK_LEVEL_DEFAULT[1]).astype(object)
+    categories[np.isnan(risk)] = None
+    return categories
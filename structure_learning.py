@@ -0,0 +1,328 @@
+import os
+import random
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import permutations
+
+import numpy as np
+from scipy.special import gammaln
+
+# Pencarian struktur Bayesian Network (hill climbing: tambah / hapus / balik satu edge,
+# dengan tabu list), pengganti HillClimbSearch pgmpy untuk train.py.
+#
+# - Skor lokal tiap keluarga (node, parents) dihitung dari tabel kontingensi dan di-memo;
+#   satu langkah hanya mengubah 1-2 keluarga, jadi hampir semua skor kandidat berikutnya
+#   tinggal diambil dari cache.
+# - Untuk data besar, tabel kontingensi gabungan semua variabel dihitung sekali (satu pass
+#   bincount); count keluarga mana pun lalu cukup marginalisasi tabel itu, tidak lagi
+#   memindai seluruh baris data.
+# - Skor keluarga yang belum ada di cache dihitung paralel di process pool, dan random
+#   restart (mulai dari struktur terbaik yang diacak) berjalan paralel; hasil terbaik dipilih.
+
+STRUCTURE_SCORES = ('bic', 'k2', 'bdeu')
+# Batas ukuran tabel kontingensi gabungan (jumlah sel, int64)
+JOINT_COUNTS_MAX_CELLS = 2 ** 24
+# Skor keluarga yang belum di-cache baru dikirim ke pool jika jumlahnya minimal sebanyak ini
+PARALLEL_MIN_FAMILIES = 16
+
+
+class FamilyScorer:
+    """Skor lokal (BIC, K2, atau BDeu) keluarga (node, parents) dengan cache per keluarga.
+
+    `codes` adalah {variabel: array kode 0..kardinalitas-1}; urutan dict menentukan urutan
+    variabel. Skor sama dengan skor diskret pgmpy ('bic-d', 'k2', 'bdeu') pada data yang sama.
+    `weights` (opsional) = bobot per baris; count menjadi jumlah bobot (float).
+    """
+
+    def __init__(self, codes, cards, score='bic', equivalent_sample_size=10, joint=None, weights=None):
+        if score not in STRUCTURE_SCORES:
+            raise ValueError(f"Skor '{score}' tidak dikenal (pilih: {', '.join(STRUCTURE_SCORES)})")
+        self.variables = list(cards)
+        self.index = {var: i for i, var in enumerate(self.variables)}
+        self.cards = dict(cards)
+        self.score = score
+        self.equivalent_sample_size = equivalent_sample_size
+        self.codes = codes
+        self.weights = weights
+        self.joint = joint
+        if joint is None and codes is not None:
+            rows = len(next(iter(codes.values())))
+            self.n = rows if weights is None else float(np.sum(weights))
+            cells = int(np.prod([self.cards[var] for var in self.variables], dtype=np.float64))
+            # Tabel gabungan hanya menguntungkan jika lebih kecil dari datanya sendiri
+            if cells <= min(rows, JOINT_COUNTS_MAX_CELLS):
+                self.joint = self._counts_from_codes(self.variables)
+                self.codes = self.weights = None
+        else:
+            self.n = joint.sum().item()
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_dataframe(cls, data, score='bic', equivalent_sample_size=10):
+        # State = nilai yang muncul di data (sama seperti state_names pgmpy)
+        codes, cards = {}, {}
+        for col in data.columns:
+            uniques, inverse = np.unique(data[col].to_numpy(), return_inverse=True)
+            dtype = np.int8 if len(uniques) <= 127 else np.int32
+            codes[col] = inverse.astype(dtype)
+            cards[col] = len(uniques)
+        return cls(codes, cards, score, equivalent_sample_size)
+
+    def state(self):
+        """Argumen untuk membangun ulang scorer ini di proses lain (tanpa cache)."""
+        return self.codes, self.cards, self.score, self.equivalent_sample_size, self.joint, self.weights
+
+    def _counts_from_codes(self, family):
+        dims = [self.cards[var] for var in family]
+        flat = np.ravel_multi_index([self.codes[var] for var in family], dims)
+        return np.bincount(flat, weights=self.weights, minlength=int(np.prod(dims))).reshape(dims)
+
+    def counts(self, variable, parents):
+        """Tabel count berbentuk (kardinalitas variable, jumlah konfigurasi parents)."""
+        parents = sorted(parents, key=self.index.get)
+        family = [variable] + parents
+        if self.joint is not None:
+            keep = sorted(self.index[var] for var in family)
+            others = tuple(i for i in range(len(self.variables)) if i not in keep)
+            table = self.joint.sum(axis=others)
+            order = [keep.index(self.index[var]) for var in family]
+            table = table.transpose(order)
+        else:
+            table = self._counts_from_codes(family)
+        return table.reshape(self.cards[variable], -1)
+
+    def local_score(self, variable, parents):
+        key = (variable, frozenset(parents))
+        score = self._cache.get(key)
+        if score is not None:
+            self.hits += 1
+            return score
+        self.misses += 1
+        score = self._cache[key] = self._compute(variable, parents)
+        return score
+
+    def _compute(self, variable, parents):
+        counts = self.counts(variable, parents).astype(np.float64)
+        r = self.cards[variable]
+        q = int(np.prod([self.cards[p] for p in parents], dtype=np.float64))
+        parent_counts = counts.sum(axis=0)
+        if self.score == 'bic':
+            ll = np.sum(counts * np.log(counts, out=np.zeros_like(counts), where=counts > 0))
+            ll -= np.sum(parent_counts * np.log(parent_counts, out=np.zeros_like(parent_counts),
+                                                where=parent_counts > 0))
+            return float(ll - 0.5 * np.log(self.n) * q * (r - 1))
+        # Konfigurasi parent yang tidak pernah muncul menyumbang 0, jadi cukup yang teramati
+        observed = parent_counts > 0
+        counts, parent_counts = counts[:, observed], parent_counts[observed]
+        if self.score == 'k2':
+            # Suku lgamma(r) dihitung untuk semua q konfigurasi, mengikuti K2Score pgmpy
+            return float(q * gammaln(r) - np.sum(gammaln(parent_counts + r)) + np.sum(gammaln(counts + 1)))
+        alpha = self.equivalent_sample_size / (q * r)
+        beta = self.equivalent_sample_size / q
+        return float(np.sum(gammaln(beta) - gammaln(parent_counts + beta))
+                     + np.sum(gammaln(counts + alpha)) - counts.size * gammaln(alpha))
+
+    def cached(self, variable, parents):
+        return (variable, frozenset(parents)) in self._cache
+
+    def store(self, variable, parents, score):
+        self._cache[(variable, frozenset(parents))] = score
+
+    def total_score(self, parents):
+        return sum(self.local_score(var, parents[var]) for var in self.variables)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'families': len(self._cache), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'joint_counts': self.joint is not None}
+
+
+# --- Operasi graf (parents: {node: set parent}) ---
+def _children(parents):
+    children = {var: set() for var in parents}
+    for var, pa in parents.items():
+        for p in pa:
+            children[p].add(var)
+    return children
+
+
+def _reachable(children, start, skip_edge=None):
+    seen, stack = set(), [start]
+    while stack:
+        node = stack.pop()
+        for child in children[node]:
+            if (node, child) == skip_edge or child in seen:
+                continue
+            seen.add(child)
+            stack.append(child)
+    return seen
+
+
+def legal_operations(parents, tabu=(), max_indegree=None):
+    """Semua operasi (op, (X, Y)) yang tidak membuat siklus, tidak tabu, dan memenuhi max_indegree.
+
+    Aturan sama dengan HillClimbSearch pgmpy: tambah, hapus, lalu balik edge. Operasi tambah
+    diurutkan menurut permutations (pgmpy: urutan set), jadi seri skor bisa diputus berbeda.
+    """
+    max_indegree = float('inf') if max_indegree is None else max_indegree
+    tabu = set(tabu)
+    children = _children(parents)
+    descendants = {var: _reachable(children, var) for var in parents}
+    ops = []
+    for X, Y in permutations(parents, 2):
+        if X in parents[Y] or Y in parents[X] or X in descendants[Y]:
+            continue
+        if ('+', (X, Y)) not in tabu and len(parents[Y]) + 1 <= max_indegree:
+            ops.append(('+', (X, Y)))
+    edges = [(X, Y) for Y in parents for X in sorted(parents[Y], key=list(parents).index)]
+    for X, Y in edges:
+        if ('-', (X, Y)) not in tabu:
+            ops.append(('-', (X, Y)))
+    for X, Y in edges:
+        # Balik X->Y hanya jika tidak ada jalur lain X ~> Y (jika ada, Y->X membuat siklus)
+        if Y in _reachable(children, X, skip_edge=(X, Y)):
+            continue
+        if ('flip', (X, Y)) not in tabu and ('flip', (Y, X)) not in tabu and len(parents[X]) + 1 <= max_indegree:
+            ops.append(('flip', (X, Y)))
+    return ops
+
+
+def _new_families(parents, op):
+    kind, (X, Y) = op
+    if kind == '+':
+        return [(Y, parents[Y] | {X})]
+    if kind == '-':
+        return [(Y, parents[Y] - {X})]
+    return [(X, parents[X] | {Y}), (Y, parents[Y] - {X})]
+
+
+def _apply(parents, op):
+    kind, (X, Y) = op
+    if kind == '+':
+        parents[Y].add(X)
+    elif kind == '-':
+        parents[Y].discard(X)
+    else:
+        parents[Y].discard(X)
+        parents[X].add(Y)
+
+
+def _score_delta(scorer, parents, op):
+    return sum(scorer.local_score(var, new) - scorer.local_score(var, parents[var])
+               for var, new in _new_families(parents, op))
+
+
+def hill_climb(scorer, parents=None, max_indegree=None, tabu_length=100, epsilon=1e-4,
+               max_iter=int(1e6), pool=None, jobs=1):
+    """Hill climbing dari `parents` (default: graf kosong); kembalikan (parents, skor total)."""
+    parents = {var: set(parents[var]) if parents else set() for var in scorer.variables}
+    tabu = deque(maxlen=tabu_length)
+    for _ in range(int(max_iter)):
+        ops = legal_operations(parents, tabu, max_indegree)
+        if pool is not None:
+            _score_missing(scorer, [fam for op in ops for fam in _new_families(parents, op)], pool, jobs)
+        best_op, best_delta = None, None
+        for op in ops:
+            delta = _score_delta(scorer, parents, op)
+            if best_delta is None or delta > best_delta:
+                best_op, best_delta = op, delta
+        if best_op is None or best_delta < epsilon:
+            break
+        _apply(parents, best_op)
+        kind, edge = best_op
+        tabu.append(('-', edge) if kind == '+' else ('+', edge) if kind == '-' else best_op)
+    return parents, scorer.total_score(parents)
+
+
+def perturb(parents, steps, rng, max_indegree=None):
+    """Acak struktur dengan `steps` operasi legal acak (titik awal random restart)."""
+    parents = {var: set(pa) for var, pa in parents.items()}
+    for _ in range(steps):
+        ops = legal_operations(parents, max_indegree=max_indegree)
+        if not ops:
+            break
+        _apply(parents, rng.choice(ops))
+    return parents
+
+
+# --- Process pool: tiap worker membangun scorer-nya sekali (cache per proses) ---
+_worker_scorer = None
+
+
+def _init_worker(state):
+    global _worker_scorer
+    codes, cards, score, ess, joint, weights = state
+    _worker_scorer = FamilyScorer(codes, cards, score, ess, joint, weights)
+
+
+def _score_chunk(families):
+    return [_worker_scorer.local_score(var, parents) for var, parents in families]
+
+
+def _score_missing(scorer, families, pool, jobs):
+    missing, seen = [], set()
+    for var, parents in families:
+        key = (var, frozenset(parents))
+        if key not in seen and not scorer.cached(var, parents):
+            seen.add(key)
+            missing.append((var, tuple(parents)))
+    if len(missing) < PARALLEL_MIN_FAMILIES:
+        return
+    size = -(-len(missing) // (jobs * 4))
+    chunks = [missing[i:i + size] for i in range(0, len(missing), size)]
+    for chunk, scores in zip(chunks, pool.map(_score_chunk, chunks)):
+        for (var, parents), score in zip(chunk, scores):
+            scorer.store(var, parents, score)
+    scorer.misses += len(missing)
+
+
+def _restart(start, steps, seed, max_indegree, tabu_length, epsilon, max_iter, scorer=None):
+    initial = perturb(start, steps, random.Random(seed), max_indegree)
+    parents, score = hill_climb(scorer or _worker_scorer, initial, max_indegree, tabu_length, epsilon, max_iter)
+    return {var: sorted(pa) for var, pa in parents.items()}, score
+
+
+class ParallelHillClimb:
+    """Estimasi struktur dengan hill climbing + random restart, opsional paralel.
+
+    Restart ke-i dimulai dari struktur terbaik hasil pendakian pertama (dari graf kosong)
+    yang diacak `perturbation` operasi dengan seed `seed + i`; yang skornya tertinggi dipakai.
+    """
+
+    def __init__(self, data, score='bic', equivalent_sample_size=10, jobs=1):
+        # data: DataFrame kode, atau FamilyScorer yang sudah jadi (misal dari count per chunk)
+        if isinstance(data, FamilyScorer):
+            self.scorer = data
+        else:
+            self.scorer = FamilyScorer.from_dataframe(data, score, equivalent_sample_size)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.best_score = None
+        self.restart_scores = []
+
+    def estimate(self, max_indegree=None, tabu_length=100, epsilon=1e-4, max_iter=int(1e6),
+                 restarts=0, perturbation=None, seed=42):
+        """Kembalikan daftar edge (parent, child) struktur dengan skor tertinggi."""
+        perturbation = perturbation or max(2, len(self.scorer.variables) // 2)
+        if self.jobs <= 1:
+            parents, self.best_score = hill_climb(self.scorer, None, max_indegree, tabu_length, epsilon, max_iter)
+            results = [_restart(parents, perturbation, seed + i, max_indegree, tabu_length, epsilon, max_iter,
+                                scorer=self.scorer) for i in range(restarts)]
+        else:
+            # 'spawn': sama seperti pool lain di repo ini (aman dari proses multi-thread)
+            with ProcessPoolExecutor(max_workers=self.jobs, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_worker, initargs=(self.scorer.state(),)) as pool:
+                parents, self.best_score = hill_climb(self.scorer, None, max_indegree, tabu_length, epsilon,
+                                                      max_iter, pool=pool, jobs=self.jobs)
+                futures = [pool.submit(_restart, parents, perturbation, seed + i, max_indegree, tabu_length,
+                                       epsilon, max_iter) for i in range(restarts)]
+                results = [future.result() for future in futures]
+
+        self.restart_scores = [score for _, score in results]
+        for restart_parents, score in results:
+            if score > self.best_score + epsilon:
+                parents, self.best_score = restart_parents, score
+        return [(p, var) for var in self.scorer.variables for p in sorted(parents[var], key=self.scorer.index.get)]
@@ -0,0 +1,274 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from artifact import ARTIFACT_VERSION, read_artifact, write_artifact
+from preprocessing import (CATEGORICAL_FEATURES, NUMERIC_FEATURES, TARGET, DISCRETIZER_BINS, ZERO_AS_MISSING,
+                           Preprocessor, discretize, impute_zero)
+from rebalancing import balanced_class_weights, row_weights
+from structure_learning import JOINT_COUNTS_MAX_CELLS, FamilyScorer
+
+# Statistik cukup untuk training Bayesian Network: count. Struktur (skor keluarga) maupun
+# CPD hanya butuh tabel kontingensi, jadi dataset yang lebih besar dari RAM cukup dibaca
+# per chunk:
+#   pass 1: value counts tiap kolom -> median (pengganti nilai 0) dan kelas encoder
+#   pass 2: tiap chunk di-preprocess + di-encode ke kode int8, lalu count-nya ditambahkan
+#           ke tabel kontingensi gabungan int64 (ukurannya tetap, tidak tergantung jumlah baris)
+# Jika tabel gabungan melebihi JOINT_COUNTS_MAX_CELLS, yang disimpan kolom kode int8
+# (1 byte per nilai, vs 8 byte + salinan DataFrame pada jalur in-memory).
+#
+# Setelah struktur diketahui, count per keluarga CPD (node + parents) disimpan bersama model
+# (model_stats.bin, format file sama dengan artefak serving). update_model.py menambahkan
+# count baris baru ke sini lalu menghitung ulang CPD tanpa training ulang.
+
+STATS_PATH = os.environ.get('MODEL_STATS', 'model_stats.bin')
+DEFAULT_CHUNKSIZE = 100_000
+# Prior CPD = default BayesianEstimator pgmpy versi lama (model.fit(data, estimator=BayesianEstimator))
+CPD_PRIOR_ESS = 5
+COLUMNS = CATEGORICAL_FEATURES + NUMERIC_FEATURES + [TARGET]
+
+
+def _median_from_counts(counts):
+    # Median persis seperti Series.median() (NaN diabaikan), dari {nilai: jumlah}
+    counts = counts[counts.index.notna()].sort_index()
+    cumulative = counts.cumsum().to_numpy()
+    n = cumulative[-1]
+    lower = counts.index[np.searchsorted(cumulative, (n - 1) // 2, side='right')]
+    upper = counts.index[np.searchsorted(cumulative, n // 2, side='right')]
+    return (lower + upper) / 2
+
+
+def _read_chunks(path, chunksize):
+    # Kolom kategorikal dibaca sebagai teks apa adanya, supaya encoding tiap chunk sama
+    # walaupun tipe hasil parsing pandas bisa berbeda antar chunk (misal ada NaN)
+    return pd.read_csv(path, chunksize=chunksize, usecols=COLUMNS,
+                       dtype={col: str for col in CATEGORICAL_FEATURES + [TARGET]})
+
+
+def column_counts(df, totals=None):
+    """{kolom: value counts (termasuk NaN)} untuk `df`, ditambahkan ke `totals` jika ada."""
+    totals = {} if totals is None else totals
+    for col in COLUMNS:
+        counts = df[col].value_counts(dropna=False)
+        totals[col] = counts if col not in totals else totals[col].add(counts, fill_value=0)
+    return totals
+
+
+def scan_columns(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Pass 1: {kolom: value counts (termasuk NaN)} untuk seluruh file."""
+    totals = {}
+    for chunk in _read_chunks(path, chunksize):
+        column_counts(chunk, totals)
+    return totals
+
+
+def read_training_csv(path):
+    """CSV utuh dengan tipe kolom yang sama seperti pembacaan per chunk."""
+    return pd.read_csv(path, usecols=COLUMNS, dtype={col: str for col in CATEGORICAL_FEATURES + [TARGET]})
+
+
+def fit_encoders(value_counts):
+    """Median, encoders (LabelEncoder), dan discretizer_bins, sama dengan preprocess() pada data utuh."""
+    medians = {col: _median_from_counts(value_counts[col]) for col in ZERO_AS_MISSING}
+    encoders, discretizer_bins = {}, {}
+    for col in COLUMNS:
+        values = value_counts[col].index.to_series()
+        if col in medians:
+            values = pd.Series(impute_zero(values, medians[col]))
+        if col in NUMERIC_FEATURES:
+            bins, labels = DISCRETIZER_BINS[col]
+            values = pd.Series(discretize(values, bins, labels))
+            discretizer_bins[col] = (bins, labels)
+        encoders[col] = LabelEncoder().fit(values.astype(str).unique())
+    return medians, encoders, discretizer_bins
+
+
+class SufficientStats:
+    """Count data training: tabel gabungan (atau kode int8) dan count per keluarga CPD.
+
+    Urutan variabel = urutan `cards`. `families` ({node: (parents urut nama, count (r, q))})
+    terisi setelah fit_families(); sejak itu update() juga menambahkan ke count keluarga.
+    `counted` ({id SavedInformation: kode per variabel}) = baris pasien tersimpan yang sudah
+    masuk count, supaya diagnosis yang berubah bisa dikurangi lagi lewat remove();
+    `watermark` = DiagnosedAt (ISO) terakhir yang sudah dibaca (lihat update_model.py).
+    Dengan `class_weights` ({kode target: bobot}) tiap baris dihitung sebesar bobot kelasnya,
+    termasuk baris baru dari update_model.py; count menjadi float.
+    """
+
+    def __init__(self, cards, joint=None, families=None, n=0, medians=None, watermark=None, class_weights=None,
+                 counted=None):
+        self.cards = dict(cards)
+        self.n = n
+        self.medians = dict(medians or {})
+        self.watermark = watermark
+        self.counted = dict(counted or {})
+        self.class_weights = dict(class_weights) if class_weights else None
+        self.dtype = np.float64 if self.class_weights else np.int64
+        self.families = dict(families or {})
+        self.joint = joint
+        self._codes = None
+        if joint is None and n == 0:
+            # Statistik baru: tabel gabungan jika muat; jika tidak, kode int8 dikumpulkan untuk
+            # pencarian struktur (kode mentah tidak ikut disimpan oleh save())
+            cells = int(np.prod(list(self.cards.values()), dtype=np.float64))
+            if cells <= JOINT_COUNTS_MAX_CELLS:
+                self.joint = np.zeros(list(self.cards.values()), dtype=self.dtype)
+            else:
+                self._codes = {var: [] for var in self.cards}
+
+    def row_weights(self, codes):
+        """Bobot per baris untuk `codes` (None jika tanpa reweighting)."""
+        return row_weights(self.class_weights, codes[TARGET]) if self.class_weights else None
+
+    def _family_counts(self, codes, node, parents, weights):
+        dims = [self.cards[var] for var in [node] + parents]
+        flat = np.ravel_multi_index([codes[var] for var in [node] + parents], dims)
+        return np.bincount(flat, weights=weights, minlength=int(np.prod(dims))).reshape(self.cards[node], -1)
+
+    def set_class_weights(self, class_weights):
+        """Bobot kelas untuk baris yang ditambahkan setelah ini (count yang sudah ada menjadi float)."""
+        self.class_weights = dict(class_weights)
+        self.dtype = np.float64
+        if self.joint is not None:
+            self.joint = self.joint.astype(self.dtype)
+        self.families = {node: (parents, table.astype(self.dtype)) for node, (parents, table) in self.families.items()}
+
+    def _add(self, codes, sign):
+        weights = self.row_weights(codes)
+        if self.joint is not None:
+            flat = np.ravel_multi_index([codes[var] for var in self.cards], self.joint.shape)
+            counts = np.bincount(flat, weights=weights, minlength=self.joint.size).reshape(self.joint.shape)
+            self.joint += sign * counts
+        elif self._codes is not None:
+            if sign < 0:
+                raise ValueError("Statistik tanpa tabel gabungan tidak bisa dikurangi")
+            for var in self.cards:
+                self._codes[var].append(codes[var])
+        for node, (parents, table) in self.families.items():
+            table += sign * self._family_counts(codes, node, parents, weights)
+        self.n += sign * len(codes[next(iter(self.cards))])
+
+    def update(self, codes):
+        """Tambahkan count satu chunk {variabel: array kode}."""
+        self._add(codes, 1)
+
+    def remove(self, codes):
+        """Kurangi count baris yang sebelumnya ditambahkan lewat update() (misal diagnosis yang diubah)."""
+        self._add(codes, -1)
+
+    def scorer(self, score='bic', equivalent_sample_size=10):
+        if self.joint is not None:
+            return FamilyScorer(None, self.cards, score, equivalent_sample_size, joint=self.joint)
+        if self._codes is None:
+            raise ValueError("Statistik ini tidak menyimpan tabel gabungan; struktur tidak bisa dicari ulang")
+        codes = {var: np.concatenate(chunks) for var, chunks in self._codes.items()}
+        return FamilyScorer(codes, self.cards, score, equivalent_sample_size, weights=self.row_weights(codes))
+
+    def fit_families(self, model, scorer):
+        """Ambil count tiap keluarga CPD `model` dari `scorer` (parent diurutkan menurut nama seperti pgmpy)."""
+        self.families = {}
+        for node in model.nodes():
+            parents = sorted(model.get_parents(node))
+            r = self.cards[node]
+            # counts() mengurutkan parent menurut urutan variabel scorer; susun ulang ke urutan nama
+            scorer_order = sorted(parents, key=scorer.index.get)
+            table = scorer.counts(node, parents).reshape([r] + [self.cards[p] for p in scorer_order])
+            table = table.transpose([0] + [1 + scorer_order.index(p) for p in parents]).reshape(r, -1)
+            self.families[node] = (parents, np.array(table, dtype=self.dtype))
+
+    def cpds(self, equivalent_sample_size=CPD_PRIOR_ESS):
+        """CPD dari count keluarga, sama dengan BayesianEstimator pgmpy (prior BDeu)."""
+        return [bayesian_cpd(node, parents, table, self.cards, equivalent_sample_size)
+                for node, (parents, table) in self.families.items()]
+
+    def save(self, path=STATS_PATH):
+        meta = {
+            'format_version': ARTIFACT_VERSION,
+            'kind': 'sufficient_stats',
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'cards': self.cards,
+            'n': int(self.n),
+            'medians': {col: float(value) for col, value in self.medians.items()},
+            'watermark': self.watermark,
+            'class_weights': {str(code): weight for code, weight in (self.class_weights or {}).items()},
+            'families': {node: parents for node, (parents, _) in self.families.items()},
+        }
+        arrays = {f'family_{node}': table for node, (_, table) in self.families.items()}
+        ids = sorted(self.counted)
+        arrays['counted_ids'] = np.asarray(ids, dtype=np.int64)
+        arrays['counted_codes'] = np.asarray([self.counted[i] for i in ids], dtype=np.int8).reshape(len(ids), len(self.cards))
+        if self.joint is not None:
+            arrays['joint'] = self.joint
+        write_artifact(path, meta, arrays)
+
+    @classmethod
+    def load(cls, path=STATS_PATH):
+        meta, arrays = read_artifact(path, mmap=False)
+        if meta.get('kind') != 'sufficient_stats':
+            raise ValueError(f"'{path}' bukan file statistik model")
+        # Salin: array hasil read_artifact read-only, sedangkan count akan ditambah
+        families = {node: (parents, np.array(arrays[f'family_{node}']))
+                    for node, parents in meta['families'].items()}
+        joint = np.array(arrays['joint']) if 'joint' in arrays else None
+        class_weights = {int(code): weight for code, weight in meta.get('class_weights', {}).items()}
+        counted = {}
+        if 'counted_ids' in arrays:
+            counted = dict(zip(arrays['counted_ids'].tolist(), np.array(arrays['counted_codes'])))
+        return cls(meta['cards'], joint, families, meta['n'], meta['medians'], meta['watermark'], class_weights,
+                   counted)
+
+    @classmethod
+    def from_csv(cls, path, chunksize=DEFAULT_CHUNKSIZE, reweight=False):
+        """Baca CSV dua pass; kembalikan (stats, encoders, discretizer_bins).
+
+        `reweight`: bobot kelas seimbang dari distribusi target di pass pertama.
+        """
+        value_counts = scan_columns(path, chunksize)
+        medians, encoders, discretizer_bins = fit_encoders(value_counts)
+        preprocessor = Preprocessor.from_encoders(discretizer_bins, encoders, medians)
+        class_weights = None
+        if reweight:
+            class_weights = balanced_class_weights(
+                {preprocessor.encode(TARGET, label): int(n) for label, n in value_counts[TARGET].items()})
+        # Urutan variabel mengikuti header file, sama seperti DataFrame pada jalur in-memory
+        header = [col for col in pd.read_csv(path, nrows=0).columns if col in COLUMNS]
+        stats = cls({col: len(encoders[col].classes_) for col in header}, medians=medians,
+                    class_weights=class_weights)
+        for chunk in _read_chunks(path, chunksize):
+            codes = encode_frame(chunk, preprocessor)
+            for col, values in codes.items():
+                if (values < 0).any():
+                    raise ValueError(f"Kolom '{col}' berisi nilai yang tidak ada saat pass pertama "
+                                     f"(file '{path}' berubah selama training?)")
+            stats.update(codes)
+        return stats, encoders, discretizer_bins
+
+
+def encode_frame(df, preprocessor):
+    """Preprocess + encode DataFrame mentah (kolom COLUMNS) ke {kolom: kode int8}, seperti preprocess().
+
+    Penggantian nilai 0 memakai median milik `preprocessor`. Kode -1 = nilai yang tidak dikenal encoder.
+    """
+    codes = {}
+    for col in COLUMNS:
+        values = df[col]
+        if col not in NUMERIC_FEATURES:
+            values = values.astype(str)
+        codes[col] = preprocessor.transform(col, values.to_numpy()).astype(np.int8)
+    return codes
+
+
+def bayesian_cpd(node, parents, table, cards, equivalent_sample_size=CPD_PRIOR_ESS):
+    """TabularCPD dari count (r, q); state tiap variabel = kode 0..kardinalitas-1."""
+    from pgmpy.factors.discrete import TabularCPD
+
+    r = cards[node]
+    alpha = equivalent_sample_size / (r * table.shape[1])
+    cpd = TabularCPD(node, r, table + alpha, evidence=parents or None,
+                     evidence_card=[cards[p] for p in parents] or None,
+                     state_names={var: list(range(cards[var])) for var in [node] + parents})
+    cpd.normalize()
+    return cpd
@@ -0,0 +1,65 @@
+import os
+import sys
+import uuid
+import warnings
+
+import pytest
+
+# Modul aplikasi ada di root repository (bukan package); jalankan test dari root: python -m pytest
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATA_PATH = os.path.join(ROOT, 'data', 'heart.csv')
+MODEL_PATH = os.path.join(ROOT, 'model.joblib')
+
+
+@pytest.fixture(scope='session')
+def model_package():
+    """Paket model.joblib yang ikut di repository (model pgmpy + encoders + bins + medians)."""
+    import joblib
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return joblib.load(MODEL_PATH)
+
+
+@pytest.fixture(scope='session')
+def bundle(model_package):
+    """ModelBundle in-memory dari model_package (tanpa menulis file)."""
+    from artifact import ModelBundle, build_artifact
+
+    return ModelBundle(*build_artifact(model_package))
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    """Modul app.py (Flask) dengan model_artifact.bin repository; MySQL/Gemini tidak dihubungi saat import."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        import app
+
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    app_module.prediction_cache.clear()
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def sqlite_database(monkeypatch):
+    """Fungsi rows -> koneksi penahan: MySQL diganti SQLite in-memory baru (pengganti dari benchmark.py)."""
+    import benchmark
+    import database
+
+    monkeypatch.setattr(database, 'db_pool', database.db_pool)
+    keepers = []
+
+    def use(rows):
+        keepers.append(benchmark.use_sqlite_database(rows, name=f'test_{uuid.uuid4().hex}'))
+        return keepers[-1]
+
+    yield use
+    for keeper in keepers:
+        keeper.close()
@@ -0,0 +1,137 @@
+import json
+import shutil
+import struct
+import threading
+
+import numpy as np
+import pytest
+
+import artifact
+from artifact import ARTIFACT_VERSION, MAGIC, ModelBundle, build_artifact, read_artifact, read_meta, write_artifact
+from conftest import MODEL_PATH
+
+
+@pytest.fixture(scope='module')
+def built(model_package):
+    return build_artifact(model_package)
+
+
+@pytest.fixture
+def artifact_path(tmp_path, built):
+    path = tmp_path / 'model_artifact.bin'
+    write_artifact(str(path), *built)
+    return str(path)
+
+
+def test_round_trip_arrays_and_meta(built, artifact_path):
+    meta, arrays = built
+    for mmap in (True, False):
+        read_meta_, read_arrays = read_artifact(artifact_path, mmap=mmap)
+        assert read_arrays.keys() == arrays.keys()
+        for name, array in arrays.items():
+            assert read_arrays[name].dtype == array.dtype
+            np.testing.assert_array_equal(read_arrays[name], array)
+        assert {key: value for key, value in read_meta_.items() if key not in ('arrays', 'data_start')} == meta
+
+
+def test_mmap_arrays_are_read_only_and_aligned(artifact_path):
+    meta, arrays = read_artifact(artifact_path, mmap=True)
+    for name, array in arrays.items():
+        assert not array.flags.writeable
+        assert (meta['data_start'] + meta['arrays'][name]['offset']) % artifact.ALIGNMENT == 0
+
+
+def test_loaded_bundle_matches_in_memory_bundle(bundle, artifact_path):
+    loaded = ModelBundle.load(artifact_path)
+    assert loaded.version == bundle.version
+    assert loaded.medians == bundle.medians
+    evidence = {col: 0 for col in bundle.features}
+    np.testing.assert_array_equal(loaded.posterior_table.lookup(evidence), bundle.posterior_table.lookup(evidence))
+    partial = {col: 0 for col in bundle.features[:3]}
+    np.testing.assert_allclose(loaded.junction_tree.query(partial), bundle.junction_tree.query(partial),
+                               rtol=0, atol=1e-15)
+
+
+def test_version_is_content_hash(model_package, built):
+    meta, _ = built
+    assert build_artifact(model_package)[0]['model_version'] == meta['model_version']
+
+
+def rewrite_header(path, **changes):
+    # Ganti field header JSON, panjang header dan offset data dipertahankan
+    with open(path, 'rb') as f:
+        raw = f.read()
+    (length,) = struct.unpack('<Q', raw[len(MAGIC):len(MAGIC) + 8])
+    start = len(MAGIC) + 8
+    header = json.loads(raw[start:start + length])
+    header.update(changes)
+    encoded = json.dumps(header).encode('utf-8').ljust(length)
+    assert len(encoded) == length
+    with open(path, 'wb') as f:
+        f.write(raw[:start] + encoded + raw[start + length:])
+
+
+def test_unsupported_format_version_is_rejected(artifact_path):
+    rewrite_header(artifact_path, format_version=ARTIFACT_VERSION + 1)
+    with pytest.raises(ValueError, match='tidak didukung'):
+        read_meta(artifact_path)
+    with pytest.raises(ValueError):
+        ModelBundle.load(artifact_path)
+
+
+def test_non_artifact_file_is_rejected(tmp_path):
+    path = tmp_path / 'bukan_artefak.bin'
+    path.write_bytes(b'PK\x03\x04' + b'\x00' * 64)
+    with pytest.raises(ValueError, match='bukan artefak'):
+        read_meta(str(path))
+
+
+def test_write_leaves_no_temp_files(tmp_path, built):
+    path = tmp_path / 'model_artifact.bin'
+    write_artifact(str(path), *built)
+    assert [p.name for p in tmp_path.iterdir()] == ['model_artifact.bin']
+
+    class Broken(dict):
+        def items(self):
+            raise RuntimeError("gagal di tengah penulisan")
+
+    meta, arrays = built
+    with pytest.raises(RuntimeError):
+        write_artifact(str(path), meta, Broken(arrays))
+    # File lama utuh, file sementara dibuang
+    assert [p.name for p in tmp_path.iterdir()] == ['model_artifact.bin']
+    assert read_meta(str(path))['model_version'] == meta['model_version']
+
+
+def test_concurrent_reexport_writes_once(tmp_path, monkeypatch, model_package):
+    import joblib
+
+    model_path = str(tmp_path / 'model.joblib')
+    shutil.copy(MODEL_PATH, model_path)
+    path = str(tmp_path / 'model_artifact.bin')
+    exports = []
+    export = artifact.export_artifact
+
+    def counting_export(package, target):
+        exports.append(target)
+        return export(package, target)
+
+    monkeypatch.setattr(artifact, 'export_artifact', counting_export)
+    monkeypatch.setattr(joblib, 'load', lambda _: model_package)
+    versions, errors = [], []
+
+    def worker():
+        try:
+            versions.append(artifact.load_bundle(path, model_path).version)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert exports == [path]
+    assert len(set(versions)) == 1 and len(versions) == 4
+    assert not [p for p in tmp_path.iterdir() if p.name.endswith('.tmp')]
@@ -0,0 +1,20 @@
+import pandas as pd
+
+import bulk_export
+from conftest import DATA_PATH
+
+
+def test_report_reasons_match_predict(app_module, bundle):
+    df = pd.read_csv(DATA_PATH, dtype={'FastingBS': str}).drop(columns='HeartDisease')
+    # Termasuk pasien dengan Cholesterol 0 (diganti median training, seperti di /predict)
+    df = pd.concat([df[df['Cholesterol'] == 0].head(20), df[df['Cholesterol'] > 0].head(20)])
+    assert (df['Cholesterol'] == 0).any()
+    rows = [{**record, 'id': i, 'Name': f"Pasien {i}", 'LastRiskPercentage': 50.0}
+            for i, record in enumerate(df.to_dict('records'), start=1)]
+
+    payloads = list(bulk_export.report_payloads([rows], bundle.preprocessor))
+    assert len(payloads) == len(rows)
+    for row, (_, data) in zip(rows, payloads):
+        form = {col: str(row[col]) for col in bundle.features}
+        _, reasons = app_module.preprocess_input(bundle, form)
+        assert data['reasons'] == reasons, row
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from bulkhead import Bulkhead, BulkheadFull
+
+
+def test_full_admission_raises_with_retry_after():
+    bulkhead = Bulkhead('test', max_concurrent=1, max_queue=0, queue_timeout=1, retry_after=7)
+    with bulkhead.slot():
+        with pytest.raises(BulkheadFull) as excinfo:
+            with bulkhead.slot():
+                pass
+    assert excinfo.value.retry_after == 7
+    stats = bulkhead.stats()
+    assert (stats['accepted'], stats['rejected_queue_full'], stats['active']) == (1, 1, 0)
+
+    # Slot dikembalikan: permintaan berikutnya diterima lagi
+    with bulkhead.slot():
+        pass
+    assert bulkhead.stats()['accepted'] == 2
+
+
+def test_queue_timeout_raises_with_retry_after():
+    bulkhead = Bulkhead('test', max_concurrent=1, max_queue=1, queue_timeout=0.05, retry_after=3)
+    with bulkhead.slot():
+        start = time.monotonic()
+        with pytest.raises(BulkheadFull) as excinfo:
+            with bulkhead.slot():
+                pass
+        assert time.monotonic() - start >= 0.05
+    assert excinfo.value.retry_after == 3
+    stats = bulkhead.stats()
+    assert (stats['rejected_timeout'], stats['queued'], stats['active']) == (1, 0, 0)
+
+
+def test_queued_caller_runs_after_slot_is_released():
+    bulkhead = Bulkhead('test', max_concurrent=1, max_queue=1, queue_timeout=5, retry_after=1)
+    release = threading.Event()
+    entered = []
+
+    def holder():
+        with bulkhead.slot():
+            entered.append('holder')
+            release.wait(5)
+
+    def waiter():
+        with bulkhead.slot():
+            entered.append('waiter')
+
+    threads = [threading.Thread(target=holder)]
+    threads[0].start()
+    while bulkhead.stats()['active'] == 0:
+        time.sleep(0.001)
+    threads.append(threading.Thread(target=waiter))
+    threads[1].start()
+    while bulkhead.stats()['queued'] == 0:
+        time.sleep(0.001)
+
+    # Kapasitas (1 jalan + 1 antre) terpakai semua: permintaan ketiga langsung ditolak
+    with pytest.raises(BulkheadFull):
+        with bulkhead.slot():
+            pass
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert entered == ['holder', 'waiter']
+    assert bulkhead.stats()['accepted'] == 2
+
+
+def test_slot_is_released_when_body_raises():
+    bulkhead = Bulkhead('test', max_concurrent=1, max_queue=0, queue_timeout=1, retry_after=1)
+    with pytest.raises(RuntimeError):
+        with bulkhead.slot():
+            raise RuntimeError("upstream gagal")
+    with bulkhead.slot():
+        assert bulkhead.stats()['active'] == 1
+    assert bulkhead.stats()['active'] == 0
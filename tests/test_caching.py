@@ -0,0 +1,134 @@
+import threading
+import time
+import types
+
+import pytest
+
+import caching
+from caching import LRUCache, SingleFlight
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1      # 'a' jadi yang terbaru dipakai
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    stats = cache.stats()
+    assert (stats['size'], stats['evictions']) == (2, 1)
+
+
+def test_lru_set_existing_key_does_not_evict():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.set('a', 10)
+    assert (cache.get('a'), cache.get('b')) == (10, 2)
+    assert cache.stats()['evictions'] == 0
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(caching, 'time', types.SimpleNamespace(monotonic=lambda: now[0]))
+    cache = LRUCache(maxsize=10, ttl=30)
+    cache.set('a', 1)
+
+    now[0] += 29
+    assert cache.get('a') == 1
+    now[0] += 2
+    assert cache.get('a', 'default') == 'default'
+    stats = cache.stats()
+    assert (stats['size'], stats['expirations'], stats['hits'], stats['misses']) == (0, 1, 1, 1)
+
+
+
+def test_peek_does_not_touch_stats_or_order():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.peek('a') == 1
+    assert cache.peek('x', 'default') == 'default'
+    cache.set('c', 3)  # 'a' tetap yang paling lama dipakai
+    assert cache.peek('a') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (0, 0, 1)
+
+
+def run_concurrently(flight, key, fn, callers):
+    """Jalankan `callers` thread flight.do(key, fn); fn baru boleh selesai setelah semuanya bergabung."""
+    results = [None] * callers
+    errors = [None] * callers
+
+    def caller(i):
+        try:
+            results[i] = flight.do(key, fn)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def wait_for_followers(flight, followers):
+    deadline = time.monotonic() + 5
+    while flight.coalesced < followers:
+        assert time.monotonic() < deadline, "pemanggil lain tidak pernah bergabung"
+        time.sleep(0.001)
+
+
+def test_single_flight_runs_one_call_for_concurrent_callers():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return object()
+
+    threads, results, errors = run_concurrently(flight, 'key', fn, callers=8)
+    wait_for_followers(flight, 7)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert errors == [None] * 8
+    assert all(result is results[0] for result in results)
+    assert flight.in_flight() == 0
+
+
+def test_single_flight_propagates_exception_to_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        raise ValueError("upstream gagal")
+
+    threads, results, errors = run_concurrently(flight, 'key', fn, callers=5)
+    wait_for_followers(flight, 4)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert flight.in_flight() == 0
+    # Kegagalan tidak di-cache: panggilan berikutnya menjalankan fn lagi
+    assert flight.do('key', lambda: 'ok') == 'ok'
+
+
+def test_single_flight_different_keys_run_separately():
+    flight = SingleFlight()
+    assert [flight.do(key, lambda key=key: key * 2) for key in (1, 2)] == [2, 4]
+    with pytest.raises(KeyError):
+        flight.do('x', lambda: {}['missing'])
+    assert flight.coalesced == 0
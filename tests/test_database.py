@@ -0,0 +1,120 @@
+import threading
+import time
+
+import pytest
+
+from database import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.alive = True
+        self.closed = False
+        self.in_transaction = False
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise ConnectionError("server has gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect():
+        created.append(FakeConnection(len(created)))
+        return created[-1]
+
+    return ConnectionPool(connect, **kwargs), created
+
+
+def test_exhausted_pool_raises_pool_timeout():
+    pool, created = make_pool(max_size=2, acquire_timeout=0.05)
+    first, second = pool.acquire(), pool.acquire()
+
+    start = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert time.monotonic() - start >= 0.05
+    assert pool.stats()['timeouts'] == 1
+    assert len(created) == 2
+
+    # Koneksi yang dikembalikan dipakai ulang, bukan membuat koneksi baru
+    first.close()
+    with pool.acquire() as conn:
+        assert conn.number == 0
+    second.close()
+    stats = pool.stats()
+    assert (stats['size'], stats['in_use'], stats['idle'], stats['created']) == (2, 0, 2, 2)
+
+
+def test_waiter_receives_released_connection():
+    pool, _ = make_pool(max_size=1, acquire_timeout=5)
+    held = pool.acquire()
+    result = {}
+
+    def waiter():
+        with pool.acquire() as conn:
+            result['number'] = conn.number
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    while pool.stats()['waiting'] == 0:
+        time.sleep(0.001)
+    held.close()
+    thread.join(timeout=5)
+    assert result == {'number': 0}
+    assert pool.stats()['timeouts'] == 0
+
+
+def test_unhealthy_idle_connection_is_discarded():
+    # Interval negatif: koneksi idle selalu di-ping sebelum diberikan lagi
+    pool, created = make_pool(max_size=1, health_check_interval=-1)
+    with pool.acquire():
+        pass
+    created[0].alive = False
+
+    with pool.acquire() as conn:
+        assert conn.number == 1
+    assert created[0].closed
+    stats = pool.stats()
+    assert stats['health_check_failures'] == 1
+    assert stats['closed'] == 1
+    assert (stats['size'], stats['created']) == (1, 2)
+
+
+def test_healthy_idle_connection_is_reused():
+    pool, created = make_pool(max_size=1, health_check_interval=-1)
+    with pool.acquire():
+        pass
+    with pool.acquire() as conn:
+        assert conn.number == 0
+    assert pool.stats()['health_check_failures'] == 0
+
+
+def test_failed_connect_frees_the_slot():
+    def connect():
+        raise ConnectionError("refused")
+
+    pool = ConnectionPool(connect, max_size=1, acquire_timeout=0.05)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            pool.acquire()
+    stats = pool.stats()
+    assert (stats['size'], stats['in_use'], stats['timeouts']) == (0, 0, 0)
+
+
+def test_release_rolls_back_open_transaction():
+    pool, created = make_pool(max_size=1)
+    with pool.acquire():
+        created[0].in_transaction = True
+    assert created[0].rollbacks == 1
+    assert pool.stats()['idle'] == 1
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATA_PATH
+from preprocessing import TARGET
+from scoring import BatchScorer
+
+
+@pytest.fixture(scope='module')
+def evidence_rows(bundle):
+    """Evidence ter-encode (semua fitur diketahui) untuk 25 pasien pertama dataset."""
+    codes, _, _, errors = BatchScorer.from_bundle(bundle).preprocess(pd.read_csv(DATA_PATH).head(25))
+    assert pd.isna(errors).all()
+    return [{col: int(codes[col][i]) for col in bundle.features} for i in range(len(errors))]
+
+
+@pytest.fixture(scope='module')
+def variable_elimination(model_package):
+    from pgmpy.inference import VariableElimination
+
+    inference = VariableElimination(model_package['model'])
+
+    def query(evidence):
+        return inference.query([TARGET], evidence=evidence, show_progress=False).values
+
+    return query
+
+
+def partial_evidence(evidence_rows, seed=0):
+    # Tiap pasien: beberapa subset acak fitur (termasuk yang menghilangkan fitur blanket)
+    rng = np.random.default_rng(seed)
+    for evidence in evidence_rows:
+        features = list(evidence)
+        for size in (0, 1, 3, 6, len(features) - 1):
+            keep = rng.choice(features, size=size, replace=False)
+            yield {col: evidence[col] for col in keep}
+
+
+def test_posterior_table_matches_variable_elimination(bundle, evidence_rows, variable_elimination):
+    for evidence in evidence_rows:
+        np.testing.assert_allclose(bundle.posterior_table.lookup(evidence), variable_elimination(evidence),
+                                   rtol=0, atol=1e-12)
+
+
+def test_posterior_table_requires_complete_blanket(bundle, evidence_rows):
+    evidence = dict(evidence_rows[0])
+    del evidence[bundle.posterior_table.variables[0]]
+    assert bundle.posterior_table.lookup(evidence) is None
+
+
+def test_junction_tree_matches_variable_elimination_full_evidence(bundle, evidence_rows, variable_elimination):
+    for evidence in evidence_rows:
+        np.testing.assert_allclose(bundle.junction_tree.query(evidence), variable_elimination(evidence),
+                                   rtol=0, atol=1e-12)
+
+
+def test_junction_tree_matches_variable_elimination_partial_evidence(bundle, evidence_rows, variable_elimination):
+    for evidence in partial_evidence(evidence_rows):
+        np.testing.assert_allclose(bundle.junction_tree.query(evidence), variable_elimination(evidence or None),
+                                   rtol=0, atol=1e-12)
+
+
+def test_junction_tree_batch_matches_single_queries(bundle, evidence_rows):
+    rows = list(partial_evidence(evidence_rows, seed=1))
+    # Kode -1 = fitur tidak diketahui
+    codes = {col: np.array([evidence.get(col, -1) for evidence in rows]) for col in bundle.features}
+    expected = np.array([bundle.junction_tree.query(evidence) for evidence in rows])
+    np.testing.assert_allclose(bundle.junction_tree.query_batch(codes), expected, rtol=0, atol=1e-12)
+
+
+def leave_one_out_by_variable_elimination(variable_elimination, evidence, positive):
+    # Kontribusi brute force: P(target | evidence) - P(target | evidence tanpa fitur itu)
+    full = variable_elimination(evidence or None)[positive]
+    return {col: full - variable_elimination({k: v for k, v in evidence.items() if k != col} or None)[positive]
+            for col in evidence}
+
+
+def test_contribution_tables_match_variable_elimination(bundle, evidence_rows, variable_elimination):
+    positive = bundle.positive_index
+    for evidence in evidence_rows:
+        posterior = bundle.posterior_table.lookup(evidence)
+        deltas = bundle.contribution_tables.contributions(evidence, posterior, positive)
+        assert deltas
+        expected = leave_one_out_by_variable_elimination(variable_elimination, evidence, positive)
+        for col, delta in deltas.items():
+            assert delta == pytest.approx(expected[col], abs=1e-12), col
+
+
+def test_junction_tree_leave_one_out_matches_single_queries(bundle, evidence_rows):
+    for evidence in partial_evidence(evidence_rows, seed=2):
+        if not evidence:
+            continue
+        variables = list(evidence)
+        expected = [bundle.junction_tree.query({k: v for k, v in evidence.items() if k != col}) for col in variables]
+        np.testing.assert_allclose(bundle.junction_tree.leave_one_out(evidence, variables), expected,
+                                   rtol=0, atol=1e-12)
+
+
+def test_explain_prediction_matches_variable_elimination(app_module, bundle, evidence_rows, variable_elimination):
+    positive = bundle.positive_index
+    rows = evidence_rows[:10] + list(partial_evidence(evidence_rows[:10], seed=3))
+    for evidence in rows:
+        if not evidence:
+            continue
+        posterior = app_module.compute_posterior(bundle, evidence)
+        contributions = app_module.explain_prediction(bundle, evidence, posterior)
+        expected = leave_one_out_by_variable_elimination(variable_elimination, evidence, positive)
+        assert set(contributions) == set(bundle.features)
+        for col in bundle.features:
+            assert contributions[col] == pytest.approx(expected.get(col, 0.0), abs=1e-12), (col, evidence)
@@ -0,0 +1,114 @@
+import copy
+
+import numpy as np
+import pytest
+
+from artifact import ModelBundle, build_artifact, write_artifact
+from conftest import DATA_PATH
+from model_reload import ModelReloader
+from preprocessing import TARGET
+
+
+def variant(model_package, shift):
+    """Salinan model_package dengan CPD target digeser `shift` ke arah state kebalikannya."""
+    package = copy.deepcopy(model_package)
+    cpd = package['model'].get_cpds(TARGET)
+    cpd.values = (1 - shift) * cpd.values + shift * cpd.values[::-1]
+    return package
+
+
+@pytest.fixture(scope='module')
+def artifacts(model_package):
+    """(meta, arrays) untuk model asli, sedikit berubah, dan target yang dibalik."""
+    return {name: build_artifact(variant(model_package, shift))
+            for name, shift in (('original', 0.0), ('tweaked', 0.02), ('flipped', 1.0))}
+
+
+@pytest.fixture
+def reloader(tmp_path, artifacts):
+    path = str(tmp_path / 'model_artifact.bin')
+    write_artifact(path, *artifacts['original'])
+    # model.joblib tidak ada: yang dimuat hanya artefak
+    return ModelReloader(path, str(tmp_path / 'model.joblib'), canary_data=DATA_PATH, canary_size=50,
+                         max_mean_diff=5)
+
+
+def publish(reloader, artifacts, name):
+    write_artifact(reloader.path, *artifacts[name])
+    return artifacts[name][0]['model_version']
+
+
+def test_canary_rejection_keeps_old_bundle(reloader, artifacts):
+    old = reloader.bundle
+    swaps, warmed = [], []
+    reloader.on_swap.append(lambda: swaps.append(1))
+    reloader.warmup = warmed.append
+    version = publish(reloader, artifacts, 'flipped')
+
+    result = reloader.reload()
+    assert result['status'] == 'rejected'
+    assert result['version'] == version
+    assert result['canary']['mean_abs_diff'] > reloader.max_mean_diff
+    assert reloader.bundle is old
+    assert (swaps, warmed) == ([], [])
+    assert reloader.stats()['rejected'] == 1
+    # Sudah dicoba: watcher tidak memuat file yang sama lagi
+    assert reloader.check() is None
+
+
+def test_successful_swap_warms_up_and_calls_on_swap(reloader, artifacts):
+    old_version = reloader.bundle.version
+    events = []
+    reloader.warmup = lambda bundle: events.append(('warmup', bundle.version))
+    reloader.on_swap.append(lambda: events.append(('swap', reloader.bundle.version)))
+    version = publish(reloader, artifacts, 'tweaked')
+
+    result = reloader.check()
+    assert result['status'] == 'swapped'
+    assert (result['previous_version'], result['version']) == (old_version, version)
+    assert 0 < result['canary']['mean_abs_diff'] <= reloader.max_mean_diff
+    assert reloader.bundle.version == version
+    # Warm-up pada bundle baru sebelum ditukar, callback setelahnya
+    assert events == [('warmup', version), ('swap', version)]
+    assert reloader.reload()['status'] == 'unchanged'
+
+
+def test_force_skips_mean_diff_limit(reloader, artifacts):
+    version = publish(reloader, artifacts, 'flipped')
+    assert reloader.reload(force=True)['status'] == 'swapped'
+    assert reloader.bundle.version == version
+
+
+@pytest.fixture
+def prediction_cache(app_module):
+    app_module.prediction_cache.clear()
+    yield app_module.prediction_cache
+    app_module.prediction_cache.clear()
+
+
+def test_swap_clears_prediction_cache(app_module, reloader, artifacts, prediction_cache):
+    assert prediction_cache.clear in app_module.model_reloader.on_swap
+    reloader.on_swap.append(prediction_cache.clear)
+    evidence, _ = app_module.preprocess_input(reloader.bundle, app_module.WARMUP_PATIENT)
+    app_module.predict_evidence(reloader.bundle, evidence)
+    assert prediction_cache.stats()['size'] == 1
+
+    publish(reloader, artifacts, 'tweaked')
+    assert reloader.reload()['status'] == 'swapped'
+    assert prediction_cache.stats()['size'] == 0
+
+
+def test_prediction_cache_key_includes_bundle_version(app_module, artifacts, prediction_cache):
+    old, new = (ModelBundle(*artifacts[name]) for name in ('original', 'tweaked'))
+    evidence, _ = app_module.preprocess_input(old, app_module.WARMUP_PATIENT)
+    before = prediction_cache.stats()
+
+    old_posterior, _ = app_module.predict_evidence(old, evidence)
+    assert app_module.predict_evidence(old, evidence)[0] is old_posterior
+    # Evidence sama, versi lain: tidak memakai hasil model lama
+    new_posterior, _ = app_module.predict_evidence(new, evidence)
+    assert new_posterior is not old_posterior
+    assert new_posterior[old.positive_index] != pytest.approx(old_posterior[old.positive_index])
+    np.testing.assert_array_equal(new_posterior, app_module.compute_posterior(new, evidence))
+    stats = prediction_cache.stats()
+    assert (stats['size'], stats['hits'] - before['hits'], stats['misses'] - before['misses']) == (2, 1, 2)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATA_PATH
+from preprocessing import (CATEGORICAL_FEATURES, DISCRETIZER_BINS, NUMERIC_FEATURES, ZERO_AS_MISSING, Preprocessor,
+                           category_label)
+
+
+@pytest.fixture(scope='module')
+def preprocessor(model_package):
+    return Preprocessor.from_encoders(model_package['discretizer_bins'], model_package['encoders'],
+                                      model_package['medians'])
+
+
+def label_encoder_codes(encoder, labels):
+    # Referensi: LabelEncoder.transform untuk label yang dikenal, -1 untuk yang tidak
+    labels = np.asarray([str(label) for label in labels], dtype=object)
+    known = np.isin(labels, encoder.classes_)
+    codes = np.full(len(labels), -1)
+    codes[known] = encoder.transform(labels[known])
+    return codes
+
+
+def numeric_values(df, col):
+    # Seluruh kolom dataset + batas bin (tepat, sedikit di bawah/atas), nol, di luar rentang, NaN
+    edges = np.asarray(DISCRETIZER_BINS[col][0], dtype=np.float64)
+    finite = edges[np.isfinite(edges)]
+    extra = np.concatenate([finite, np.nextafter(finite, -np.inf), np.nextafter(finite, np.inf),
+                            [0.0, -1.0, 1e6, -1e6, np.inf, -np.inf, np.nan]])
+    return np.concatenate([df[col].to_numpy(dtype=np.float64), extra])
+
+
+@pytest.mark.parametrize('col', NUMERIC_FEATURES)
+def test_numeric_transform_matches_pd_cut_and_label_encoder(preprocessor, model_package, col):
+    values = numeric_values(pd.read_csv(DATA_PATH), col)
+    imputed = values.copy()
+    if col in ZERO_AS_MISSING:
+        imputed[imputed == 0] = model_package['medians'][col]
+    bins, labels = model_package['discretizer_bins'][col]
+    expected_labels = pd.cut(imputed, bins, labels=labels, right=False).astype(object)
+    expected = label_encoder_codes(model_package['encoders'][col], expected_labels)
+
+    np.testing.assert_array_equal(preprocessor.transform(col, values), expected)
+    np.testing.assert_array_equal(preprocessor.discretize(col, values).astype(str),
+                                  [str(label) for label in expected_labels])
+    # Jalur skalar (satu pasien) sama dengan jalur array
+    assert [int(preprocessor.transform(col, v)) for v in values] == expected.tolist()
+
+
+@pytest.mark.parametrize('col', CATEGORICAL_FEATURES)
+def test_categorical_encode_matches_label_encoder(preprocessor, model_package, col):
+    values = pd.read_csv(DATA_PATH, dtype={col: str})[col].tolist() + ['ZZZ', '', 'nan']
+    expected = label_encoder_codes(model_package['encoders'][col], values)
+    np.testing.assert_array_equal(preprocessor.encode(col, np.asarray(values, dtype=object)), expected)
+    assert [preprocessor.encode(col, v) for v in values] == expected.tolist()
+
+
+def test_category_label():
+    assert [category_label(v) for v in (1.0, 0.0, np.float64(1), 1, '1', 'ASY', 1.5)] == \
+        ['1', '0', '1', '1', '1', 'ASY', '1.5']
+    assert category_label(np.nan) == 'nan'
@@ -0,0 +1,139 @@
+import base64
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATA_PATH
+from scoring import BatchScorer
+
+
+@pytest.fixture(scope='module')
+def records():
+    return pd.read_csv(DATA_PATH).drop(columns='HeartDisease').head(3).to_dict('records')
+
+
+def batch_risks(client, records):
+    response = client.post('/api/predict_batch', json=records)
+    assert response.status_code == 200
+    return [result['risk'] for result in response.get_json()['results']]
+
+
+def test_predict_batch_numeric_categorical_with_missing_record(client, records):
+    # FastingBS dikirim sebagai angka JSON; satu record tanpa FastingBS membuat kolomnya float64
+    assert isinstance(records[0]['FastingBS'], int)
+    gap = [dict(record) for record in records]
+    del gap[2]['FastingBS']
+    full_risks = batch_risks(client, records)
+    gap_risks = batch_risks(client, gap)
+    assert gap_risks[:2] == full_risks[:2]
+    # Record tanpa FastingBS dihitung dengan FastingBS tidak diketahui, sama seperti jalur satu pasien
+    single = client.post('/api/what_if', json=gap[2])
+    assert single.status_code == 200
+    assert gap_risks[2] == single.get_json()['risk']
+    assert gap_risks[2] != full_risks[2]
+
+
+def test_batch_scorer_float_and_nullable_categorical(bundle):
+    df = pd.read_csv(DATA_PATH).drop(columns='HeartDisease').head(20)
+    expected = BatchScorer.from_bundle(bundle).score(df, reasons=False)['risk']
+    for column in (df['FastingBS'].astype('float64'), df['FastingBS'].astype('Int64')):
+        scored = BatchScorer.from_bundle(bundle).score(df.assign(FastingBS=column), reasons=False)['risk']
+        np.testing.assert_array_equal(scored, expected)
+
+    # Nilai kosong (NaN, pd.NA, None) = tidak diketahui, bukan kategori 'nan'
+    unknown = df.drop(columns='FastingBS')
+    expected = BatchScorer.from_bundle(bundle).score(unknown, reasons=False)['risk']
+    for missing in (np.nan, pd.NA, None):
+        column = df['FastingBS'].astype('Int64' if missing is pd.NA else object)
+        column[:] = missing
+        scored = BatchScorer.from_bundle(bundle).score(df.assign(FastingBS=column), reasons=False)['risk']
+        np.testing.assert_array_equal(scored, expected)
+
+
+@pytest.fixture
+def mock_gemini(monkeypatch):
+    import gemini_client
+    import mock_gemini
+    from caching import LRUCache
+
+    server, base_url = mock_gemini.start_in_thread()
+    monkeypatch.setattr(gemini_client, 'GEMINI_API_BASE', base_url)
+    monkeypatch.setattr(gemini_client, 'advice_cache', LRUCache(maxsize=16))
+    yield server
+    server.shutdown()
+
+
+@pytest.mark.parametrize('path', ['/get_gemini_advice', '/get_gemini_advice/stream'])
+def test_advice_cache_counts_one_lookup_per_request(client, records, mock_gemini, path):
+    import gemini_client
+
+    body = {'formData': {**{k: str(v) for k, v in records[0].items()}, 'Name': 'Pasien Cache'}}
+    texts = []
+    for _ in range(3):
+        response = client.post(path, json=body)
+        assert response.status_code == 200
+        texts.append(response.get_data(as_text=True))
+    stats = gemini_client.advice_cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (2, 1, round(2 / 3, 4))
+    assert mock_gemini.stats['requests'] == 1
+    assert texts[1] == texts[2]
+
+
+SAVED_NAMES = ['Budi', 'Ani', 'Budi', 'Citra', 'Ani', 'Budi', 'Dewi']
+
+
+@pytest.fixture
+def saved_users(sqlite_database):
+    """SQLite berisi SAVED_NAMES (id 1..7); nama kembar supaya batas halaman jatuh di tengah nama."""
+    row = pd.read_csv(DATA_PATH).drop(columns='HeartDisease').iloc[0].to_dict()
+    sqlite_database([{**row, 'Name': name, 'LastRiskPercentage': 10.0 * i} for i, name in enumerate(SAVED_NAMES)])
+    return sorted((name, i + 1) for i, name in enumerate(SAVED_NAMES))
+
+
+def saved_users_pages(client, **params):
+    pages, cursor = [], None
+    while True:
+        response = client.get('/get_saved_users', query_string={**params, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        body = response.get_json()
+        pages.append([(user['Name'], user['id']) for user in body['users']])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return pages
+        assert len(pages) <= len(SAVED_NAMES), "cursor tidak pernah habis"
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 6])
+def test_saved_users_pages_follow_name_id_order(client, saved_users, limit):
+    pages = saved_users_pages(client, limit=limit)
+    assert [user for page in pages for user in page] == saved_users
+    assert all(len(page) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+
+
+def test_saved_users_last_page_has_no_cursor(client, saved_users):
+    # Halaman pas habis: tidak ada cursor ke halaman kosong
+    assert saved_users_pages(client, limit=len(SAVED_NAMES)) == [saved_users]
+    assert saved_users_pages(client, limit=len(SAVED_NAMES) + 1) == [saved_users]
+    pages = saved_users_pages(client, limit=len(SAVED_NAMES) - 1)
+    assert [len(page) for page in pages] == [len(SAVED_NAMES) - 1, 1]
+
+
+def test_saved_users_prefix_with_cursor(client, saved_users):
+    pages = saved_users_pages(client, limit=2, q='Bu')
+    assert pages == [[('Budi', 1), ('Budi', 3)], [('Budi', 6)]]
+
+
+@pytest.mark.parametrize('params', [
+    {'cursor': 'bukan-base64!'},
+    {'cursor': base64.urlsafe_b64encode(b'bukan json').decode()},
+    {'cursor': base64.urlsafe_b64encode(b'{"Name": "Ani"}').decode()},
+    {'cursor': base64.urlsafe_b64encode(b'["Ani", "x"]').decode()},
+    {'cursor': base64.urlsafe_b64encode(b'5').decode()},
+    {'limit': 'abc'},
+])
+def test_saved_users_invalid_parameters(client, saved_users, params):
+    response = client.get('/get_saved_users', query_string=params)
+    assert response.status_code == 400
+    assert response.get_json() == {'status': 'error', 'message': "Parameter limit/cursor tidak valid."}
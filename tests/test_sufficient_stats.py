@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import sufficient_stats
+from conftest import DATA_PATH
+from preprocessing import Preprocessor
+from structure_learning import FamilyScorer
+from sufficient_stats import (CPD_PRIOR_ESS, SufficientStats, column_counts, encode_frame, fit_encoders,
+                              read_training_csv)
+
+
+@pytest.fixture(scope='module')
+def structure(model_package):
+    """Struktur tetap (edge model.joblib) sebagai model pgmpy kosong."""
+    from pgmpy.models import DiscreteBayesianNetwork
+
+    model = DiscreteBayesianNetwork(model_package['model'].edges())
+    model.add_nodes_from(model_package['model'].nodes())
+    return model
+
+
+@pytest.fixture(scope='module')
+def encoded():
+    """Dataset ter-encode in-memory: (DataFrame kode, kardinalitas, preprocessor)."""
+    df = read_training_csv(DATA_PATH)
+    medians, encoders, bins = fit_encoders(column_counts(df))
+    preprocessor = Preprocessor.from_encoders(bins, encoders, medians)
+    codes = encode_frame(df, preprocessor)
+    data = pd.DataFrame({col: codes[col].astype(np.int64) for col in df.columns})
+    cards = {col: len(encoders[col].classes_) for col in df.columns}
+    return data, cards, medians
+
+
+@pytest.fixture(scope='module')
+def bayesian_estimator(structure, encoded):
+    from pgmpy.estimators import BayesianEstimator
+
+    data, cards, _ = encoded
+    estimator = BayesianEstimator(structure, data, state_names={col: list(range(card)) for col, card in cards.items()})
+    return {node: estimator.estimate_cpd(node, prior_type='BDeu', equivalent_sample_size=CPD_PRIOR_ESS)
+            for node in structure.nodes()}
+
+
+def assert_cpds_equal(cpds, expected):
+    assert {cpd.variable for cpd in cpds} == set(expected)
+    for cpd in cpds:
+        reference = expected[cpd.variable]
+        assert cpd.variables == reference.variables
+        assert cpd.state_names == reference.state_names
+        np.testing.assert_allclose(cpd.get_values(), reference.get_values(), rtol=0, atol=1e-12)
+
+
+def split_codes(data, parts):
+    bounds = np.linspace(0, len(data), parts + 1).astype(int)
+    return [{col: data[col].to_numpy()[start:stop] for col in data.columns}
+            for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def test_chunked_csv_matches_bayesian_estimator(structure, encoded, bayesian_estimator):
+    data, cards, medians = encoded
+    stats, _, _ = SufficientStats.from_csv(DATA_PATH, chunksize=100)
+    assert stats.n == len(data)
+    assert stats.cards == cards
+    assert stats.medians == medians
+    stats.fit_families(structure, stats.scorer())
+    assert_cpds_equal(stats.cpds(), bayesian_estimator)
+
+
+def test_incremental_update_matches_bayesian_estimator(structure, encoded, bayesian_estimator):
+    data, cards, medians = encoded
+    first, second = split_codes(data, 2)
+    stats = SufficientStats(cards, medians=medians)
+    stats.update(first)
+    # Struktur diketahui setelah data pertama; data berikutnya hanya menambah count keluarga
+    stats.fit_families(structure, stats.scorer())
+    stats.update(second)
+    assert stats.n == len(data)
+    assert_cpds_equal(stats.cpds(), bayesian_estimator)
+
+
+def test_code_columns_without_joint_table(monkeypatch, structure, encoded, bayesian_estimator):
+    # Tabel gabungan terlalu besar -> kode int8 per chunk dikumpulkan untuk scorer
+    monkeypatch.setattr(sufficient_stats, 'JOINT_COUNTS_MAX_CELLS', 0)
+    data, cards, _ = encoded
+    stats = SufficientStats(cards)
+    assert stats.joint is None
+    for codes in split_codes(data, 7):
+        stats.update(codes)
+    scorer = stats.scorer()
+    assert isinstance(scorer, FamilyScorer)
+    stats.fit_families(structure, scorer)
+    assert_cpds_equal(stats.cpds(), bayesian_estimator)
+
+
+def test_saved_stats_keep_counting(tmp_path, structure, encoded, bayesian_estimator):
+    data, cards, medians = encoded
+    first, second = split_codes(data, 2)
+    stats = SufficientStats(cards, medians=medians)
+    stats.update(first)
+    stats.fit_families(structure, stats.scorer())
+    path = str(tmp_path / 'model_stats.bin')
+    stats.save(path)
+    loaded = SufficientStats.load(path)
+    loaded.update(second)
+    assert loaded.n == len(data)
+    assert loaded.medians == medians
+    assert_cpds_equal(loaded.cpds(), bayesian_estimator)
@@ -0,0 +1,122 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import update_model
+from conftest import DATA_PATH, MODEL_PATH
+from preprocessing import TARGET, Preprocessor
+from sufficient_stats import SufficientStats, encode_frame
+
+PATIENTS = 6
+
+
+@pytest.fixture
+def records():
+    df = pd.read_csv(DATA_PATH).drop(columns=TARGET).head(PATIENTS)
+    return [{**record, 'Name': f"Pasien {i}", 'LastRiskPercentage': 50.0}
+            for i, record in enumerate(df.to_dict('records'))]
+
+
+@pytest.fixture
+def paths(tmp_path, model_package):
+    """model.joblib salinan + statistik dari heart.csv (struktur model.joblib) di tmp_path."""
+    model_path = str(tmp_path / 'model.joblib')
+    shutil.copy(MODEL_PATH, model_path)
+    stats, _, _ = SufficientStats.from_csv(DATA_PATH)
+    stats.fit_families(model_package['model'], stats.scorer())
+    stats_path = str(tmp_path / 'model_stats.bin')
+    stats.save(stats_path)
+    return {'model_path': model_path, 'artifact_path': str(tmp_path / 'model_artifact.bin'), 'stats_path': stats_path}
+
+
+@pytest.fixture
+def diagnose(client):
+    def post(user_id, heart_disease):
+        response = client.post(f'/save_diagnosis/{user_id}', json={'HeartDisease': heart_disease})
+        assert response.status_code == 200
+
+    return post
+
+
+def expected_stats(paths, records, diagnoses):
+    """Statistik awal + count pasien `diagnoses` ({id: 0/1}) dihitung langsung."""
+    stats = SufficientStats.load(paths['stats_path'])
+    rows = pd.DataFrame([{**records[user_id - 1], TARGET: label} for user_id, label in diagnoses.items()])
+    stats.update(encode_frame(rows, Preprocessor.from_encoders(*stats_encoders(paths), stats.medians)))
+    return stats
+
+
+def stats_encoders(paths):
+    import joblib
+
+    package = joblib.load(paths['model_path'])
+    return package['discretizer_bins'], package['encoders']
+
+
+def assert_counts_equal(stats, expected):
+    assert stats.n == expected.n
+    assert stats.families.keys() == expected.families.keys()
+    for node, (parents, table) in expected.families.items():
+        assert stats.families[node][0] == parents
+        np.testing.assert_array_equal(stats.families[node][1], table)
+    np.testing.assert_array_equal(stats.joint, expected.joint)
+
+
+def run_update(paths):
+    return update_model.update(batch_size=2, **paths)
+
+
+def test_late_and_changed_diagnoses_are_counted_once(sqlite_database, records, paths, diagnose):
+    sqlite_database(records)
+    expected = expected_stats(paths, records, {2: 1, 3: 0})
+
+    diagnose(3, 1)
+    diagnose(5, 0)
+    result = run_update(paths)
+    assert (result['status'], result['rows'], result['removed']) == ('published', 2, 0)
+
+    # Id lebih kecil yang diagnosisnya baru diisi setelah id 3 dan 5 dihitung
+    diagnose(2, 1)
+    result = run_update(paths)
+    assert (result['rows'], result['removed']) == (1, 0)
+
+    # Diagnosis diubah dan dihapus: count lama dikurangi
+    diagnose(3, 0)
+    diagnose(5, None)
+    result = run_update(paths)
+    assert (result['rows'], result['removed']) == (1, 2)
+
+    result = run_update(paths)
+    assert (result['status'], result['rows'], result['removed']) == ('unchanged', 0, 0)
+
+    stats = SufficientStats.load(paths['stats_path'])
+    assert sorted(stats.counted) == [2, 3]
+    assert_counts_equal(stats, expected)
+
+
+def test_legacy_id_watermark(sqlite_database, records, paths, diagnose):
+    sqlite_database(records)
+    for user_id in (2, 3, 5):
+        diagnose(user_id, 1)
+    # Statistik format lama: id <= 3 sudah dihitung, tanpa catatan per baris
+    legacy = expected_stats(paths, records, {2: 1, 3: 1})
+    legacy.watermark = 3
+    legacy.save(paths['stats_path'])
+    expected = expected_stats(paths, records, {5: 1})
+
+    result = run_update(paths)
+    assert (result['rows'], result['removed']) == (1, 0)
+    stats = SufficientStats.load(paths['stats_path'])
+    assert sorted(stats.counted) == [2, 3, 5]
+    assert_counts_equal(stats, expected)
+
+
+def test_class_weights_apply_to_new_rows(paths, records):
+    stats = SufficientStats.load(paths['stats_path'])
+    before = stats.families[TARGET][1].copy()
+    stats.set_class_weights({0: 2.0, 1: 0.5})
+    rows = pd.DataFrame([{**records[0], TARGET: 0}, {**records[1], TARGET: 1}])
+    stats.update(encode_frame(rows, Preprocessor.from_encoders(*stats_encoders(paths), stats.medians)))
+    assert stats.families[TARGET][1].sum() == pytest.approx(before.sum() + 2.5)
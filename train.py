@@ -1,25 +1,29 @@
+import argparse
+
 import pandas as pd
 import numpy as np
 import joblib
 from sklearn.preprocessing import LabelEncoder
-from imblearn.combine import SMOTETomek
 from pgmpy.models import DiscreteBayesianNetwork
-from pgmpy.estimators import HillClimbSearch, BayesianEstimator
-
-print("Memulai skrip training model...")
+from artifact import export_artifact, ARTIFACT_PATH
+from rebalancing import REBALANCE_JOBS, REBALANCE_METHODS, RESAMPLERS, STREAMING_METHODS, rebalance, resampled_class_weights
+from preprocessing import (CATEGORICAL_FEATURES, NUMERIC_FEATURES, TARGET, DISCRETIZER_BINS, ZERO_AS_MISSING,
+                           discretize, impute_zero)
+from structure_learning import STRUCTURE_SCORES, FamilyScorer, ParallelHillClimb
+from sufficient_stats import STATS_PATH, SufficientStats
 
 # --- Konfigurasi & Definisi ---
 
 # Fitur kategorikal dan numerik berdasarkan dataset
-# (HeartDisease adalah target)
-CATEGORICAL_FEATURES = ['Sex', 'ChestPainType', 'FastingBS', 'RestingECG', 'ExerciseAngina', 'ST_Slope']
-NUMERIC_FEATURES = ['Age', 'RestingBP', 'Cholesterol', 'MaxHR', 'Oldpeak']
-TARGET = 'HeartDisease'
+# (HeartDisease adalah target). Definisi & bin ada di preprocessing.py,
+# dipakai bersama dengan app.py.
 
 # Kamus untuk menyimpan encoder
 encoders = {}
 # Kamus untuk menyimpan bin (kelompok) untuk data numerik
 discretizer_bins = {}
+# Kamus untuk menyimpan median pengganti nilai 0 (dipakai lagi oleh update_model.py)
+medians = {}
 
 # --- Fungsi Preprocessing ---
 
@@ -28,48 +32,21 @@ def preprocess(df):
     df_processed = df.copy()
     
     # Ganti nilai 0 yang tidak logis (sesuai deskripsi data Kaggle)
-    # RestingBP 0 tidak mungkin, ganti dengan median
-    median_bp = df_processed['RestingBP'].median()
-    df_processed['RestingBP'] = df_processed['RestingBP'].replace(0, median_bp)
-    
-    # Cholesterol 0 tidak mungkin, ganti dengan median
-    median_chol = df_processed['Cholesterol'].median()
-    df_processed['Cholesterol'] = df_processed['Cholesterol'].replace(0, median_chol)
+    # RestingBP / Cholesterol 0 tidak mungkin, ganti dengan median. Median disimpan di model
+    # supaya app.py melakukan penggantian yang sama (lihat Preprocessor)
+    for col in ZERO_AS_MISSING:
+        medians[col] = df_processed[col].median()
+        df_processed[col] = impute_zero(df_processed[col], medians[col])
 
     # --- Diskretisasi Fitur Numerik ---
     # Mengubah fitur numerik menjadi kategori (penting untuk Bayesian Network)
     # Ini sesuai dengan slide Anda (misal "Umur >= 60")
     print("Melakukan diskretisasi fitur numerik...")
     
-    # Age
-    bins = [0, 40, 60, 100]
-    labels = ['<40', '40-60', '>60']
-    df_processed['Age'] = pd.cut(df_processed['Age'], bins=bins, labels=labels, right=False)
-    discretizer_bins['Age'] = (bins, labels)
-
-    # RestingBP
-    bins = [0, 120, 140, 160, 300]
-    labels = ['Normal', 'Elevated', 'High S1', 'High S2']
-    df_processed['RestingBP'] = pd.cut(df_processed['RestingBP'], bins=bins, labels=labels, right=False)
-    discretizer_bins['RestingBP'] = (bins, labels)
-
-    # Cholesterol
-    bins = [0, 200, 240, 600]
-    labels = ['Normal', 'Borderline', 'High']
-    df_processed['Cholesterol'] = pd.cut(df_processed['Cholesterol'], bins=bins, labels=labels, right=False)
-    discretizer_bins['Cholesterol'] = (bins, labels)
-
-    # MaxHR
-    bins = [0, 100, 140, 170, 250]
-    labels = ['Very Low', 'Low', 'Normal', 'High']
-    df_processed['MaxHR'] = pd.cut(df_processed['MaxHR'], bins=bins, labels=labels, right=False)
-    discretizer_bins['MaxHR'] = (bins, labels)
-    
-    # Oldpeak
-    bins = [-np.inf, 0, 1, 2.5, np.inf]
-    labels = ['Normal', 'Low', 'Medium', 'High']
-    df_processed['Oldpeak'] = pd.cut(df_processed['Oldpeak'], bins=bins, labels=labels, right=False)
-    discretizer_bins['Oldpeak'] = (bins, labels)
+    for col in NUMERIC_FEATURES:
+        bins, labels = DISCRETIZER_BINS[col]
+        df_processed[col] = discretize(df_processed[col], bins, labels)
+        discretizer_bins[col] = (bins, labels)
     
     # --- Encoding Fitur Kategorikal ---
     # Mengubah semua fitur (termasuk yang baru didiskretisasi) menjadi angka
@@ -87,63 +64,142 @@ def preprocess(df):
     print("Preprocessing selesai.")
     return df_processed
 
-# --- Muat & Proses Data ---
-try:
-    data = pd.read_csv('data/heart.csv')
-    processed_data = preprocess(data)
-except FileNotFoundError:
-    print("ERROR: File 'data/heart.csv' tidak ditemukan.")
-    print("Silakan download dataset dari Kaggle dan letakkan di folder 'data/'.")
-    exit()
-
-# --- SMOTE-Tomek ---
-print("Memisahkan X dan y...")
-X = processed_data.drop(TARGET, axis=1)
-y = processed_data[TARGET]
-
-print("Ukuran data sebelum SMOTE-Tomek:")
-print(y.value_counts())
-
-print("Menerapkan SMOTE-Tomek... (Ini mungkin butuh beberapa saat)")
-smt = SMOTETomek(random_state=42)
-X_resampled, y_resampled = smt.fit_resample(X, y)
-
-print("Ukuran data setelah SMOTE-Tomek:")
-print(y_resampled.value_counts())
-
-# Gabungkan kembali data untuk training Bayesian Network
-resampled_data = pd.concat([X_resampled, y_resampled], axis=1)
-# Kembalikan nama kolom
-resampled_data.columns = processed_data.columns
-
-# --- Training Bayesian Network ---
-print("Memulai training Bayesian Network...")
-
-# a. Belajar Struktur (Mencari hubungan sebab-akibat / DAG)
-print("Step 5a: Belajar struktur model (HillClimbSearch)...")
-hc = HillClimbSearch(data=resampled_data)
-best_structure = hc.estimate()
-print("Struktur model (edges):")
-print(best_structure.edges())
-
-model = DiscreteBayesianNetwork(best_structure.edges())
-
-# b. Belajar Parameter (Menghitung probabilitas)
-print("Step 5b: Belajar parameter model (BayesianEstimator)...")
-model.fit(resampled_data, estimator=BayesianEstimator)
-print("Model berhasil dilatih.")
-
-# --- Simpan Model & Objek Preprocessing ---
-print("Menyimpan model dan objek preprocessing ke 'model.joblib'...")
-# Simpan semua yang kita perlukan untuk prediksi dalam satu file
-save_package = {
-    'model': model,
-    'encoders': encoders,
-    'discretizer_bins': discretizer_bins,
-    'all_features': NUMERIC_FEATURES + CATEGORICAL_FEATURES # Urutan fitur
-}
-joblib.dump(save_package, 'model.joblib')
-
-print("--- TRAINING SELESAI ---")
-print("Model berhasil disimpan sebagai 'model.joblib'.")
-print("Sekarang bisa menjalankan 'flask run' untuk memulai web app!")
\ No newline at end of file
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Training Bayesian Network prediksi penyakit jantung.")
+    parser.add_argument('--score', choices=STRUCTURE_SCORES, default='bic', help="Skor pencarian struktur")
+    parser.add_argument('--ess', type=float, default=10, help="Equivalent sample size untuk skor bdeu")
+    parser.add_argument('--max-indegree', type=int, help="Batas jumlah parent per node (default: tanpa batas)")
+    parser.add_argument('--restarts', type=int, default=0, help="Jumlah random restart hill climbing")
+    parser.add_argument('--jobs', type=int, default=1, help="Jumlah proses pencarian struktur (0 = semua CPU)")
+    parser.add_argument('--seed', type=int, default=42, help="Seed untuk random restart")
+    parser.add_argument('--data', default='data/heart.csv', help="File CSV dataset")
+    parser.add_argument('--chunksize', type=int,
+                        help="Baca data per chunk sebanyak ini baris (out-of-core; rebalancing: reweight/none)")
+    parser.add_argument('--rebalance', choices=REBALANCE_METHODS,
+                        help="Metode penyeimbangan kelas (default: smote-tomek, atau reweight dengan --chunksize)")
+    parser.add_argument('--rebalance-jobs', type=int, default=REBALANCE_JOBS,
+                        help="n_jobs pencarian tetangga terdekat untuk smote/smote-tomek (-1 = semua CPU)")
+    args = parser.parse_args(argv)
+
+    rebalance_method = args.rebalance or ('reweight' if args.chunksize else 'smote-tomek')
+    if args.chunksize and rebalance_method not in STREAMING_METHODS:
+        parser.error(f"--rebalance {rebalance_method} butuh seluruh data di memori; "
+                     f"dengan --chunksize pilih {' atau '.join(STREAMING_METHODS)}")
+
+    print("Memulai skrip training model...")
+
+    if args.chunksize:
+        # --- Muat Data per Chunk (out-of-core) ---
+        # Yang disimpan hanya count (lihat sufficient_stats.py). Resampling (SMOTE dkk.) butuh
+        # seluruh baris di memori, jadi di mode ini kelas diseimbangkan dengan bobot pada count.
+        print(f"Membaca '{args.data}' per {args.chunksize} baris (mode chunked, rebalancing: {rebalance_method})...")
+        try:
+            stats, chunk_encoders, chunk_bins = SufficientStats.from_csv(args.data, args.chunksize,
+                                                                         reweight=rebalance_method == 'reweight')
+        except FileNotFoundError:
+            print(f"ERROR: File '{args.data}' tidak ditemukan.")
+            return
+        encoders.update(chunk_encoders)
+        discretizer_bins.update(chunk_bins)
+        print(f"{stats.n} baris diproses, tabel kontingensi gabungan: "
+              f"{'ya' if stats.joint is not None else 'tidak (kode int8 disimpan)'}.")
+        scorer = stats.scorer(args.score, args.ess)
+    else:
+        # --- Muat & Proses Data ---
+        try:
+            data = pd.read_csv(args.data)
+            processed_data = preprocess(data)
+        except FileNotFoundError:
+            print(f"ERROR: File '{args.data}' tidak ditemukan.")
+            print("Silakan download dataset dari Kaggle dan letakkan di folder 'data/'.")
+            return
+
+        # --- Rebalancing Kelas (default SMOTE-Tomek, lihat rebalancing.py) ---
+        print("Memisahkan X dan y...")
+        X = processed_data.drop(TARGET, axis=1)
+        y = processed_data[TARGET]
+
+        print(f"Ukuran data sebelum rebalancing ({rebalance_method}):")
+        print(y.value_counts())
+
+        print(f"Menerapkan {rebalance_method}... (Ini mungkin butuh beberapa saat)")
+        X_resampled, y_resampled, class_weights, seconds = rebalance(
+            rebalance_method, X, y, random_state=42, n_jobs=args.rebalance_jobs)
+        print(f"Rebalancing selesai dalam {seconds:.3f} detik.")
+
+        if class_weights:
+            print("Bobot kelas (diterapkan ke count):", {c: round(w, 4) for c, w in class_weights.items()})
+        else:
+            print("Ukuran data setelah rebalancing:")
+            print(y_resampled.value_counts())
+
+        # Gabungkan kembali data untuk training Bayesian Network
+        resampled_data = pd.concat([X_resampled, y_resampled], axis=1)
+        # Kembalikan nama kolom
+        resampled_data.columns = processed_data.columns
+        # State tiap variabel = semua kelas encoder (kode 0..k-1)
+        codes = {col: resampled_data[col].to_numpy().astype(np.int8) for col in resampled_data.columns}
+        cards = {col: len(encoders[col].classes_) for col in resampled_data.columns}
+        stats = SufficientStats(cards, medians=medians, class_weights=class_weights)
+        stats.update(codes)
+        scorer = FamilyScorer(codes, cards, args.score, args.ess, weights=stats.row_weights(codes))
+        if rebalance_method in RESAMPLERS:
+            # Count di atas berasal dari data hasil resampling; baris asli yang nanti ditambahkan
+            # update_model.py dibobot supaya proporsi kelasnya tetap sama dengan data training
+            stats.set_class_weights(resampled_class_weights(y, y_resampled))
+
+    # --- Training Bayesian Network ---
+    print("Memulai training Bayesian Network...")
+
+    # a. Belajar Struktur (Mencari hubungan sebab-akibat / DAG)
+    print(f"Step 5a: Belajar struktur model (hill climbing, skor {args.score}, "
+          f"{args.restarts} restart, {args.jobs} proses)...")
+    hc = ParallelHillClimb(scorer, jobs=args.jobs)
+    best_edges = hc.estimate(max_indegree=args.max_indegree, restarts=args.restarts, seed=args.seed)
+    print(f"Skor struktur terbaik: {hc.best_score:.2f}")
+    if hc.restart_scores:
+        print("Skor tiap restart:", [round(score, 2) for score in hc.restart_scores])
+    print("Cache skor keluarga:", hc.scorer.stats())
+    print("Struktur model (edges):")
+    print(best_edges)
+
+    model = DiscreteBayesianNetwork(best_edges)
+
+    # b. Belajar Parameter (Menghitung probabilitas)
+    # CPD = BayesianEstimator (prior BDeu, ess 5), dihitung dari count yang sama dengan pencarian struktur
+    print("Step 5b: Belajar parameter model (BayesianEstimator)...")
+    stats.fit_families(model, hc.scorer)
+    model.add_cpds(*stats.cpds())
+    model.check_model()
+    print("Model berhasil dilatih.")
+
+    # --- Simpan Model & Objek Preprocessing ---
+    print("Menyimpan model dan objek preprocessing ke 'model.joblib'...")
+    # Simpan semua yang kita perlukan untuk prediksi dalam satu file
+    save_package = {
+        'model': model,
+        'encoders': encoders,
+        'discretizer_bins': discretizer_bins,
+        'medians': {col: float(value) for col, value in stats.medians.items()},  # Pengganti nilai 0
+        'all_features': NUMERIC_FEATURES + CATEGORICAL_FEATURES # Urutan fitur
+    }
+    joblib.dump(save_package, 'model.joblib')
+
+    # --- Ekspor Artefak Serving ---
+    # CPD + tabel posterior/kontribusi + metadata JSON; app.py memuat ini tanpa pgmpy/sklearn
+    print(f"Mengekspor artefak serving ke '{ARTIFACT_PATH}'...")
+    export_artifact(save_package, ARTIFACT_PATH)
+
+    # --- Simpan Statistik Cukup ---
+    # Count per keluarga CPD; update_model.py menambahkan data baru ke sini tanpa training ulang
+    print(f"Menyimpan statistik training ({stats.n} baris) ke '{STATS_PATH}'...")
+    stats.save(STATS_PATH)
+
+    print("--- TRAINING SELESAI ---")
+    print("Model berhasil disimpan sebagai 'model.joblib'.")
+    print("Sekarang bisa menjalankan 'flask run' untuk memulai web app!")
+
+
+if __name__ == '__main__':
+    main()
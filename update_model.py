@@ -0,0 +1,204 @@
+import os
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from artifact import ARTIFACT_PATH, MODEL_PATH, atomic_write, export_artifact
+from database import get_db_connection
+from preprocessing import TARGET, Preprocessor
+from structure_learning import STRUCTURE_SCORES, ParallelHillClimb
+from sufficient_stats import COLUMNS, STATS_PATH, SufficientStats, encode_frame
+
+# Update model inkremental dari pasien tersimpan (tabel SavedInformation) yang sudah punya
+# diagnosis terkonfirmasi (kolom HeartDisease tidak NULL). /save_info dan /save_diagnosis
+# mengisi DiagnosedAt setiap kali diagnosis diisi/diubah/dihapus; hanya baris dengan DiagnosedAt
+# sejak watermark (disimpan di model_stats.bin) yang dibaca. Kode tiap baris yang sudah dihitung
+# disimpan di statistik (SufficientStats.counted): diagnosis yang diubah dikurangi dulu lalu
+# ditambahkan lagi, diagnosis yang dihapus dikurangi, baris yang tidak berubah dilewati. CPD
+# struktur yang ada dihitung ulang, lalu model.joblib + artefak serving ditulis ulang secara
+# atomik. Server yang berjalan memuat model baru lewat watcher hot reload (lengkap dengan canary).
+#
+# CLI:  python update_model.py                         (misal dari cron)
+#       python update_model.py --relearn-structure     (cari ulang struktur dari count)
+
+# Jumlah baris per query
+UPDATE_FETCH_SIZE = int(os.environ.get('UPDATE_FETCH_SIZE', 1000))
+# Watermark dibaca mundur sebanyak ini: diagnosis yang commit-nya lebih lambat dari DiagnosedAt-nya
+# (transaksi yang sedang berjalan saat job membaca) tetap terbaca; baris yang sudah dihitung dilewati
+WATERMARK_OVERLAP = timedelta(seconds=int(os.environ.get('UPDATE_WATERMARK_OVERLAP', 300)))
+# DiagnosedAt paling awal (statistik baru dari train.py belum punya watermark)
+EPOCH = datetime(1970, 1, 1)
+
+
+def iter_diagnosis_changes(since, batch_size=UPDATE_FETCH_SIZE):
+    """Generator DataFrame baris dengan DiagnosedAt >= since, urut (DiagnosedAt, id) (keyset)."""
+    sql = (f"SELECT id, DiagnosedAt, {', '.join(COLUMNS)} FROM SavedInformation "
+           f"WHERE DiagnosedAt > %s OR (DiagnosedAt = %s AND id > %s) ORDER BY DiagnosedAt, id LIMIT %s")
+    last_at, last_id = since, -1
+    while True:
+        with get_db_connection() as conn:
+            with conn.cursor(dictionary=True) as cursor:
+                cursor.execute(sql, (last_at, last_at, last_id, batch_size))
+                rows = cursor.fetchall()
+        if not rows:
+            return
+        yield pd.DataFrame(rows)
+        last_at, last_id = rows[-1]['DiagnosedAt'], rows[-1]['id']
+
+
+def iter_legacy_rows(until_id, batch_size=UPDATE_FETCH_SIZE):
+    """Baris berdiagnosis dengan id <= until_id (watermark id format lama), urut berdasarkan id."""
+    sql = (f"SELECT id, {', '.join(COLUMNS)} FROM SavedInformation "
+           f"WHERE id > %s AND id <= %s AND HeartDisease IS NOT NULL ORDER BY id LIMIT %s")
+    last_id = 0
+    while True:
+        with get_db_connection() as conn:
+            with conn.cursor(dictionary=True) as cursor:
+                cursor.execute(sql, (last_id, until_id, batch_size))
+                rows = cursor.fetchall()
+        if not rows:
+            return
+        yield pd.DataFrame(rows)
+        last_id = rows[-1]['id']
+
+
+def encode_rows(stats, df, preprocessor):
+    """{id: kode per variabel (urutan stats.cards)} untuk baris berdiagnosis yang semua nilainya dikenal encoder."""
+    df = df[df[TARGET].notna()]
+    if df.empty:
+        return {}, 0
+    codes = encode_frame(df.astype({TARGET: int}), preprocessor)
+    matrix = np.column_stack([codes[var] for var in stats.cards])
+    known = (matrix >= 0).all(axis=1)
+    return dict(zip(df['id'].astype(int)[known].tolist(), matrix[known])), int((~known).sum())
+
+
+def stack_codes(stats, rows):
+    matrix = np.stack(rows)
+    return {var: matrix[:, i] for i, var in enumerate(stats.cards)}
+
+
+def apply_changes(stats, df, preprocessor):
+    """Samakan count dengan diagnosis terkini baris `df`; kembalikan (ditambah, dikurangi, dilewati)."""
+    current, skipped = encode_rows(stats, df, preprocessor)
+    added, removed = [], []
+    for user_id in df['id'].astype(int).tolist():
+        old, new = stats.counted.get(user_id), current.get(user_id)
+        if old is not None and new is not None and np.array_equal(old, new):
+            continue
+        if old is not None:
+            removed.append(stats.counted.pop(user_id))
+        if new is not None:
+            added.append(new)
+            stats.counted[user_id] = new
+    if removed:
+        stats.remove(stack_codes(stats, removed))
+    if added:
+        stats.update(stack_codes(stats, added))
+    return len(added), len(removed), skipped
+
+
+def migrate_legacy_watermark(stats, preprocessor, batch_size=UPDATE_FETCH_SIZE):
+    # Statistik lama menyimpan watermark berupa id: baris berdiagnosis sampai id itu sudah masuk
+    # count, jadi dicatat sebagai sudah dihitung (dengan diagnosis saat ini) tanpa menambah count
+    for df in iter_legacy_rows(stats.watermark, batch_size):
+        stats.counted.update(encode_rows(stats, df, preprocessor)[0])
+    stats.watermark = None
+
+
+def check_stats(stats, package):
+    """Pastikan statistik cocok dengan model.joblib (kelas encoder dan struktur yang sama)."""
+    cards = {col: len(le.classes_) for col, le in package['encoders'].items()}
+    if stats.cards != {col: cards.get(col) for col in stats.cards}:
+        raise ValueError("Kelas encoder model.joblib tidak cocok dengan statistik; jalankan train.py ulang.")
+    model = package['model']
+    structure = {node: sorted(model.get_parents(node)) for node in model.nodes()}
+    if structure != {node: parents for node, (parents, _) in stats.families.items()}:
+        raise ValueError("Struktur model.joblib tidak cocok dengan statistik; jalankan train.py ulang.")
+
+
+def publish(package, stats, model_path=MODEL_PATH, artifact_path=ARTIFACT_PATH, stats_path=STATS_PATH):
+    # Urutan: artefak dulu (yang dibaca server), baru model.joblib, lalu statistik + watermark.
+    # Jika model.joblib lebih baru dari artefak, server akan mengekspor ulang sendiri, jadi
+    # artefak di-touch setelahnya. Jika proses mati sebelum statistik tersimpan, run berikutnya
+    # menghitung baris yang sama lagi dari statistik lama (hasilnya tetap benar).
+    meta = export_artifact(package, artifact_path)
+    with atomic_write(model_path) as f:
+        joblib.dump(package, f)
+    os.utime(artifact_path)
+    stats.save(stats_path)
+    return meta
+
+
+def update(model_path=MODEL_PATH, artifact_path=ARTIFACT_PATH, stats_path=STATS_PATH,
+           batch_size=UPDATE_FETCH_SIZE, relearn_structure=False, score='bic', dry_run=False):
+    start = time.perf_counter()
+    package = joblib.load(model_path)
+    stats = SufficientStats.load(stats_path)
+    check_stats(stats, package)
+    preprocessor = Preprocessor.from_encoders(package['discretizer_bins'], package['encoders'], stats.medians)
+    # Model lama (sebelum median disimpan di paket) diberi median dari statistik training
+    package.setdefault('medians', {col: float(value) for col, value in stats.medians.items()})
+
+    result = {'previous_watermark': stats.watermark, 'rows': 0, 'removed': 0, 'skipped': 0}
+    if isinstance(stats.watermark, int):
+        migrate_legacy_watermark(stats, preprocessor, batch_size)
+    since = datetime.fromisoformat(stats.watermark) - WATERMARK_OVERLAP if stats.watermark else EPOCH
+    for df in iter_diagnosis_changes(since, batch_size):
+        # Baris dengan nilai yang tidak dikenal encoder dilewati (tetap dianggap sudah dibaca)
+        added, removed, skipped = apply_changes(stats, df, preprocessor)
+        result['rows'] += added
+        result['removed'] += removed
+        result['skipped'] += skipped
+        latest = pd.Timestamp(df['DiagnosedAt'].iloc[-1]).to_pydatetime().isoformat(timespec='microseconds')
+        stats.watermark = max(stats.watermark or latest, latest)
+    result['watermark'] = stats.watermark
+
+    if result['rows'] == 0 and result['removed'] == 0 and not relearn_structure:
+        if stats.watermark != result['previous_watermark'] and not dry_run:
+            stats.save(stats_path)
+        result['status'] = 'unchanged'
+    else:
+        model = package['model']
+        if relearn_structure:
+            from pgmpy.models import DiscreteBayesianNetwork
+
+            hc = ParallelHillClimb(stats.scorer(score))
+            model = DiscreteBayesianNetwork(hc.estimate())
+            stats.fit_families(model, hc.scorer)
+            package['model'] = model
+            result['edges'] = len(model.edges())
+        model.remove_cpds(*model.get_cpds())
+        model.add_cpds(*stats.cpds())
+        model.check_model()
+        result['status'] = 'dry_run' if dry_run else 'published'
+        if not dry_run:
+            result['version'] = publish(package, stats, model_path, artifact_path, stats_path)['model_version']
+    result['n'] = int(stats.n)
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Perbarui CPD model dari pasien tersimpan yang sudah berdiagnosis.")
+    parser.add_argument('--relearn-structure', action='store_true',
+                        help="Cari ulang struktur dari count (butuh tabel kontingensi gabungan di statistik)")
+    parser.add_argument('--score', choices=STRUCTURE_SCORES, default='bic', help="Skor untuk --relearn-structure")
+    parser.add_argument('--batch-size', type=int, default=UPDATE_FETCH_SIZE, help="Jumlah baris per query")
+    parser.add_argument('--dry-run', action='store_true', help="Hitung saja, jangan tulis model/statistik")
+    args = parser.parse_args()
+
+    if not os.path.exists(STATS_PATH):
+        print(f"ERROR: '{STATS_PATH}' tidak ditemukan. Jalankan train.py dulu untuk membuat statistik training.")
+        raise SystemExit(1)
+    result = update(batch_size=args.batch_size, relearn_structure=args.relearn_structure,
+                    score=args.score, dry_run=args.dry_run)
+    print(f"Update model: {result['status']} - {result['rows']} baris ditambahkan, {result['removed']} dikurangi "
+          f"({result['skipped']} dilewati), watermark {result['previous_watermark']} -> {result['watermark']}, "
+          f"{result['seconds']} detik")
+    if result.get('version'):
+        print(f"Model versi {result['version']} dipublikasikan; server memuatnya lewat hot reload.")